@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+法人マスタ解析のベンチマーク（項目ごとの正規表現走査 vs 1パス解析）
+
+data/company_master/ の法人マスタを複製して数千件のコーパスを作り、
+旧実装（項目ごとに正規表現で本文を走査）と parse_master / load_master を比較する。
+項目数が少ない呼び出し元単体では正規表現の方が速いこともあるが、1ファイルを
+複数の呼び出し元が読む場合は1回の解析を共有でき、load_master のキャッシュが効けば解析自体が不要になる。
+サイドカー（{会社名}.json）を書いた後の load_record（Markdown を解析しない）も計測する。
+
+使い方:
+  python benchmarks/bench_master_parser.py
+  python benchmarks/bench_master_parser.py --copies 5000
+"""
+
+import argparse
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ra_fb.config import MASTER_DIR
+from ra_fb.master import is_master_file, load_master, parse_master, split_master
+from ra_fb.master_record import load_record, write_sidecar
+
+# 呼び出し元ごとに参照していた項目
+KEYS = {
+    "collect_attract_examples": (
+        "マーケット成長性", "マーケットの成長性・競合", "マーケットの成長度合い",
+        "今後の注力領域", "事業概要", "事業一覧・主軸事業",
+    ),
+    "_needs_supplement": (
+        "企業スナップショット", "休日・直行直帰・リモート", "休日数・直行直帰・リモート可否", "休日数", "リモート可否",
+    ),
+    "migrate_file": (
+        "事業概要", "事業一覧・主軸事業", "会社の事業内容", "マーケット成長性", "マーケットの成長性・競合",
+        "マーケットの成長度合い", "法人HP URL", "売上構成比", "今後の注力領域", "企業スナップショット",
+        "大手出身者向け", "中堅出身者向け", "零細出身者向け", "前職規模別アトラクトUSP", "前職規模別USP",
+        "採用意思決定者", "口コミ評価傾向", "OpenWork・転職会議等", "出張", "残業時間",
+        "休日・直行直帰・リモート", "休日数・直行直帰・リモート可否", "休日数", "リモート可否", "福利厚生",
+    ),
+}
+
+
+def _old_extract_table_value(body: str, key: str) -> str:
+    """旧実装（キーごとに正規表現をコンパイルして本文を走査）"""
+    pattern = rf"\|\s*{re.escape(key)}\s*\|\s*([^\n|]+?)\s*\|"
+    m = re.search(pattern, body)
+    if m:
+        val = m.group(1).strip()
+        return val if val and val != "未確認" else ""
+    return ""
+
+
+def _build_corpus(dest: Path, copies: int) -> list:
+    sources = [p for p in sorted(MASTER_DIR.glob("*.md")) if is_master_file(p.name)]
+    if not sources:
+        print(f"法人マスタがありません: {MASTER_DIR}", file=sys.stderr)
+        sys.exit(1)
+    paths = []
+    for i in range(copies):
+        src = sources[i % len(sources)]
+        dst = dest / f"{src.stem}_{i:05d}.md"
+        shutil.copyfile(src, dst)
+        paths.append(dst)
+    return paths
+
+
+def _bench(label: str, fn, items: list) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34} {elapsed * 1000:9.1f} ms  ({elapsed / len(items) * 1e6:7.1f} us/件)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="法人マスタ解析ベンチマーク")
+    parser.add_argument("--copies", type=int, default=3000, help="コーパスの件数（デフォルト: 3000）")
+    args = parser.parse_args()
+
+    all_keys = tuple(dict.fromkeys(k for keys in KEYS.values() for k in keys))
+
+    def old(text: str, keys=all_keys):
+        parsed = split_master(text)
+        if parsed:
+            return {k: _old_extract_table_value(parsed[1], k) for k in keys}
+
+    def new(text: str, keys=all_keys):
+        rec = parse_master(text)
+        if rec:
+            return {k: rec.get(k) for k in keys}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = _build_corpus(Path(tmp), args.copies)
+        texts = [p.read_text(encoding="utf-8") for p in paths]
+        mismatched = sum(1 for t in texts if old(t) != new(t))
+        print(f"コーパス: {len(texts)} 件 / 不一致 {mismatched} 件")
+
+        print("1ファイルの全呼び出し元（旧: 呼び出し元ごとにキー走査 / 新: 1回解析して共有）")
+        t_old = _bench("項目ごとの正規表現", lambda t: [old(t, keys) for keys in KEYS.values()], texts)
+        t_new = _bench("parse_master（1パス）", new, texts)
+        for name, keys in KEYS.items():
+            print(f"{name}（{len(keys)} 項目）")
+            _bench("項目ごとの正規表現", lambda t: old(t, keys), texts)
+            _bench("parse_master（1パス）", lambda t: new(t, keys), texts)
+
+        print("ファイル読み込み込み")
+        _bench("load_master（初回）", load_master, paths)
+        t_hot = _bench("load_master（キャッシュ済み）", load_master, paths)
+        print(f"速度比: 1パス {t_old / t_new:.1f}x / キャッシュ済み {t_old / t_hot:.1f}x")
+
+        print("サイドカー（JSON）")
+        for p in paths:
+            write_sidecar(p, load_record(p))
+        t_side = _bench("load_record（初回）", load_record, paths)
+        _bench("load_record（キャッシュ済み）", load_record, paths)
+        print(f"速度比: サイドカー初回 {t_old / t_side:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+FB パイプラインのオフライン・ベンチマーク（Claude API・Web 検索・Slack はフェイク）
+
+data/input の文字起こし（RA: ra/茂野・ra/小山田、CA: ca/）を入力に、次のシナリオを実行して
+スループット（件/秒）・p50/p95 レイテンシ・ピークメモリを出力する。
+  feedback  generate_feedback_ra / generate_feedback_ca
+  extract   extract_and_save_company_info（Web リサーチ込み）
+  pipeline  run_feedback_job（FB 生成・Slack 投稿・法人情報保存）
+  bulk      scripts/bulk_import_company.py（--restart --force）
+  webhook   scripts/webhook_server.py の POST /webhook/notta（flask 未インストール時はスキップ）
+
+状態・出力は一時ディレクトリに書き込み（RAFB_STATE_DIR / RAFB_OUTPUT_DIR）、data/ は変更しない。
+シナリオは同じ一時ディレクトリを共有するため、リサーチキャッシュは先に実行したシナリオで温まる。
+比較は同じ --scenarios 同士で行うこと。
+フェイクのレイテンシ・トークン数・失敗率は引数で指定する（benchmarks/fakes.py）。
+
+使い方:
+  python benchmarks/bench_pipeline.py
+  python benchmarks/bench_pipeline.py --scenarios feedback,extract --workers 8 --llm-latency 2
+  python benchmarks/bench_pipeline.py --llm-fail-rate 0.05 --search-fail-rate 0.1
+  python benchmarks/bench_pipeline.py --scenarios pipeline --job-sla 5 --search-latency 3  # 締め切りによる省略
+  python benchmarks/bench_pipeline.py --json > bench.json                # 結果を保存
+  python benchmarks/bench_pipeline.py --compare bench.json --tolerance 0.2  # 20% 以上の悪化で終了コード 1
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+SCENARIOS = ["feedback", "extract", "pipeline", "bulk", "webhook"]
+
+Item = Tuple[Path, str, str, str]  # (path, company_name, "ra"|"ca", ra_name)
+
+
+def _isolate_env(workdir: Path, slack_url: str) -> None:
+    """ra_fb の import 前に、状態・出力先とフェイク用の環境変数を設定"""
+    os.environ["RAFB_STATE_DIR"] = str(workdir / "state")
+    os.environ["RAFB_OUTPUT_DIR"] = str(workdir / "output")
+    os.environ["SLACK_WEBHOOK_URL"] = slack_url
+    os.environ["RAFB_SEARCH_RATE"] = "0"  # レート制限はフェイクのレイテンシで代替
+    os.environ["RAFB_SLACK_MAX_ATTEMPTS"] = "2"
+    for key in list(os.environ):
+        if key.startswith("SLACK_WEBHOOK_URL_") or key == "WEBHOOK_SECRET":
+            del os.environ[key]
+
+
+def _load_script(name: str):
+    """scripts/ 以下のスクリプトをモジュールとして読み込む"""
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", ROOT / "scripts" / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _corpus(bulk, limit: int) -> List[Item]:
+    from ra_fb import extract_ra_from_path
+
+    items: List[Item] = []
+    for path, company, stype in bulk._collect_ra_files() + bulk._collect_ca_files():
+        items.append((path, company, stype, extract_ra_from_path(path) if stype == "ra" else ""))
+    return items[:limit] if limit else items
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+@contextmanager
+def _measure(result: dict):
+    """経過時間と tracemalloc のピーク（Python ヒープ）を result に記録"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        result["wall"] = time.perf_counter() - start
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+
+def _run_jobs(items: List[Item], job: Callable[[Item], bool], workers: int) -> dict:
+    latencies: List[float] = []
+    failures = 0
+
+    def run(item: Item) -> Tuple[float, bool]:
+        start = time.perf_counter()
+        try:
+            ok = bool(job(item))
+        except Exception as e:
+            logging.getLogger(__name__).debug("ジョブ失敗 %s: %s", item[0].name, e)
+            ok = False
+        return time.perf_counter() - start, ok
+
+    result: dict = {}
+    with _measure(result):
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            for seconds, ok in ex.map(run, items):
+                latencies.append(seconds)
+                failures += not ok
+    result.update(
+        jobs=len(items),
+        failures=failures,
+        jobs_per_sec=len(items) / result["wall"] if result["wall"] else 0.0,
+        p50=_percentile(latencies, 0.5),
+        p95=_percentile(latencies, 0.95),
+    )
+    return result
+
+
+def bench_feedback(items: List[Item], workers: int) -> dict:
+    from ra_fb import generate_feedback_ca, generate_feedback_ra
+
+    def job(item: Item) -> bool:
+        path, company, stype, ra_name = item
+        transcript = path.read_text(encoding="utf-8")
+        if stype == "ra":
+            message = generate_feedback_ra(transcript, ra_name=ra_name, company_name=company)
+        else:
+            message = generate_feedback_ca(transcript, company_name=company)
+        return "[AI生成エラー" not in message
+
+    return _run_jobs(items, job, workers)
+
+
+def bench_extract(items: List[Item], workers: int) -> dict:
+    from ra_fb import extract_and_save_company_info
+
+    def job(item: Item) -> bool:
+        path, company, stype, _ = item
+        return extract_and_save_company_info(
+            path.read_text(encoding="utf-8"), company_name=company, source_type=stype, force=True, source_path=path
+        ) is not None
+
+    return _run_jobs(items, job, workers)
+
+
+def bench_pipeline(items: List[Item], workers: int) -> dict:
+    from ra_fb import run_feedback_job
+
+    def job(item: Item) -> bool:
+        path, company, stype, ra_name = item
+        result = run_feedback_job(
+            stype, path.read_text(encoding="utf-8"), company_name=company, ra_name=ra_name, force=True, label="bench"
+        )
+        return result["posted"] and result["master_path"] is not None
+
+    return _run_jobs(items, job, workers)
+
+
+def bench_bulk(bulk, items: List[Item], workers: int) -> dict:
+    """bulk_import_company.main() をそのまま実行（対象は items に限定）。1件ごとのレイテンシは抽出呼び出しを包んで計測"""
+    latencies: List[float] = []
+    ok = [0]
+    original = bulk.extract_and_save_company_info
+
+    def wrapped(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            saved = original(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+        ok[0] += saved is not None
+        return saved
+
+    collectors = bulk._collect_ra_files, bulk._collect_ca_files
+    bulk.extract_and_save_company_info = wrapped
+    bulk._collect_ra_files = lambda: [(p, c, t) for p, c, t, _ in items if t == "ra"]
+    bulk._collect_ca_files = lambda: [(p, c, t) for p, c, t, _ in items if t != "ra"]
+    argv = sys.argv
+    sys.argv = ["bulk_import_company.py", "--workers", str(workers), "--restart", "--force"]
+    result: dict = {}
+    try:
+        with _measure(result), open(os.devnull, "w") as devnull:
+            with redirect_stdout(devnull), redirect_stderr(devnull):  # 進捗表示を抑止
+                bulk.main()
+    finally:
+        sys.argv = argv
+        bulk.extract_and_save_company_info = original
+        bulk._collect_ra_files, bulk._collect_ca_files = collectors
+    jobs = len(latencies)
+    result.update(
+        jobs=jobs,
+        failures=jobs - ok[0],
+        jobs_per_sec=jobs / result["wall"] if result["wall"] else 0.0,
+        p50=_percentile(latencies, 0.5),
+        p95=_percentile(latencies, 0.95),
+    )
+    return result
+
+
+def bench_webhook(items: List[Item], workers: int) -> Optional[dict]:
+    try:
+        webhook = _load_script("webhook_server")
+    except (ImportError, SystemExit):
+        print("webhook: flask がインストールされていないためスキップ", file=sys.stderr)
+        return None
+    client = webhook.app.test_client()
+
+    def job(item: Item) -> bool:
+        path, company, stype, ra_name = item
+        res = client.post(
+            "/webhook/notta",
+            json={
+                "type": stype,
+                "transcript": path.read_text(encoding="utf-8"),
+                "company_name": company,
+                "ra_name": ra_name,
+                "async": False,
+            },
+        )
+        return res.status_code == 200
+
+    return _run_jobs(items, job, workers)
+
+
+def _print_table(results: Dict[str, dict], fakes: dict) -> None:
+    print(f"{'scenario':<10} {'jobs':>5} {'fail':>5} {'jobs/s':>8} {'p50(s)':>8} {'p95(s)':>8} {'wall(s)':>8} {'peak(MB)':>9}")
+    for name, r in results.items():
+        print(
+            f"{name:<10} {r['jobs']:>5} {r['failures']:>5} {r['jobs_per_sec']:>8.2f} {r['p50']:>8.2f} "
+            f"{r['p95']:>8.2f} {r['wall']:>8.2f} {r['peak_mb']:>9.1f}"
+        )
+    print(f"\nmaxrss: {fakes['maxrss_mb']:.1f} MB")
+    print(f"LLM: {fakes['llm_calls']} 回（失敗 {fakes['llm_errors']}） tokens {fakes['llm_tokens']}")
+    print(f"検索: {fakes['search_calls']} 回（失敗 {fakes['search_errors']}）  Slack: {fakes['slack_posts']} 件")
+    if fakes["degraded"]:
+        print("締め切りによる省略: " + ", ".join(f"{k}={v}" for k, v in fakes["degraded"].items()))
+
+
+def _compare(results: Dict[str, dict], baseline_path: Path, tolerance: float) -> List[str]:
+    """ベースラインより tolerance 以上悪化した指標の一覧"""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8")).get("scenarios", {})
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["jobs_per_sec"] and r["jobs_per_sec"] < base["jobs_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name} jobs/s {base['jobs_per_sec']:.2f} -> {r['jobs_per_sec']:.2f}")
+        for key in ("p50", "p95", "peak_mb"):
+            if base[key] and r[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name} {key} {base[key]:.2f} -> {r[key]:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FB パイプラインのオフライン・ベンチマーク")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"カンマ区切り（{','.join(SCENARIOS)}）")
+    parser.add_argument("--workers", type=int, default=4, help="並列数")
+    parser.add_argument("--limit", type=int, default=0, help="入力件数の上限（0 で全件）")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Claude API の平均レイテンシ（秒）")
+    parser.add_argument("--llm-jitter", type=float, default=0.3)
+    parser.add_argument("--llm-output-tokens", type=int, default=None, help="既定は出力の文字数から概算")
+    parser.add_argument("--llm-token-latency", type=float, default=0.0, help="出力1トークンあたりの追加秒数")
+    parser.add_argument("--llm-fail-rate", type=float, default=0.0)
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Web 検索の平均レイテンシ（秒）")
+    parser.add_argument("--search-fail-rate", type=float, default=0.0)
+    parser.add_argument("--slack-latency", type=float, default=0.05)
+    parser.add_argument("--slack-fail-rate", type=float, default=0.0)
+    parser.add_argument("--job-sla", type=float, default=None, help="ジョブの締め切り秒（RAFB_JOB_SLA。0 で無効）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    parser.add_argument("--compare", type=Path, help="比較するベースライン（--json の出力）")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="悪化とみなす割合（既定 0.2）")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"不明なシナリオ: {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.CRITICAL)  # 失敗率指定時の例外ログを抑止
+    from fakes import FakeAnthropic, FakeDDGS, FakeSlack
+
+    slack = FakeSlack(latency=args.slack_latency, fail_rate=args.slack_fail_rate, seed=args.seed + 2)
+    with tempfile.TemporaryDirectory(prefix="rafb-bench-") as tmp:
+        _isolate_env(Path(tmp), slack.url)
+        if args.job_sla is not None:
+            os.environ["RAFB_JOB_SLA"] = str(args.job_sla)
+        from ra_fb import company, llm
+        from ra_fb.metrics import METRICS
+
+        llm_fake = FakeAnthropic(
+            latency=args.llm_latency,
+            jitter=args.llm_jitter,
+            output_tokens=args.llm_output_tokens,
+            token_latency=args.llm_token_latency,
+            fail_rate=args.llm_fail_rate,
+            seed=args.seed,
+        )
+        search_fake = FakeDDGS(latency=args.search_latency, fail_rate=args.search_fail_rate, seed=args.seed + 1)
+        llm.set_client(llm_fake)
+        company.set_search_backend(search_fake)
+
+        bulk = _load_script("bulk_import_company")
+        items = _corpus(bulk, args.limit)
+        print(f"入力: {len(items)} 件 / workers={args.workers}", file=sys.stderr)
+
+        results: Dict[str, dict] = {}
+        for name in scenarios:
+            print(f"{name} ...", file=sys.stderr)
+            if name == "feedback":
+                r = bench_feedback(items, args.workers)
+            elif name == "extract":
+                r = bench_extract(items, args.workers)
+            elif name == "pipeline":
+                r = bench_pipeline(items, args.workers)
+            elif name == "bulk":
+                r = bench_bulk(bulk, items, args.workers)
+            else:
+                r = bench_webhook(items, args.workers)
+            if r is not None:
+                results[name] = r
+
+        llm.set_client(None)
+        company.set_search_backend(None)
+    slack.close()
+
+    fakes = {
+        "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "llm_calls": llm_fake.calls,
+        "llm_errors": llm_fake.errors,
+        "llm_tokens": llm_fake.tokens,
+        "search_calls": search_fake.calls,
+        "search_errors": search_fake.errors,
+        "slack_posts": slack.posts,
+        "degraded": METRICS.snapshot()["degraded"],
+    }
+    if args.json:
+        print(json.dumps({"args": {k: str(v) for k, v in vars(args).items()}, "scenarios": results, **fakes},
+                         ensure_ascii=False, indent=2))
+    else:
+        _print_table(results, fakes)
+
+    if args.compare:
+        regressions = _compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"悪化: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+文字起こし圧縮の確認（実データで本文が変わっていないか）
+
+data/input/ 以下の Markdown を compact_transcript に通し、出力の各行が元の1行から
+タイムスタンプ・フィラー・空白を除いただけのもの（元の行の部分列）になっているかを確かめる。
+話者の誤認識で後続行に話者名が付いたり、行がまとめられたりすると失敗する。
+見出し行（「話者1 00:00:12」）で話者を宣言しているファイルは行をまとめるため対象外。
+
+使い方:
+  python benchmarks/check_transcript.py
+  python benchmarks/check_transcript.py data/input/ca
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ra_fb.config import INPUT_DIR
+from ra_fb.transcript import _SPEAKER_HEADER_RE, compact_transcript
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _norm(text: str) -> str:
+    return _WS_RE.sub("", text.replace("：", ":"))
+
+
+def _is_subsequence(part: str, whole: str) -> bool:
+    it = iter(whole)
+    return all(ch in it for ch in part)
+
+
+def check(text: str) -> list:
+    """元の行に対応しない出力行の一覧（空なら問題なし）"""
+    sources = [_norm(line) for line in text.split("\n")]
+    bad = []
+    i = 0
+    for line in compact_transcript(text).text.split("\n"):
+        out = _norm(line)
+        if not out:
+            continue
+        j = i
+        while j < len(sources) and not _is_subsequence(out, sources[j]):
+            j += 1
+        if j == len(sources):
+            bad.append(line)
+            continue
+        i = j + 1
+    return bad
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="文字起こし圧縮の確認")
+    parser.add_argument("paths", nargs="*", type=Path, default=[INPUT_DIR])
+    args = parser.parse_args()
+
+    files = sorted(f for p in args.paths for f in ([p] if p.is_file() else p.rglob("*.md")))
+    failed = skipped = 0
+    for f in files:
+        text = f.read_text(encoding="utf-8")
+        if any(_SPEAKER_HEADER_RE.match(line) for line in text.splitlines()):
+            skipped += 1
+            continue
+        bad = check(text)
+        if bad:
+            failed += 1
+            print(f"❌ {f.relative_to(ROOT) if f.is_relative_to(ROOT) else f}")
+            for line in bad[:5]:
+                print(f"    {line}")
+    print(f"{len(files)} 件中 失敗 {failed} 件（話者見出しありで対象外 {skipped} 件）")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
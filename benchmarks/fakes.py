@@ -0,0 +1,308 @@
+"""ベンチマーク用の偽 Anthropic クライアント・偽 DDGS・ローカル Slack Webhook
+
+実 API を呼ばずにパイプライン全体を動かすための差し替え部品。
+レイテンシ・トークン数・失敗率を指定でき、呼び出し回数・トークン数を集計する。
+  - FakeAnthropic: ra_fb.llm.set_client() に渡す
+  - FakeDDGS: ra_fb.company.set_search_backend() に渡す
+  - FakeSlack: SLACK_WEBHOOK_URL に url を設定する
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import List, Optional
+
+
+class FakeAPIError(RuntimeError):
+    """失敗率に応じて投げる疑似 API エラー"""
+
+
+class _Latency:
+    """平均 mean 秒・±jitter の一様ゆらぎ。rng はシード固定で再現可能"""
+
+    def __init__(self, mean: float, jitter: float, seed: int) -> None:
+        self.mean = mean
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            return max(0.0, self.mean + self._rng.uniform(-self.jitter, self.jitter))
+
+    def fails(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._rng.random() < rate
+
+
+def _prompt_text(kwargs: dict) -> str:
+    parts = [kwargs.get("system") or ""]
+    for m in kwargs.get("messages", []):
+        content = m.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(b.get("text", "") for b in content or [])
+    return "\n".join(parts)
+
+
+def _fake_master(company: str) -> str:
+    return f"""---
+会社名: "{company}"
+都道府県: ["愛知"]
+セグメント: ["電気系"]
+最終更新: "2026-01-01"
+出典: ベンチマーク
+---
+
+# 法人情報：{company}
+
+## 企業情報
+| 項目 | 内容 |
+|------|------|
+| 会社名 | {company} |
+| 都道府県 | 愛知 |
+| 事業概要 | 電気設備工事・施工管理 |
+| マーケット成長性 | 再エネ・DC 需要で拡大 |
+| 企業スナップショット | 地場の電気工事会社 |
+| 前職規模別USP | 大手：裁量、中堅：年収、零細：安定 |
+| 採用意思決定者 | 現場部長 |
+| 口コミ評価傾向 | 未確認 |
+
+## 労働条件
+| 項目 | 内容 |
+|------|------|
+| 休日・直行直帰・リモート | 完全週休2日、直行直帰可 |
+
+## 候補者別訴求
+| セグメント | 採用 | 訴求・差別化 |
+|------------|------|--------------|
+| 大手出身者向け（1,000名以上） | - | 裁量 |
+
+## 更新履歴
+- 2026-01-01: ベンチマーク
+"""
+
+
+def _fake_delta(company: str, new: bool) -> dict:
+    """update_master の入力。新規は主要項目一式、更新は数項目だけ"""
+    if not new:
+        return {"fields": {"残業時間": "月20h程度", "面接回数": "2回"}, "差別化メモ": ["年収基準が明確"]}
+    return {
+        "都道府県": ["愛知"],
+        "セグメント": ["電気系"],
+        "fields": {
+            "会社名": company,
+            "事業概要": "電気設備工事・施工管理",
+            "法人HP URL": "https://example.com/",
+            "売上構成比": "電気工事 8 割",
+            "今後の注力領域": "再エネ・DC",
+            "マーケット成長性": "再エネ・DC 需要で拡大",
+            "企業スナップショット": "地場の電気工事会社",
+            "前職規模別USP": "大手：裁量、中堅：年収、零細：安定",
+            "採用意思決定者": "現場部長",
+            "口コミ評価傾向": "風通しが良いとの声が多い",
+            "残業時間": "月20h程度",
+            "福利厚生": "資格手当",
+            "仕事内容": "電気設備の施工管理",
+            "必要資格": "第二種電気工事士",
+            "休日・直行直帰・リモート": "完全週休2日、直行直帰可",
+        },
+        "訴求": [{"セグメント": "大手出身者向け（1,000名以上）", "訴求": "裁量"}],
+    }
+
+
+_FAKE_FB = "\n\n".join(
+    f"【{i}. {title}】\n1. （ベンチマーク用の出力）"
+    for i, title in enumerate(
+        ["良かった点", "改善点", "採用概要状況", "進めるにあたっての障壁", "具体的に聞き方を変えた方がいい点と言い回し",
+         "この会社の魅力を候補者に伝える時に、どう伝えるといいか", "全体所感"],
+        start=1,
+    )
+)
+
+
+class _FakeMessages:
+    def __init__(self, owner: "FakeAnthropic") -> None:
+        self._owner = owner
+
+    def create(self, **kwargs):
+        return self._owner._create(kwargs)
+
+
+class FakeAnthropic:
+    """messages.create() だけを持つ Anthropic 互換クライアント。
+
+    prompt caching を模して、同じ固定プレフィックス（cache_control 付きブロック）の
+    2回目以降は cache_read として数える。tools 指定時は tool_use ブロックを返す。
+    timeout 指定時は、レイテンシがそれを超えると timeout 秒待ってエラーにする。
+    """
+
+    def __init__(
+        self,
+        latency: float = 1.0,
+        jitter: float = 0.3,
+        output_tokens: Optional[int] = None,
+        token_latency: float = 0.0,
+        fail_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.messages = _FakeMessages(self)
+        self.output_tokens = output_tokens
+        self.token_latency = token_latency  # 出力1トークンあたりの追加秒数（生成時間の模擬）
+        self.fail_rate = fail_rate
+        self._latency = _Latency(latency, jitter, seed)
+        self._lock = threading.Lock()
+        self._prefixes: set = set()
+        self.calls = 0
+        self.errors = 0
+        self.tokens = {"input": 0, "output": 0, "cache_read": 0, "cache_creation": 0}
+
+    def _create(self, kwargs: dict):
+        with self._lock:
+            self.calls += 1
+        if self._latency.fails(self.fail_rate):
+            time.sleep(self._latency.sample())
+            with self._lock:
+                self.errors += 1
+            raise FakeAPIError("fake API error")
+
+        cached = cache_read = cache_creation = 0
+        for m in kwargs.get("messages", []):
+            for b in m.get("content") if isinstance(m.get("content"), list) else []:
+                if b.get("cache_control"):
+                    n = len(b.get("text", "")) // 2
+                    with self._lock:
+                        seen = b["text"] in self._prefixes
+                        self._prefixes.add(b["text"])
+                    cached += n
+                    if seen:
+                        cache_read += n
+                    else:
+                        cache_creation += n
+        prompt = _prompt_text(kwargs)
+        input_tokens = max(len(prompt) // 2 - cached, 0)
+
+        tools = kwargs.get("tools") or []
+        if tools:
+            m = re.search(r"会社名: ([^\n]+)", prompt.split("【対象企業】")[-1])
+            data = _fake_delta((m.group(1).strip() if m else "") or "ベンチマーク株式会社", "（新規。登録済みの項目なし）" in prompt)
+            block = SimpleNamespace(type="tool_use", name=tools[0]["name"], input=data)
+            out_chars = len(json.dumps(data, ensure_ascii=False))
+        else:
+            block = SimpleNamespace(type="text", text=self._text(prompt))
+            out_chars = len(block.text)
+        # 出力トークン数は指定値（None なら出力の文字数から概算）
+        output_tokens = self.output_tokens if self.output_tokens is not None else out_chars // 2
+        output_tokens = min(output_tokens, int(kwargs.get("max_tokens", output_tokens)))
+        delay = self._latency.sample() + output_tokens * self.token_latency
+        timeout = kwargs.get("timeout")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            with self._lock:
+                self.errors += 1
+            raise FakeAPIError("fake API timeout")
+        time.sleep(delay)
+        with self._lock:
+            self.tokens["input"] += input_tokens
+            self.tokens["output"] += output_tokens
+            self.tokens["cache_read"] += cache_read
+            self.tokens["cache_creation"] += cache_creation
+
+        return SimpleNamespace(
+            content=[block],
+            stop_reason="tool_use" if tools else "end_turn",
+            usage=SimpleNamespace(
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                cache_read_input_tokens=cache_read,
+                cache_creation_input_tokens=cache_creation,
+            ),
+        )
+
+    @staticmethod
+    def _text(prompt: str) -> str:
+        if "## 抽出結果" in prompt:
+            return "・採用概要：施工管理 2 名\n・障壁：他社エージェント利用中"
+        if "YAML frontmatter" in prompt:
+            m = re.search(r"会社名: ([^\n]+)", prompt.split("【対象企業】")[-1])
+            return _fake_master((m.group(1).strip() if m else "") or "ベンチマーク株式会社")
+        return _FAKE_FB
+
+
+class FakeDDGS:
+    """DDGS.text() 互換の検索バックエンド"""
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, fail_rate: float = 0.0, seed: int = 1) -> None:
+        self.fail_rate = fail_rate
+        self._latency = _Latency(latency, jitter, seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def text(self, query: str, region: str = "jp-jp", max_results: int = 5) -> List[dict]:
+        time.sleep(self._latency.sample())
+        with self._lock:
+            self.calls += 1
+        if self._latency.fails(self.fail_rate):
+            with self._lock:
+                self.errors += 1
+            raise FakeAPIError("fake search error")
+        return [
+            {
+                "title": f"{query} - 結果{i}",
+                "href": f"https://example.com/{abs(hash(query)) % 10000}/{i}",
+                "body": f"{query} に関する説明文（{i}）。" * 5,
+            }
+            for i in range(max_results)
+        ]
+
+
+class FakeSlack:
+    """Incoming Webhook 互換のローカル HTTP サーバー（keep-alive 対応）"""
+
+    def __init__(self, latency: float = 0.05, fail_rate: float = 0.0, seed: int = 2) -> None:
+        self._latency = _Latency(latency, latency / 2, seed)
+        self.fail_rate = fail_rate
+        self.posts = 0
+        self.blocks = 0
+        self.rejected = 0
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                time.sleep(owner._latency.sample())
+                if owner._latency.fails(owner.fail_rate):
+                    owner.rejected += 1
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                owner.posts += 1
+                owner.blocks += len(json.loads(body or b"{}").get("blocks", []))
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self.url = f"http://127.0.0.1:{self._server.server_port}/services/bench"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
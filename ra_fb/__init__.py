@@ -27,6 +27,7 @@ from .company import (
     update_playbook_from_masters,
     collect_attract_examples_from_masters,
 )
+from .pipeline import run_feedback_job
 
 __all__ = [
     "ROOT",
@@ -53,4 +54,5 @@ __all__ = [
     "list_companies_by_region_segment",
     "update_playbook_from_masters",
     "collect_attract_examples_from_masters",
+    "run_feedback_job",
 ]
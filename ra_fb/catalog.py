@@ -0,0 +1,192 @@
+"""法人マスタの SQLite カタログ（都道府県×セグメントの索引）
+
+法人マスタの dict（サイドカー。無ければ Markdown を解析）を1件ずつ SQLite に保持する。
+ファイルの mtime/size が変わったものだけ読み直すので、検索のたびに
+全ファイルを読み直さずに済む。法人マスタの書き込み時は upsert() で即時反映する。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import MASTER_DIR, STATE_DIR
+from .db import connect
+from .master import is_master_file
+from .master_record import load_record, record_meta
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = STATE_DIR / "master_catalog.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS masters (
+    path TEXT PRIMARY KEY,
+    company TEXT NOT NULL,
+    updated TEXT,
+    source TEXT,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    meta TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS master_prefectures (
+    path TEXT NOT NULL,
+    prefecture TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS master_segments (
+    path TEXT NOT NULL,
+    segment TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pref ON master_prefectures (prefecture, path);
+CREATE INDEX IF NOT EXISTS idx_pref_path ON master_prefectures (path);
+CREATE INDEX IF NOT EXISTS idx_seg ON master_segments (segment, path);
+CREATE INDEX IF NOT EXISTS idx_seg_path ON master_segments (path);
+"""
+
+
+def _row_to_dict(row) -> dict:
+    return {
+        "path": Path(row["path"]),
+        "meta": json.loads(row["meta"]),
+        "fields": json.loads(row["fields"]),
+        "record": json.loads(row["record"]),
+    }
+
+
+def _drop_old_schema(db_path: Path) -> None:
+    """本文（body）を保持していた旧スキーマの索引は作り直す（次の sync で再構築される）"""
+    with connect(db_path) as conn:
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(masters)")}
+        if columns and "record" not in columns:
+            conn.executescript(
+                "DROP TABLE IF EXISTS masters; DROP TABLE IF EXISTS master_prefectures; "
+                "DROP TABLE IF EXISTS master_segments;"
+            )
+
+
+class MasterCatalog:
+    """法人マスタの索引。sync() でディレクトリと差分同期し、find() で都道府県×セグメント検索"""
+
+    def __init__(self, db_path: Path = CATALOG_PATH, master_dir: Path = MASTER_DIR) -> None:
+        self.db_path = Path(db_path)
+        self.master_dir = Path(master_dir)
+        self._sync_lock = threading.Lock()
+        _drop_old_schema(self.db_path)
+        with connect(self.db_path, _SCHEMA):
+            pass
+
+    def _delete(self, conn, path: str) -> None:
+        conn.execute("DELETE FROM masters WHERE path = ?", (path,))
+        conn.execute("DELETE FROM master_prefectures WHERE path = ?", (path,))
+        conn.execute("DELETE FROM master_segments WHERE path = ?", (path,))
+
+    def _index(self, conn, path: Path, st: os.stat_result) -> None:
+        key = str(path)
+        self._delete(conn, key)
+        record = load_record(path)
+        if record is None:
+            logger.debug("法人マスタ解析スキップ %s", path.name)
+            return
+        meta = record_meta(record)
+        conn.execute(
+            "INSERT INTO masters (path, company, updated, source, mtime_ns, size, meta, fields, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                record["会社名"],
+                record["最終更新"],
+                record["出典"],
+                st.st_mtime_ns,
+                st.st_size,
+                json.dumps(meta, ensure_ascii=False),
+                json.dumps(record["fields"], ensure_ascii=False),
+                json.dumps(record, ensure_ascii=False, separators=(",", ":")),
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO master_prefectures (path, prefecture) VALUES (?, ?)",
+            [(key, p) for p in dict.fromkeys(record["都道府県"])],
+        )
+        conn.executemany(
+            "INSERT INTO master_segments (path, segment) VALUES (?, ?)",
+            [(key, s) for s in dict.fromkeys(record["セグメント"])],
+        )
+
+    def upsert(self, path: Path) -> None:
+        """1ファイルを即時に索引へ反映（法人マスタ書き込み直後に呼ぶ）"""
+        path = Path(path)
+        with connect(self.db_path) as conn:
+            try:
+                st = path.stat()
+            except OSError:
+                self._delete(conn, str(path))
+                return
+            self._index(conn, path, st)
+
+    def sync(self) -> int:
+        """法人マスタディレクトリと差分同期（mtime/size が変わったファイルのみ再解析）。戻り値: 更新件数"""
+        if not self.master_dir.exists():
+            return 0
+        with self._sync_lock, connect(self.db_path) as conn:
+            known = {
+                row["path"]: (row["mtime_ns"], row["size"])
+                for row in conn.execute("SELECT path, mtime_ns, size FROM masters")
+            }
+            changed = 0
+            seen = set()
+            with os.scandir(self.master_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".md") or not is_master_file(entry.name):
+                        continue
+                    key = str(self.master_dir / entry.name)
+                    seen.add(key)
+                    st = entry.stat()
+                    if known.get(key) == (st.st_mtime_ns, st.st_size):
+                        continue
+                    self._index(conn, Path(key), st)
+                    changed += 1
+            for key in set(known) - seen:
+                self._delete(conn, key)
+                changed += 1
+        return changed
+
+    def find(self, prefecture: str, segment: str) -> List[dict]:
+        """都道府県×セグメントで検索。[{path, meta, fields, record}, ...]（会社名順）"""
+        self.sync()
+        with connect(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT m.* FROM masters m "
+                "JOIN master_prefectures p ON p.path = m.path "
+                "JOIN master_segments s ON s.path = m.path "
+                "WHERE p.prefecture = ? AND s.segment = ? ORDER BY m.path",
+                (prefecture, segment),
+            ).fetchall()
+        return [_row_to_dict(r) for r in rows]
+
+    def all(self) -> List[dict]:
+        """全法人マスタ。[{path, meta, fields, record}, ...]"""
+        self.sync()
+        with connect(self.db_path) as conn:
+            rows = conn.execute("SELECT * FROM masters ORDER BY path").fetchall()
+        return [_row_to_dict(r) for r in rows]
+
+
+_catalog_lock = threading.Lock()
+_catalogs: Dict[str, MasterCatalog] = {}
+
+
+def get_catalog(master_dir: Optional[Path] = None) -> MasterCatalog:
+    """法人マスタディレクトリごとの共有カタログ"""
+    master_dir = Path(master_dir or MASTER_DIR)
+    with _catalog_lock:
+        key = str(master_dir)
+        if key not in _catalogs:
+            db_path = CATALOG_PATH if master_dir == MASTER_DIR else master_dir / ".catalog.sqlite3"
+            _catalogs[key] = MasterCatalog(db_path, master_dir)
+        return _catalogs[key]
@@ -2,15 +2,45 @@
 
 from __future__ import annotations
 
+import json
 import logging
 import os
 import re
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
-
-from .config import load_env, MASTER_DIR, CANDIDATE_ATTRACT_DIR, SEGMENT_ORDER
+from typing import Any, Iterable, List, Optional, Tuple
+
+from .catalog import get_catalog
+from .config import env_int, load_env, MASTER_DIR, CANDIDATE_ATTRACT_DIR, SEGMENT_ORDER
+from .deadline import MIN_RESEARCH_SECONDS, RESEARCH_RESERVE, Deadline
+from .llm import MODEL, cached_prompt_content, create_message, get_client, log_usage, response_text
+from .long_transcript import condense_transcript
+from .manifest import content_hash, is_extracted, record_extraction, update_master_hash
+from .master import MasterRecord, parse_body, parse_master, split_master, parse_frontmatter as _parse_frontmatter_simple  # noqa: F401
+from .master_record import (
+    APPEAL_SECTION,
+    APPEAL_SEGMENTS,
+    MEMO_SECTION,
+    SIZE_SEGMENTS,
+    apply_delta,
+    compact_record,
+    delta_tool,
+    empty_record,
+    load_record,
+    record_from_master,
+    render_master,
+    save_master,
+    sidecar_path,
+    tool_input,
+)
+from .metrics import timed
+from .ratelimit import get_search_limiter
+from .research_cache import get_research_cache
+from .snippets import build_research_text
+from .transcript import prepare_transcript
 
 load_env()
 logger = logging.getLogger(__name__)
@@ -30,69 +60,205 @@ def _get_segment_info(segment: str) -> dict:
         return {"market_size": "", "axis": "その他"}
 
 
-def _research_company_online(company_name: str) -> str:
+# Web 検索の同時実行数（RAFB_SEARCH_CONCURRENCY で上書き）。レートは ratelimit で全ジョブ共通に制限
+DEFAULT_SEARCH_CONCURRENCY = 4
+
+_search_backend_lock = threading.Lock()
+_search_backend: Any = None
+
+
+def set_search_backend(backend: Any) -> None:
+    """検索バックエンドを差し替える（ベンチマーク・検証用）。
+    backend は DDGS 互換の text(query, region=..., max_results=...) を持つこと。None で既定に戻す。
+    """
+    global _search_backend
+    with _search_backend_lock:
+        _search_backend = backend
+
+
+def _get_search_backend() -> Any:
+    """プロセス共有の DDGS セッション。duckduckgo_search 未インストール・初期化失敗時は None"""
+    global _search_backend
+    with _search_backend_lock:
+        if _search_backend is not None:
+            return _search_backend
+        try:
+            import warnings
+            with warnings.catch_warnings():
+                warnings.filterwarnings("ignore", message=".*duckduckgo_search.*renamed.*")
+                from duckduckgo_search import DDGS
+        except ImportError:
+            return None
+        try:
+            _search_backend = DDGS()
+        except Exception as e:
+            logger.warning("Web検索の初期化失敗: %s", e)
+            return None
+        return _search_backend
+
+
+# 事業リサーチの検索クエリ（会社名に続けるキーワード, URL を含めるか, 結果で埋まる法人マスタの項目）
+RESEARCH_PLAN: List[Tuple[str, bool, Tuple[str, ...]]] = [
+    ("公式サイト", True, ("法人HP URL", "事業概要")),  # URL取得のためhrefを含める
+    ("事業 売上構成", False, ("事業概要", "売上構成比")),
+    ("中期経営計画 IR", False, ("今後の注力領域", "企業スナップショット")),
+    ("社長メッセージ 経営方針", False, ("今後の注力領域", "企業スナップショット")),
+    ("競合 マーケット 成長", False, ("マーケット成長性", "前職規模別USP")),
+    ("OpenWork 口コミ 評判", False, ("口コミ評価傾向",)),
+    ("転職会議 口コミ", False, ("口コミ評価傾向",)),
+    ("休日 残業 働き方 福利厚生", False, ("休日・直行直帰・リモート", "残業時間", "福利厚生")),
+    ("直行直帰 リモート 在宅", False, ("休日・直行直帰・リモート",)),
+    ("採用 人事 採用担当", False, ("採用意思決定者",)),
+]
+
+
+def _field_filled(record: dict, key: str) -> bool:
+    """項目が埋まっているか（「未確認（…）」のような注記だけの値は未確認扱い）"""
+    if key == "前職規模別USP" and any((record["訴求"].get(seg) or {}).get("訴求") for seg in SIZE_SEGMENTS):
+        return True
+    value = record["fields"].get(key, "")
+    return bool(value) and not value.startswith("未確認")
+
+
+def _research_queries(
+    company_name: str,
+    record: Optional[dict] = None,
+    targets: Optional[Iterable[str]] = None,
+) -> List[Tuple[str, bool, Tuple[str, ...]]]:
+    """
+    事業リサーチの検索クエリ一覧。(クエリ, URL を含めるか, 結果で埋まる項目)
+    record（既存の法人マスタ）を渡すと、targets（省略時は全項目）のうち未確認の項目を埋めるクエリだけを返す。
+    """
+    wanted = set(targets) if targets is not None else None
+    queries = []
+    for keyword, include_url, keys in RESEARCH_PLAN:
+        if wanted is not None:
+            keys = tuple(k for k in keys if k in wanted)
+        if record is not None and all(_field_filled(record, k) for k in keys):
+            continue
+        if keys or wanted is None:
+            queries.append((f"{company_name} {keyword}", include_url, keys))
+    return queries
+
+
+def _search_text(backend: Any, query: str, until: Optional[float] = None) -> List[dict]:
+    """共有レートリミッターを通して1クエリ検索。until（time.monotonic()）までに順番が来なければ TimeoutError"""
+    wait_limit = None if until is None else max(0.0, until - time.monotonic())
+    if not get_search_limiter().acquire(timeout=wait_limit):
+        raise TimeoutError("検索の順番待ちが締め切りを超過")
+    with timed("search_query"):
+        return list(backend.text(query, region="jp-jp", max_results=5))
+
+
+def _research_company_online(
+    company_name: str,
+    refresh: bool = False,
+    record: Optional[dict] = None,
+    targets: Optional[Iterable[str]] = None,
+    deadline: Optional[Deadline] = None,
+) -> str:
     """
     会社名から Web 検索で事業・マーケット情報を取得。
     事業一覧、売上構成、中期計画・IR・社長メッセージ、競合・成長性を検索。
+    record（既存の法人マスタ）を渡すと、埋まっていない項目に対応するクエリだけを投げる。
+    クエリは並列に投げ、結果は関連度で並べて同名他社・近似重複を除き、トークン予算内にまとめる。
+    TTL 内のキャッシュがあるクエリは検索しない（refresh=True で再検索）。
+    deadline（ジョブの締め切り）があれば、抽出の時間（RESEARCH_RESERVE）を残して検索を打ち切り、
+    それまでに返った結果だけを使う。時間が足りなければキャッシュにある結果だけを使う。
     """
     if not company_name or company_name in ("未設定", "未確認"):
         return ""
-    try:
-        import warnings
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore", message=".*duckduckgo_search.*renamed.*")
-            from duckduckgo_search import DDGS
-    except ImportError:
-        return ""
 
-    queries = [
-        (f"{company_name} 公式サイト", True),  # URL取得のためhrefを含める
-        f"{company_name} 事業 売上構成",
-        f"{company_name} 中期経営計画 IR",
-        f"{company_name} 社長メッセージ 経営方針",
-        f"{company_name} 競合 マーケット 成長",
-        f"{company_name} OpenWork 口コミ 評判",
-        f"{company_name} 転職会議 口コミ",
-        f"{company_name} 休日 残業 働き方 福利厚生",
-        f"{company_name} 直行直帰 リモート 在宅",
-        f"{company_name} 採用 人事 採用担当",
-    ]
-    all_snippets: list[str] = []
-    seen: set[str] = set()
-
-    try:
-        ddgs = DDGS()
-        for item in queries:
-            q = item[0] if isinstance(item, tuple) else item
-            include_url = isinstance(item, tuple) and item[1]
-            try:
-                results = list(ddgs.text(q, region="jp-jp", max_results=5))
-                for r in results:
-                    body = (r.get("body") or "").strip()
-                    title = (r.get("title") or "").strip()
-                    href = (r.get("href") or "").strip()
-                    key = body or href
-                    if key and key not in seen:
-                        seen.add(key)
-                        if include_url and href:
-                            all_snippets.append(f"【{title}】\nURL: {href}\n{body}")
-                        elif body:
-                            all_snippets.append(f"【{title}】\n{body}")
-                time.sleep(0.5)
-            except Exception as e:
-                logger.debug("Web検索クエリ失敗 %s: %s", q, e)
-                continue
-    except Exception as e:
-        logger.warning("Web検索失敗 %s: %s", company_name, e)
+    queries = _research_queries(company_name, record, targets)
+    if record is not None:
+        logger.info("リサーチ: %s（%d/%d クエリ）", company_name, len(queries), len(RESEARCH_PLAN))
+    if not queries:
         return ""
+    results: List[Optional[List[dict]]] = [None] * len(queries)
+    cache = get_research_cache()
+    if cache is not None and not refresh:
+        for i, (q, _, _) in enumerate(queries):
+            results[i] = cache.get(company_name, q)
+
+    pending = [i for i, r in enumerate(results) if r is None]
+    until: Optional[float] = None
+    if pending and deadline is not None and deadline.enabled:
+        budget = deadline.remaining() - RESEARCH_RESERVE
+        if budget < MIN_RESEARCH_SECONDS:
+            deadline.degrade("research", f"省略（キャッシュのみ、未検索 {len(pending)} クエリ）")
+            pending = []
+        else:
+            until = time.monotonic() + budget
+    backend = _get_search_backend() if pending else None
+    if backend is not None:
+        workers = env_int("RAFB_SEARCH_CONCURRENCY", DEFAULT_SEARCH_CONCURRENCY)
+        ex = ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending))))
+        try:
+            futures = {ex.submit(_search_text, backend, queries[i][0], until): i for i in pending}
+            not_done = set(futures)
+            while not_done:
+                timeout = None if until is None else max(0.0, until - time.monotonic())
+                done, not_done = wait(not_done, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    break  # 締め切り（抽出の時間を残す）
+                for fut in done:
+                    i = futures[fut]
+                    try:
+                        results[i] = fut.result()
+                    except Exception as e:
+                        logger.debug("Web検索クエリ失敗 %s: %s", queries[i][0], e)
+                        continue
+                    if cache is not None and results[i]:
+                        cache.put(company_name, queries[i][0], results[i])
+            if not_done and deadline is not None:
+                deadline.degrade("research", f"縮小（{len(pending) - len(not_done)}/{len(pending)} クエリで打ち切り）")
+        finally:
+            # 打ち切った検索の完了は待たない（実行中のものは結果を捨てる）
+            ex.shutdown(wait=False, cancel_futures=True)
+
+    names = [company_name]
+    if record is not None:
+        names += [record.get("表示名") or "", record["fields"].get("会社名", "")]
+    return build_research_text(
+        [(q, include_url) for q, include_url, _ in queries],
+        results,
+        names,
+        [keys for _, _, keys in queries],
+    )
 
-    if not all_snippets:
-        return ""
-    return "\n\n---\n\n".join(all_snippets[:15])
+
+# 抽出プロンプト・テンプレートの版数。変更したら上げる（抽出済みマニフェストが無効になり再抽出される）
+EXTRACTION_PROMPT_VERSION = "3"
+TRANSCRIPT_LIMIT = 8000  # 抽出1回に入れる文字起こしの上限（超える場合は区間ごとに抽出してまとめる）
 
 # 都道府県×セグメントで比較するためのセグメント一覧（候補者アトラクト準拠）
 SEGMENTS = SEGMENT_ORDER[:11]  # 基本11種（商業施設・自衛隊・その他を除く）
 
+# 抽出する項目（全文出力・差分出力のプロンプトで共通）
+_EXTRACTION_ITEMS = """・1. 必要資格（必須・歓迎）
+・2. 必要経験（年数・内容）
+・3. 仕事内容（求人ポジションの具体的な業務）
+・4. 事業概要（会社の事業内容＋事業一覧・主軸事業を統合）
+・5. マーケット成長性（成長度＋なぜ成長しているか背景・要因と競合。高/中/低だけでは不十分）
+・6. 都道府県（勤務地）
+・7. 未経験OKかどうか（○/△/×）
+・8. 年齢（条件）
+・9. 出張ありなし（頻度・範囲）
+・10. 福利厚生（社会保険、手当等）
+・11. 残業時間（残業の状況）
+・12. 採用人数（採用予定人数）
+・13. 手数料（人材紹介手数料、聞けた場合）
+・14. 面接の方式（オンライン/オフライン、形式）
+・15. 面接回数（選考の回数）
+・16. 面接で見ているポイント（面接で重視している点）
+・17. 過去落とした人（落とした人の特徴・理由）
+・18. 受かった人（受かった人の特徴）
+・19. 評価（人事評価制度、評価の仕方）
+・20. キャリアアップ制度（昇格・昇給・キャリアパス）
+・候補者別訴求: ①〜③の採用可否と訴求、大手・中堅・零細出身者向けの一言USP。重複なく記載
+・同エリア差別化: 同都道府県×同セグメントの競合との違いに特化（企業の一般論は差別化メモに書かない）
+"""
+
 
 def _sanitize_filename(name: str) -> str:
     """ファイル名に使える文字に変換"""
@@ -113,21 +279,22 @@ def _extract_company_info_with_claude(
 ) -> str:
     """Claude で文字起こしから法人情報を抽出。都道府県×セグメントで比較可能な形式"""
     try:
-        from anthropic import Anthropic
+        client = get_client()
     except ImportError:
         return ""
-
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
+    if client is None:
         return ""
 
-    client = Anthropic(api_key=api_key)
     source_label = "初回架電" if source_type == "ra" else "法人面談"
+    transcript = prepare_transcript(transcript, "法人情報抽出")
+    transcript, transcript_heading = condense_transcript(client, transcript, TRANSCRIPT_LIMIT, "company")
 
     merge_instruction = ""
     if existing_content:
-        merge_instruction = """
+        merge_instruction = f"""
 【既存の法人情報】
+{existing_content}
+
 上記と文字起こしを照らし合わせ、新規情報を追加・修正してマージした完全版を出力してください。既存で不明な項目は文字起こしから補完。矛盾する場合は新しい情報を優先。
 都道府県・セグメントは必ず出力すること（比較の軸となるため）。
 """
@@ -146,53 +313,26 @@ def _extract_company_info_with_claude(
 {research_text[:8000]}
 """
 
-    user_prompt = f"""以下の「{source_label}の文字起こし」から法人情報を抽出し、指定フォーマットで出力してください。
-会社名は「{company_name or "未確認"}」としてください。
+    # 会社名・文字起こし・検索結果以外は毎回同じなのでキャッシュ対象（出典・日付ごとに共通）
+    user_prefix = f"""以下の「{source_label}の文字起こし」から法人情報を抽出し、指定フォーマットで出力してください。
+会社名は末尾の【対象企業】に記載の会社名としてください。
 
 【重要】都道府県×セグメントで比較するため、以下を厳守してください。
 ・都道府県: 勤務地の都道府県を列挙（例: 愛知, 岐阜, 東京）。複数可
 ・セグメント: 電気系/土木/建築/管工事、DC/再エネ/物流/工場/オフィス/公共/住宅 から該当するものを列挙
 
 【抽出する項目】以下の20項目を必ず抽出。未確認は「未確認」。
-・1. 必要資格（必須・歓迎）
-・2. 必要経験（年数・内容）
-・3. 仕事内容（求人ポジションの具体的な業務）
-・4. 事業概要（会社の事業内容＋事業一覧・主軸事業を統合）
-・5. マーケット成長性（成長度＋なぜ成長しているか背景・要因と競合。高/中/低だけでは不十分）
-・6. 都道府県（勤務地）
-・7. 未経験OKかどうか（○/△/×）
-・8. 年齢（条件）
-・9. 出張ありなし（頻度・範囲）
-・10. 福利厚生（社会保険、手当等）
-・11. 残業時間（残業の状況）
-・12. 採用人数（採用予定人数）
-・13. 手数料（人材紹介手数料、聞けた場合）
-・14. 面接の方式（オンライン/オフライン、形式）
-・15. 面接回数（選考の回数）
-・16. 面接で見ているポイント（面接で重視している点）
-・17. 過去落とした人（落とした人の特徴・理由）
-・18. 受かった人（受かった人の特徴）
-・19. 評価（人事評価制度、評価の仕方）
-・20. キャリアアップ制度（昇格・昇給・キャリアパス）
-・候補者別訴求: ①〜③の採用可否と訴求、大手・中堅・零細出身者向けの一言USP。重複なく記載
-・同エリア差別化: 同都道府県×同セグメントの競合との違いに特化（企業の一般論は差別化メモに書かない）
-{merge_instruction}
-{research_block}
-
-## 文字起こし（抜粋）
-{transcript[:8000]}
-
-## 出力形式（必ずYAML frontmatterから開始）
+{_EXTRACTION_ITEMS}## 出力形式（必ずYAML frontmatterから開始。「（会社名）」は対象企業の会社名に置き換える）
 
 ---
-会社名: "{company_name or "未確認"}"
+会社名: "（会社名）"
 都道府県: ["愛知", "岐阜"]   # 勤務地の都道府県。複数可
 セグメント: ["電気系", "施工管理"]   # 該当セグメント。電気系/土木/建築/管工事/DC/再エネ/物流/工場/オフィス/公共/住宅 から選択
 最終更新: "{datetime.now().strftime("%Y-%m-%d")}"
 出典: {source_label}
 ---
 
-# 法人情報：{company_name or "未確認"}
+# 法人情報：（会社名）
 
 ## 企業情報
 | 項目 | 内容 |
@@ -267,37 +407,188 @@ def _extract_company_info_with_claude(
 
 ## 更新履歴
 - {datetime.now().strftime("%Y-%m-%d")}: {source_label}より抽出
+"""
+
+    user_suffix = f"""【対象企業】
+会社名: {company_name or "未確認"}
+{merge_instruction}
+{research_block}
+
+## {transcript_heading}
+{transcript}
+
+## 法人情報（上記の出力形式で、YAML frontmatterから出力）
 """
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=2048,
-            messages=[{"role": "user", "content": user_prompt}],
-            temperature=0.2,
-        )
-        return (response.content[0].text if response.content else "").strip()
+        with timed("extract_llm"):
+            response = create_message(
+                client,
+                call="法人情報抽出",
+                model=MODEL,
+                max_tokens=2048,
+                messages=[{"role": "user", "content": cached_prompt_content(user_prefix, user_suffix)}],
+                temperature=0.2,
+            )
+        log_usage("法人情報抽出", response)
+        return response_text(response)
     except Exception as e:
         logger.warning("法人情報抽出（Claude）失敗: %s", e)
         return ""
 
 
+def _delta_enabled() -> bool:
+    """差分抽出（変更項目のみ JSON で返させる）を使うか。RAFB_MASTER_DELTA=0 で従来の全文出力"""
+    return os.environ.get("RAFB_MASTER_DELTA", "1") != "0"
+
+
+def _extract_delta_with_claude(
+    transcript: str,
+    company_name: str,
+    source_type: str,
+    record: dict,
+    research_text: Optional[str] = None,
+) -> Optional[dict]:
+    """Claude で文字起こしから法人マスタの差分（新規・変更のあった項目のみ）を抽出。失敗時は None"""
+    try:
+        client = get_client()
+    except ImportError:
+        return None
+    if client is None:
+        return None
+
+    source_label = "初回架電" if source_type == "ra" else "法人面談"
+    transcript = prepare_transcript(transcript, "法人情報抽出")
+    transcript, transcript_heading = condense_transcript(client, transcript, TRANSCRIPT_LIMIT, "company")
+
+    research_block = ""
+    if research_text:
+        research_block = f"""
+【Web検索で取得した事業・マーケット・企業情報】
+文字起こしにない企業情報の項目（事業概要、マーケット成長性、法人HP URL、売上構成比、今後の注力領域、
+企業スナップショット、前職規模別USP、採用意思決定者、口コミ評価傾向）と「休日・直行直帰・リモート」は
+以下から補完すること。
+
+{research_text[:8000]}
+"""
+
+    # 会社名・現在の法人マスタ・文字起こし・検索結果以外は毎回同じなのでキャッシュ対象
+    user_prefix = f"""以下の「{source_label}の文字起こし」から法人情報を抽出し、末尾の【現在の法人マスタ】に対する差分を
+update_master ツールで返してください。
+
+【差分のルール】
+・新しく分かった項目、内容が変わった・詳しくなった項目だけを返す。現在と同じ内容の項目、確認できない項目は返さない
+・値は1行で簡潔に（改行・表は使わない）。既存の値を直す場合は、既存の有効な内容も含めた新しい値を返す
+・矛盾する場合は新しい情報を優先する
+・都道府県・セグメント・差別化メモは追加する分だけを返す
+・都道府県: 勤務地の都道府県（例: 愛知, 岐阜, 東京）
+・セグメント: 電気系/土木/建築/管工事、DC/再エネ/物流/工場/オフィス/公共/住宅 から該当するもの
+
+【抽出する項目】
+{_EXTRACTION_ITEMS}"""
+
+    current = compact_record(record)
+    user_suffix = f"""【対象企業】
+会社名: {company_name or "未確認"}
+
+【現在の法人マスタ】
+{json.dumps(current, ensure_ascii=False) if current else "（新規。登録済みの項目なし）"}
+{research_block}
+## {transcript_heading}
+{transcript}
+"""
+
+    try:
+        with timed("extract_llm"):
+            response = create_message(
+                client,
+                call="法人情報抽出",
+                model=MODEL,
+                max_tokens=2048,
+                messages=[{"role": "user", "content": cached_prompt_content(user_prefix, user_suffix)}],
+                tools=[delta_tool()],
+                tool_choice={"type": "tool", "name": "update_master"},
+                temperature=0.2,
+            )
+        log_usage("法人情報抽出（差分）", response, call="法人情報抽出")
+    except Exception as e:
+        logger.warning("法人情報抽出（Claude・差分）失敗: %s", e)
+        return None
+    delta = tool_input(response, "update_master")
+    if delta is None:
+        logger.warning("法人情報抽出（差分）: update_master の出力がありません")
+    return delta
+
+
+def _update_catalog(filepath: Path) -> None:
+    """法人マスタ書き込み後にカタログへ反映（失敗しても次回の差分同期で拾われる）"""
+    try:
+        get_catalog(MASTER_DIR).upsert(filepath)
+    except Exception as e:
+        logger.debug("カタログ更新失敗 %s: %s", filepath.name, e)
+
+
+def _write_master_markdown(filepath: Path, content: str) -> str:
+    """Claude が出力したマスタ全文を dict に変換して保存（解析できなければ本文のまま保存）"""
+    rec = parse_master(content)
+    if rec is not None and rec.meta.get("会社名"):
+        return save_master(filepath, record_from_master(rec))
+    filepath.write_text(content, encoding="utf-8")
+    sidecar_path(filepath).unlink(missing_ok=True)
+    return content
+
+
+def _is_extracted(filepath: Path, transcript_hash: str) -> bool:
+    """マニフェストに抽出済みと記録され、法人マスタがその後に書き換えられていないか"""
+    try:
+        master_text = filepath.read_text(encoding="utf-8")
+    except OSError:
+        return False
+    return is_extracted(filepath.stem, transcript_hash, EXTRACTION_PROMPT_VERSION, master_text)
+
+
+def _transcript_hash(transcript: str, source_type: str) -> str:
+    return content_hash(f"{source_type}\n{transcript}")
+
+
+def is_company_info_current(transcript: str, company_name: str, source_type: str = "ra") -> bool:
+    """この文字起こしが現行プロンプト版数で法人マスタに反映済みか（マニフェスト参照）"""
+    filepath = MASTER_DIR / f"{_sanitize_filename(company_name or '未設定')}.md"
+    if not filepath.exists():
+        return False
+    return _is_extracted(filepath, _transcript_hash(transcript, source_type))
+
+
 def extract_and_save_company_info(
     transcript: str,
     company_name: str = "",
     source_type: str = "ra",
     use_research: bool = True,
+    refresh_research: bool = False,
+    force: bool = False,
+    source_path: Optional[Path] = None,
+    deadline: Optional[Deadline] = None,
 ) -> Optional[Path]:
     """
     FB の文字起こしから法人情報を抽出し、法人マスタに格納する。
     都道府県×セグメントで比較可能な形式（YAML frontmatter付き）。
-    use_research=True の場合、会社名から Web 検索で事業・マーケット情報を補足する。
+    use_research=True の場合、会社名から Web 検索で事業・マーケット情報を補足する
+    （既存のマスタがあれば、埋まっていない項目に対応するクエリだけを投げる）。
+    同じ文字起こしを同じプロンプト版数で抽出済みなら、リサーチ・抽出をスキップする。
+    既定では Claude に変更のあった項目だけを返させ、既存のマスタに反映する（RAFB_MASTER_DELTA=0 で全文出力。
+    解析できない既存のマスタも、空から作り直して中身を失わないよう全文出力で更新する）。
+    deadline（ジョブの締め切り）があれば残り時間に応じてリサーチを縮小・省略する。抽出は FB の投稿を
+    遅らせない（並行して実行される）ため、締め切りを過ぎていても省略しない。
 
     Args:
         transcript: 文字起こし
         company_name: 会社名（空の場合は文字起こしから推測）
         source_type: "ra"（初回架電） or "ca"（法人面談）
         use_research: Web検索で事業リサーチを実行するか（デフォルト True）
+        refresh_research: リサーチキャッシュを使わず再検索するか
+        force: 抽出済みでも再抽出するか
+        source_path: 文字起こしファイルのパス（マニフェストへの記録用）
+        deadline: ジョブの締め切り（FB 投稿の SLA）
 
     Returns:
         保存したファイルパス。失敗時は None
@@ -310,26 +601,60 @@ def extract_and_save_company_info(
     if not company_name or not company_name.strip():
         company_name = "未設定"
 
+    filepath = MASTER_DIR / f"{_sanitize_filename(company_name)}.md"
+    transcript_hash = _transcript_hash(transcript, source_type)
+    if not force and filepath.exists() and _is_extracted(filepath, transcript_hash):
+        logger.info("抽出済みのためスキップ: %s", filepath.name)
+        return filepath
+
+    existing = load_record(filepath) if filepath.exists() else None
     research_text: Optional[str] = None
     if use_research and company_name not in ("未設定", "未確認"):
-        research_text = _research_company_online(company_name)
+        # 既存のマスタで埋まっている項目のクエリは投げない
+        with timed("research"):
+            research_text = _research_company_online(
+                company_name, refresh=refresh_research, record=existing, deadline=deadline
+            )
 
-    existing_content = None
-    filepath = MASTER_DIR / f"{_sanitize_filename(company_name)}.md"
-    if filepath.exists():
-        existing_content = filepath.read_text(encoding="utf-8")
-
-    content = _extract_company_info_with_claude(
-        transcript,
-        company_name,
-        source_type,
-        existing_content,
-        research_text=research_text,
-    )
-    if not content:
+    record: Optional[dict] = None
+    content: Optional[str] = None
+    use_delta = _delta_enabled()
+    if use_delta and existing is None and filepath.exists():
+        # 解析できないマスタ（frontmatter なし等）を空の dict から作り直すと中身が消えるため、全文出力で更新する
+        logger.warning("法人マスタを解析できないため全文出力で更新します: %s", filepath.name)
+        use_delta = False
+    if use_delta:
+        # 変更のあった項目だけを受け取り、既存のマスタ（dict）に反映する
+        record = existing or empty_record(company_name)
+        delta = _extract_delta_with_claude(transcript, company_name, source_type, record, research_text=research_text)
+        if delta is None:
+            return None
+        source_label = "初回架電" if source_type == "ra" else "法人面談"
+        record, changed = apply_delta(record, delta, source_label, datetime.now().strftime("%Y-%m-%d"))
+        logger.info("法人マスタに差分を反映: %s（%d 項目）", filepath.name, changed)
+    else:
+        existing_content = None
+        if filepath.exists():
+            try:
+                existing_content = filepath.read_text(encoding="utf-8")
+            except UnicodeDecodeError as e:
+                logger.error("法人マスタを読めないため更新しません: %s（%s）", filepath.name, e)
+                return None
+        content = _extract_company_info_with_claude(
+            transcript,
+            company_name,
+            source_type,
+            existing_content,
+            research_text=research_text,
+        )
+    if record is None and not content:
         return None
 
-    filepath.write_text(content, encoding="utf-8")
+    with timed("master_write"):
+        # dict をサイドカーに保存し、Markdown はそこから生成する
+        content = save_master(filepath, record) if record is not None else _write_master_markdown(filepath, content)
+        record_extraction(filepath.stem, transcript_hash, EXTRACTION_PROMPT_VERSION, content, source_path)
+        _update_catalog(filepath)
     return filepath
 
 
@@ -343,18 +668,21 @@ SUPPLEMENT_KEYS = [
 SUPPLEMENT_KEY_WORKSTYLE = "休日・直行直帰・リモート"  # 労働条件セクション
 
 
-def _needs_supplement(body: str) -> bool:
-    """企業スナップショット等の補完が必要か判定"""
-    if not _extract_table_value(body, "企業スナップショット"):
+def _needs_supplement(record: dict | str | MasterRecord) -> bool:
+    """企業スナップショット等の補完が必要か判定（法人マスタの dict を参照）"""
+    if not isinstance(record, dict):
+        record = record_from_master(record if isinstance(record, MasterRecord) else parse_body(record))
+    fields, appeal = record["fields"], record["訴求"]
+    if not fields.get("企業スナップショット"):
         return True
-    if "前職規模別" not in body and "大手出身者向け" not in body:
+    if not fields.get("前職規模別USP") and not any((appeal.get(seg) or {}).get("訴求") for seg in SIZE_SEGMENTS):
         return True
-    if "採用意思決定者" not in body:
+    if not fields.get("採用意思決定者"):
         return True
-    if "口コミ" not in body and "OpenWork" not in body:
+    if not fields.get("口コミ評価傾向"):
         return True
     workstyle_keys = (SUPPLEMENT_KEY_WORKSTYLE, "休日数・直行直帰・リモート可否", "休日数", "リモート可否")
-    if not any(_extract_table_value(body, k) for k in workstyle_keys):
+    if not any(fields.get(k) for k in workstyle_keys):
         return True
     return False
 
@@ -365,16 +693,15 @@ def _supplement_from_research_with_claude(
     research_text: str,
 ) -> str:
     """既存法人情報に検索結果から不足項目を補完。Claudeでマージ。"""
+    if not research_text:
+        return ""
     try:
-        from anthropic import Anthropic
+        client = get_client()
     except ImportError:
         return ""
-
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key or not research_text:
+    if client is None:
         return ""
 
-    client = Anthropic(api_key=api_key)
     user_prompt = f"""以下の既存法人情報があります。Web検索結果から、不足している項目を補完してマージした完全版を出力してください。
 
 【補完対象項目】## 企業情報 セクションに以下を追加・更新。既存テーブルに統合すること。
@@ -395,13 +722,17 @@ def _supplement_from_research_with_claude(
 """
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            messages=[{"role": "user", "content": user_prompt}],
-            temperature=0.2,
-        )
-        return (response.content[0].text if response.content else "").strip()
+        with timed("supplement_llm"):
+            response = create_message(
+                client,
+                call="法人情報補完",
+                model=MODEL,
+                max_tokens=4096,
+                messages=[{"role": "user", "content": user_prompt}],
+                temperature=0.2,
+            )
+        log_usage("法人情報補完", response)
+        return response_text(response)
     except Exception as e:
         logger.warning("法人情報抽出（Claude・リサーチ付き）失敗: %s", e)
         return ""
@@ -409,6 +740,7 @@ def _supplement_from_research_with_claude(
 
 def supplement_company_master_from_research(
     company_name_or_path: str | Path,
+    refresh_research: bool = False,
 ) -> Optional[Path]:
     """
     法人マスタの不足項目（企業スナップショット等）をWeb検索で補完。
@@ -416,6 +748,7 @@ def supplement_company_master_from_research(
 
     Args:
         company_name_or_path: 会社名 または 法人マスタファイルパス
+        refresh_research: リサーチキャッシュを使わず再検索するか
 
     Returns:
         更新したファイルパス。補完不要・失敗時は None
@@ -432,48 +765,35 @@ def supplement_company_master_from_research(
         if not filepath.exists():
             return None
 
-    content = filepath.read_text(encoding="utf-8")
-    if not content.strip().startswith("---"):
+    record = load_record(filepath)
+    if record is None:
         return None
-    parts = content.split("---", 2)
-    if len(parts) < 3:
-        return None
-    body = parts[2].strip()
 
-    if not _needs_supplement(body):
+    if not _needs_supplement(record):
         return filepath  # 補完不要
 
-    research_text = _research_company_online(company_name)
+    # 補完対象のうち未確認の項目を埋めるクエリだけを投げる
+    with timed("research"):
+        research_text = _research_company_online(
+            company_name,
+            refresh=refresh_research,
+            record=record,
+            targets=SUPPLEMENT_KEYS + [SUPPLEMENT_KEY_WORKSTYLE],
+        )
     if not research_text:
         return filepath
 
+    content = filepath.read_text(encoding="utf-8")
     merged = _supplement_from_research_with_claude(content, company_name, research_text)
     if not merged or "---" not in merged:
         return None
 
-    filepath.write_text(merged, encoding="utf-8")
+    content = _write_master_markdown(filepath, merged)
+    update_master_hash(filepath.stem, content)
+    _update_catalog(filepath)
     return filepath
 
 
-def _parse_frontmatter_simple(fm_text: str) -> dict:
-    """簡易YAML frontmatterパース（PyYAML不要）"""
-    meta = {}
-    for line in fm_text.splitlines():
-        line = line.strip()
-        if ":" not in line or line.startswith("#"):
-            continue
-        key, _, val = line.partition(":")
-        key = key.strip()
-        val = val.strip().strip('"\'')
-        if key in ("都道府県", "セグメント") and val.startswith("["):
-            # ["愛知", "岐阜"] 形式
-            items = re.findall(r'["\']([^"\']+)["\']', val)
-            meta[key] = [i.strip() for i in items if i.strip()]
-        else:
-            meta[key] = val
-    return meta
-
-
 def list_companies_by_region_segment(
     prefecture: str,
     segment: str,
@@ -486,54 +806,27 @@ def list_companies_by_region_segment(
         segment: セグメント（電気系、土木、DC、再エネ 等）
 
     Returns:
-        [{path, meta, body}, ...]
+        [{path, meta, body, fields, record}, ...]（カタログの索引で検索。body は frontmatter を除いた Markdown）
     """
-    results = []
-    if not MASTER_DIR.exists():
-        return results
-
     prefecture = (prefecture or "").strip()
     segment = (segment or "").strip()
-    if not prefecture or not segment:
-        return results
-
-    for f in MASTER_DIR.glob("*.md"):
-        if f.name.startswith("_"):
-            continue
-        try:
-            text = f.read_text(encoding="utf-8")
-            if not text.strip().startswith("---"):
-                continue
-            parts = text.split("---", 2)
-            if len(parts) < 3:
-                continue
-            meta = _parse_frontmatter_simple(parts[1])
-            body = parts[2].strip()
-
-            prefs = meta.get("都道府県") or []
-            segs = meta.get("セグメント") or []
-            if isinstance(prefs, str):
-                prefs = [p.strip() for p in prefs.replace("、", ",").split(",") if p.strip()]
-            if isinstance(segs, str):
-                segs = [s.strip() for s in segs.replace("、", ",").split(",") if s.strip()]
-
-            if prefecture in prefs and segment in segs:
-                results.append({"path": f, "meta": meta, "body": body})
-        except Exception as e:
-            logger.debug("法人マスタ解析スキップ %s: %s", f.name, e)
-            continue
-
-    return results
+    if not prefecture or not segment or not MASTER_DIR.exists():
+        return []
+    rows = get_catalog(MASTER_DIR).find(prefecture, segment)
+    for row in rows:
+        row["body"] = _master_body(row["path"], row["record"])
+    return rows
 
 
-def _extract_table_value(body: str, key: str) -> str:
-    """本文からマークダウンテーブルの項目値を抽出"""
-    pattern = rf"\|\s*{re.escape(key)}\s*\|\s*([^\n|]+?)\s*\|"
-    m = re.search(pattern, body)
-    if m:
-        val = m.group(1).strip()
-        return val if val and val != "未確認" else ""
-    return ""
+def _master_body(path: Path, record: dict) -> str:
+    """法人マスタの本文（frontmatter を除いた Markdown）。カタログは本文を持たないのでファイルから読む"""
+    try:
+        parts = split_master(path.read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError):
+        parts = None
+    if parts is None:
+        parts = split_master(render_master(record))
+    return parts[1].strip()
 
 
 def collect_attract_examples_from_masters() -> List[dict]:
@@ -545,47 +838,34 @@ def collect_attract_examples_from_masters() -> List[dict]:
     if not MASTER_DIR.exists():
         return results
 
-    for f in MASTER_DIR.glob("*.md"):
-        if f.name.startswith("_") or f.name in ("マスタ項目一覧.md", "README.md"):
-            continue
-        try:
-            text = f.read_text(encoding="utf-8")
-            if not text.strip().startswith("---"):
-                continue
-            parts = text.split("---", 2)
-            if len(parts) < 3:
-                continue
-            meta = _parse_frontmatter_simple(parts[1])
-            body = parts[2]
-
-            company_name = meta.get("会社名", f.stem)
-            segs = meta.get("セグメント") or []
-            if isinstance(segs, str):
-                segs = [s.strip() for s in segs.replace("、", ",").split(",") if s.strip()]
-
-            growth = (
-                _extract_table_value(body, "マーケット成長性")
-                or _extract_table_value(body, "マーケットの成長性・競合")
-                or _extract_table_value(body, "マーケットの成長度合い")
-            )
-            strategy = (
-                _extract_table_value(body, "今後の注力領域")
-                or _extract_table_value(body, "事業概要")
-                or _extract_table_value(body, "事業一覧・主軸事業")
-            )
-            if not growth and not strategy:
-                continue
-
-            results.append({
-                "company_name": company_name,
-                "segments": segs,
-                "growth": growth,
-                "strategy": strategy,
-            })
-        except Exception as e:
-            logger.debug("法人マスタ収集スキップ %s: %s", f.name, e)
+    for row in get_catalog(MASTER_DIR).all():
+        record = row["record"]
+        fields = record["fields"]
+        company_name = record["会社名"]
+        segs = record["セグメント"]
+
+        growth = (
+            fields.get("マーケット成長性")
+            or fields.get("マーケットの成長性・競合")
+            or fields.get("マーケットの成長度合い")
+            or ""
+        )
+        strategy = (
+            fields.get("今後の注力領域")
+            or fields.get("事業概要")
+            or fields.get("事業一覧・主軸事業")
+            or ""
+        )
+        if not growth and not strategy:
             continue
 
+        results.append({
+            "company_name": company_name,
+            "segments": segs,
+            "growth": growth,
+            "strategy": strategy,
+        })
+
     return results
 
 
@@ -700,6 +980,23 @@ def update_playbook_from_masters() -> Optional[Path]:
     return playbook_path
 
 
+def _compare_section(record: dict) -> List[str]:
+    """比較用に1社分の確認済み項目・候補者別訴求・差別化メモを並べる（未確認は省く）"""
+    lines = ["| 項目 | 内容 |", "|------|------|"]
+    lines += [f"| {k} | {v} |" for k, v in record["fields"].items() if k != "会社名"]
+    appeal = record["訴求"]
+    rows = [seg for seg in APPEAL_SEGMENTS if appeal.get(seg)] + [seg for seg in appeal if seg not in APPEAL_SEGMENTS]
+    if rows:
+        lines += ["", f"**{APPEAL_SECTION}**", "", "| セグメント | 採用 | 訴求・差別化 |", "|------------|------|--------------|"]
+        for seg in rows:
+            adopt = "-" if seg in SIZE_SEGMENTS else (appeal[seg].get("採用") or "未確認")
+            lines.append(f"| {seg} | {adopt} | {appeal[seg].get('訴求') or '未確認'} |")
+    if record["差別化メモ"]:
+        lines += ["", f"**{MEMO_SECTION}**", ""]
+        lines += [f"- {m}" for m in record["差別化メモ"]]
+    return lines
+
+
 def compare_companies(prefecture: str, segment: str) -> str:
     """
     都道府県×セグメントで法人を比較し、差別化を出力。
@@ -717,11 +1014,10 @@ def compare_companies(prefecture: str, segment: str) -> str:
         "",
     ]
     for i, c in enumerate(companies, 1):
-        meta = c.get("meta") or {}
-        name = meta.get("会社名", c["path"].stem)
-        lines.append(f"## {i}. {name}")
+        record = c["record"]
+        lines.append(f"## {i}. {record['表示名'] or record['会社名']}")
         lines.append("")
-        lines.append(c.get("body", "")[:2000])
+        lines.extend(_compare_section(record))
         lines.append("")
         lines.append("---")
         lines.append("")
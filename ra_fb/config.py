@@ -5,10 +5,47 @@ from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
 
+
+def load_env() -> None:
+    """ .env を読み込み"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(ROOT / ".env")
+        return
+    except ImportError:
+        pass
+    env_file = ROOT / ".env"
+    if env_file.exists():
+        for line in env_file.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                key, _, val = line.partition("=")
+                os.environ.setdefault(key.strip(), val.strip())
+
+
+def env_int(name: str, default: int) -> int:
+    """環境変数を整数で読む（未設定・不正な値なら default）"""
+    try:
+        return int(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """環境変数を小数で読む（未設定・不正な値なら default）"""
+    try:
+        return float(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+# RAFB_OUTPUT_DIR・RAFB_STATE_DIR を .env でも指定できるよう、パスを決める前に読み込む（既に設定済みの環境変数が優先）
+load_env()
+
 # パス定数（一箇所で管理）
 DATA_DIR = ROOT / "data"
 INPUT_DIR = DATA_DIR / "input"
-OUTPUT_DIR = DATA_DIR / "output"
+OUTPUT_DIR = Path(os.environ.get("RAFB_OUTPUT_DIR") or DATA_DIR / "output")  # ベンチマーク等で差し替え可
 REF_DIR = ROOT / "references"
 
 # 入力データ
@@ -18,6 +55,9 @@ CA_DIR = INPUT_DIR / "ca"  # 法人面談（CA）議事録
 # 出力データ
 MASTER_DIR = OUTPUT_DIR / "法人マスタ"  # 法人情報（FB生成時に自動格納）
 
+# 実行時の状態（ジョブキュー・キャッシュ等。git 管理外）
+STATE_DIR = Path(os.environ.get("RAFB_STATE_DIR") or DATA_DIR / "state")
+
 # 参照資料
 MANUAL_DIR = REF_DIR / "manual"  # 架電マニュアル・PSS
 CANDIDATE_ATTRACT_DIR = REF_DIR / "candidate_attract"  # 候補者アトラクト
@@ -29,20 +69,3 @@ SEGMENT_ORDER = [
     "DC", "再エネ", "物流", "工場", "オフィス", "公共", "住宅",
     "商業施設", "自衛隊", "その他",
 ]
-
-
-def load_env() -> None:
-    """ .env を読み込み"""
-    try:
-        from dotenv import load_dotenv
-        load_dotenv(ROOT / ".env")
-        return
-    except ImportError:
-        pass
-    env_file = ROOT / ".env"
-    if env_file.exists():
-        for line in env_file.read_text(encoding="utf-8").splitlines():
-            line = line.strip()
-            if line and not line.startswith("#") and "=" in line:
-                key, _, val = line.partition("=")
-                os.environ.setdefault(key.strip(), val.strip())
@@ -0,0 +1,28 @@
+"""SQLite 接続の共通処理（ジョブキュー・キャッシュ等の状態保存用）"""
+
+from __future__ import annotations
+
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+@contextmanager
+def connect(path: Path, schema: str = "") -> Iterator[sqlite3.Connection]:
+    """SQLite に接続し、ブロック終了時に commit（例外時は rollback）して閉じる。
+
+    スレッドごとに接続を開く前提。WAL モードで読み書きの競合を減らす。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        if schema:
+            conn.executescript(schema)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
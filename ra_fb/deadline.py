@@ -0,0 +1,95 @@
+"""ジョブの締め切り（受付から FB 投稿までの SLA）
+
+1件のジョブに Deadline を1つ作り、FB 生成・Web リサーチ・法人情報抽出に渡す。
+残り時間が足りないときは任意のステージを省略・縮小し（Web リサーチ、FB 用の長い文字起こしの
+区間抽出）、FB の生成と Slack 投稿を優先する。FB の Claude API 呼び出しには残り時間をタイムアウトとして渡す。
+法人情報の抽出は FB と並行に動き投稿を遅らせないため、省略しない（リサーチだけを縮小する）。省略・縮小したステージはログに出し、ジョブ結果の degraded に残す。
+
+締め切りは RAFB_JOB_SLA 秒（既定 180 秒、0 で無効）。Slack からの受付はキュー待ちの時間も含めて数える。
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from typing import List, Optional
+
+from .config import env_float
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLA = 180.0
+MIN_CALL_TIMEOUT = 60.0  # Claude の呼び出しは締め切りを過ぎていてもこれだけは待つ（途中で打ち切ると FB が得られないため）
+CLIENT_TIMEOUT = 120.0  # llm.DEFAULT_TIMEOUT と同じ
+RESEARCH_RESERVE = 60.0  # リサーチ後の法人情報抽出のために残す秒数
+MIN_RESEARCH_SECONDS = 5.0  # リサーチに使える時間がこれ未満なら省略
+CONDENSE_RESERVE = 60.0  # 長い文字起こしの区間抽出（＋本番の呼び出し）に必要な秒数。未満なら先頭で切り詰める
+
+
+class Deadline:
+    """1ジョブの締め切り。seconds が None（または 0 以下）なら締め切りなし。スレッドセーフ"""
+
+    def __init__(self, seconds: Optional[float] = None, started_at: Optional[float] = None, label: str = "") -> None:
+        self.seconds = seconds if seconds and seconds > 0 else None
+        self.started_at = time.time() if started_at is None else started_at  # 受付時刻（エポック秒）
+        self.label = label
+        self._lock = threading.Lock()
+        self._degraded: List[str] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.seconds is not None
+
+    def remaining(self) -> float:
+        """残り秒数（締め切りなしなら inf、過ぎていれば負）"""
+        if self.seconds is None:
+            return math.inf
+        return self.started_at + self.seconds - time.time()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows(self, seconds: float) -> bool:
+        """残り時間が seconds 以上あるか"""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap: Optional[float] = None, floor: float = MIN_CALL_TIMEOUT) -> Optional[float]:
+        """呼び出しに渡すタイムアウト秒（残り時間。ただし floor 以上・cap 以下）。締め切りなしなら cap"""
+        if self.seconds is None:
+            return cap
+        t = max(self.remaining(), floor)
+        return t if cap is None else min(t, cap)
+
+    def degrade(self, stage: str, action: str = "省略") -> None:
+        """締め切りのためにステージを省略・縮小したことを記録"""
+        with self._lock:
+            self._degraded.append(stage)
+        METRICS.degraded(stage)
+        logger.warning("締め切りのため %s を%s(%s, 残り %.1fs)", stage, action, self.label or "-", self.remaining())
+
+    @property
+    def degraded(self) -> List[str]:
+        with self._lock:
+            return list(self._degraded)
+
+
+def job_sla() -> float:
+    """RAFB_JOB_SLA（秒）。0 以下は締め切りなし"""
+    return env_float("RAFB_JOB_SLA", DEFAULT_SLA)
+
+
+def job_deadline(started_at: Optional[float] = None, label: str = "") -> Deadline:
+    """RAFB_JOB_SLA に従うジョブの締め切り。started_at は受付時刻（省略時は今）"""
+    return Deadline(job_sla(), started_at=started_at, label=label)
+
+
+def call_timeout(deadline: Optional[Deadline]) -> dict:
+    """create_message に渡す追加の引数。残り時間がクライアントのタイムアウト（ANTHROPIC_TIMEOUT）より短いときだけ timeout を渡す"""
+    if deadline is None or not deadline.enabled:
+        return {}
+    limit = env_float("ANTHROPIC_TIMEOUT", CLIENT_TIMEOUT)
+    t = deadline.timeout(limit)
+    return {"timeout": t} if t < limit else {}
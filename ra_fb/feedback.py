@@ -5,86 +5,93 @@ from __future__ import annotations
 import logging
 import os
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional
 
 from .config import load_env, MANUAL_DIR, CANDIDATE_ATTRACT_DIR, LONG_CALLS_DIR, CA_DIR
+from .deadline import Deadline, call_timeout
+from .llm import MODEL, cached_prompt_content, create_message, get_client, log_usage, response_text
+from .long_transcript import condense_transcript
+from .metrics import timed
+from .references import ReferenceSpec, get_reference_store
+from .transcript import prepare_transcript
 
 load_env()
 logger = logging.getLogger(__name__)
 
+TRANSCRIPT_LIMIT = 12000  # 1回の呼び出しに入れる文字起こしの上限（超える場合は区間ごとに抽出してまとめる）
 
-def _load_candidate_attract() -> str:
-    """候補者アトラクト（会社の魅力の伝え方）を読み込む。
-    セクション5（法人別事例）は除外し、訴求軸・候補者タイプ×セグメントのみ（トークン削減）。
-    """
+
+def _strip_playbook_examples(text: str) -> str:
+    """セクション5（法人別事例）は除外し、訴求軸・候補者タイプ×セグメントのみ（トークン削減）"""
+    if "## 5." in text:
+        text = text.split("## 5.")[0].rstrip()
+    return text
+
+
+def _candidate_attract_path() -> Path:
+    """候補者アトラクト（会社の魅力の伝え方）のパス。SALES_FB_AGENT_PATH を優先"""
     sales_path = os.environ.get("SALES_FB_AGENT_PATH")
     if sales_path:
         p = Path(sales_path) / "reference" / "domain" / "construction" / "04-recruitment-playbook.md"
         if p.exists():
-            text = p.read_text(encoding="utf-8")
-            if "## 5." in text:
-                text = text.split("## 5.")[0].rstrip()
-            return text[:6000]
-    p = CANDIDATE_ATTRACT_DIR / "recruitment-playbook.md"
-    if p.exists():
-        text = p.read_text(encoding="utf-8")
-        if "## 5." in text:
-            text = text.split("## 5.")[0].rstrip()
-        return text[:6000]
-    return ""
+            return p
+    return CANDIDATE_ATTRACT_DIR / "recruitment-playbook.md"
 
 
-def _load_references_ra() -> Dict[str, str]:
+def _load_candidate_attract() -> str:
+    """候補者アトラクト（会社の魅力の伝え方）を読み込む。
+    セクション5（法人別事例）は除外し、訴求軸・候補者タイプ×セグメントのみ（トークン削減）。
+    """
+    return get_reference_store().read(_candidate_attract_path(), 6000, _strip_playbook_examples)
+
+
+def _ra_reference_specs() -> List[ReferenceSpec]:
     """RA 用リファレンス（トークン削減版：要点・抜粋を使用）"""
-    refs = {}
-    paths = {
-        "manual": MANUAL_DIR / "架電マニュアル_要点.md",
-        "pss": MANUAL_DIR / "PSS_要点.md",
-        "reception": LONG_CALLS_DIR / "受付突破_断りパターンと繋ぎ方.md",
-        "kadai": LONG_CALLS_DIR / "茂野vs小山田_課題整理.md",
-        "kadai2": LONG_CALLS_DIR / "小山田vs大城_課題整理.md",
-    }
-    limits = {"manual": 5000, "pss": 3000, "reception": 4000, "kadai": 4000, "kadai2": 3000}
-    for key, p in paths.items():
-        if p.exists():
-            refs[key] = p.read_text(encoding="utf-8")[: limits.get(key, 8000)]
-    attract = _load_candidate_attract()
-    if attract:
-        refs["attract"] = attract
-    return refs
+    return [
+        ("manual", MANUAL_DIR / "架電マニュアル_要点.md", 5000, None),
+        ("pss", MANUAL_DIR / "PSS_要点.md", 3000, None),
+        ("reception", LONG_CALLS_DIR / "受付突破_断りパターンと繋ぎ方.md", 4000, None),
+        ("kadai", LONG_CALLS_DIR / "茂野vs小山田_課題整理.md", 4000, None),
+        ("kadai2", LONG_CALLS_DIR / "小山田vs大城_課題整理.md", 3000, None),
+        ("attract", _candidate_attract_path(), 6000, _strip_playbook_examples),
+    ]
 
 
-def _load_references_ca() -> Dict[str, str]:
+def _ca_reference_specs() -> List[ReferenceSpec]:
     """CA 用リファレンス"""
-    refs = {}
-    paths = {
-        "template": CA_DIR / "_template_議事録.md",
-        "manual": MANUAL_DIR / "架電マニュアル_要点.md",
-    }
-    for key, p in paths.items():
-        if p.exists():
-            refs[key] = p.read_text(encoding="utf-8")[:8000]
-    return refs
+    return [
+        ("template", CA_DIR / "_template_議事録.md", 8000, None),
+        ("manual", MANUAL_DIR / "架電マニュアル_要点.md", 8000, None),
+    ]
+
+
+def _load_references_ra() -> Dict[str, str]:
+    """RA 用リファレンス（キャッシュ済み）"""
+    return get_reference_store().bundle("ra", _ra_reference_specs())[0]
+
+
+def _load_references_ca() -> Dict[str, str]:
+    """CA 用リファレンス（キャッシュ済み）"""
+    return get_reference_store().bundle("ca", _ca_reference_specs())[0]
 
 
-def _generate_ra_with_claude(transcript: str, refs: Dict[str, str], ra_name: str = "") -> str:
-    """Claude API で RA FB を生成"""
+def _generate_ra_with_claude(
+    transcript: str, ref_text: str, ra_name: str = "", deadline: Optional[Deadline] = None
+) -> str:
+    """Claude API で RA FB を生成。deadline があれば残り時間をタイムアウトにする"""
     try:
-        from anthropic import Anthropic
+        client = get_client()
     except ImportError:
         return _template_ra(ra_name)
-
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
+    if client is None:
         logger.warning("ANTHROPIC_API_KEY が未設定です。.env に設定するとAIが自動で記入します。")
         return "※ ANTHROPIC_API_KEY が未設定です。.env に設定して再実行してください。\n\n" + _template_ra(ra_name)
 
-    client = Anthropic(api_key=api_key)
-    ref_text = "\n\n---\n\n".join(f"【{k}】\n{v}" for k, v in refs.items())
-
+    transcript = prepare_transcript(transcript, "RA FB")
+    transcript, transcript_heading = condense_transcript(client, transcript, TRANSCRIPT_LIMIT, "ra", deadline)
     system_prompt = "あなたは人材紹介営業の架電フィードバック専門家です。PSS（オープニング・プロービング・サポーティング・クロージング）の観点を活用し、評価は厳しく、指摘を具体的に。過度に褒めず、聞けていない点・改善すべき点を明確に指摘します。"
 
-    user_prompt = f"""あなたは人材紹介営業（電気工事士・施工管理）の架電フィードバック担当です。
+    user_prefix = f"""あなたは人材紹介営業（電気工事士・施工管理）の架電フィードバック担当です。
 以下の「初回架電の文字起こし」を、リファレンスに基づいて評価し、RA向けのフィードバックを出力してください。
 
 【リファレンスの活用】
@@ -111,44 +118,48 @@ def _generate_ra_with_claude(transcript: str, refs: Dict[str, str], ra_name: str
 【6. この会社の魅力を候補者に伝える時に、どう伝えるといいか】attract を参照し、この企業のセグメント・候補者タイプに合わせた訴求の軸・言い回しを具体的に
 【7. 全体所感】
 
-## 文字起こし（出力に含めない）
-{transcript[:12000]}
+"""
+    # 文字起こし以外（system・リファレンス・出力形式）は毎回同じなのでキャッシュ対象
+    user_suffix = f"""## {transcript_heading}（出力に含めない）
+{transcript}
 
 ## フィードバック（上記形式でプレーンテキストで出力）
 """
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}],
-            temperature=0.3,
-        )
-        return (response.content[0].text if response.content else "").strip()
+        with timed("fb_llm"):
+            response = create_message(
+                client,
+                call="RA FB",
+                model=MODEL,
+                max_tokens=4096,
+                system=system_prompt,
+                messages=[{"role": "user", "content": cached_prompt_content(user_prefix, user_suffix)}],
+                temperature=0.3,
+                **call_timeout(deadline),
+            )
+        log_usage("RA FB", response)
+        return response_text(response)
     except Exception as e:
         logger.exception("RA FB 生成エラー")
         return f"[AI生成エラー: {e}]\n\n" + _template_ra(ra_name)
 
 
-def _generate_ca_with_claude(transcript: str, refs: Dict[str, str]) -> str:
-    """Claude API で CA FB を生成"""
+def _generate_ca_with_claude(transcript: str, ref_text: str, deadline: Optional[Deadline] = None) -> str:
+    """Claude API で CA FB を生成。deadline があれば残り時間をタイムアウトにする"""
     try:
-        from anthropic import Anthropic
+        client = get_client()
     except ImportError:
         return _template_ca()
-
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
+    if client is None:
         logger.warning("ANTHROPIC_API_KEY が未設定です。.env に設定するとAIが自動で記入します。")
         return "※ ANTHROPIC_API_KEY が未設定です。.env に設定して再実行してください。\n\n" + _template_ca()
 
-    client = Anthropic(api_key=api_key)
-    ref_text = "\n\n---\n\n".join(f"【{k}】\n{v}" for k, v in refs.items())
-
+    transcript = prepare_transcript(transcript, "CA FB")
+    transcript, transcript_heading = condense_transcript(client, transcript, TRANSCRIPT_LIMIT, "ca", deadline)
     system_prompt = "あなたは人材紹介営業の法人面談フィードバック専門家です。議事録テンプレートの観点で、聞けた項目・聞けていない項目を整理し、CA向けに改善点を具体的に指摘します。"
 
-    user_prompt = f"""以下の「法人面談の文字起こし」を、リファレンスに基づいて評価し、CA向けのフィードバックを出力してください。
+    user_prefix = f"""以下の「法人面談の文字起こし」を、リファレンスに基づいて評価し、CA向けのフィードバックを出力してください。
 
 【リファレンスの活用】
 ・template: 法人面談議事録の聞けた項目チェックリスト
@@ -167,21 +178,28 @@ def _generate_ca_with_claude(transcript: str, refs: Dict[str, str]) -> str:
 3. 【改善点】
 4. 【全体所感】
 
-## 文字起こし（出力に含めない）
-{transcript[:12000]}
+"""
+    # 文字起こし以外（system・リファレンス・出力形式）は毎回同じなのでキャッシュ対象
+    user_suffix = f"""## {transcript_heading}（出力に含めない）
+{transcript}
 
 ## フィードバック（上記形式でプレーンテキストで出力）
 """
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}],
-            temperature=0.3,
-        )
-        return (response.content[0].text if response.content else "").strip()
+        with timed("fb_llm"):
+            response = create_message(
+                client,
+                call="CA FB",
+                model=MODEL,
+                max_tokens=4096,
+                system=system_prompt,
+                messages=[{"role": "user", "content": cached_prompt_content(user_prefix, user_suffix)}],
+                temperature=0.3,
+                **call_timeout(deadline),
+            )
+        log_usage("CA FB", response)
+        return response_text(response)
     except Exception as e:
         logger.exception("CA FB 生成エラー")
         return f"[AI生成エラー: {e}]\n\n" + _template_ca()
@@ -231,10 +249,12 @@ def generate_feedback_ra(
     ra_name: str = "",
     company_name: str = "",
     use_ai: bool = True,
+    deadline: Optional[Deadline] = None,
 ) -> str:
-    """RA（初回架電）FB を生成。戻り値: full_message（ヘッダー含む）"""
-    refs = _load_references_ra()
-    feedback = _generate_ra_with_claude(transcript, refs, ra_name) if use_ai else _template_ra(ra_name)
+    """RA（初回架電）FB を生成。戻り値: full_message（ヘッダー含む）。deadline はジョブの締め切り"""
+    with timed("reference_load"):
+        _, ref_text = get_reference_store().bundle("ra", _ra_reference_specs())
+    feedback = _generate_ra_with_claude(transcript, ref_text, ra_name, deadline) if use_ai else _template_ra(ra_name)
     header = f"📞 初回架電FB | 会社名: {company_name or 'ー'} | RA担当: {ra_name or 'ー'}"
     return f"{header}\n\n{feedback}"
 
@@ -243,9 +263,11 @@ def generate_feedback_ca(
     transcript: str,
     company_name: str = "",
     use_ai: bool = True,
+    deadline: Optional[Deadline] = None,
 ) -> str:
-    """CA（法人面談）FB を生成。戻り値: full_message（ヘッダー含む）"""
-    refs = _load_references_ca()
-    feedback = _generate_ca_with_claude(transcript, refs) if use_ai else _template_ca()
+    """CA（法人面談）FB を生成。戻り値: full_message（ヘッダー含む）。deadline はジョブの締め切り"""
+    with timed("reference_load"):
+        _, ref_text = get_reference_store().bundle("ca", _ca_reference_specs())
+    feedback = _generate_ca_with_claude(transcript, ref_text, deadline) if use_ai else _template_ca()
     header = f"📋 CA FB | 会社名: {company_name or 'ー'}"
     return f"{header}\n\n{feedback}"
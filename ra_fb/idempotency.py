@@ -0,0 +1,216 @@
+"""重複配信の排除（冪等キー・TTL ストア・single-flight）
+
+Zapier は応答が遅い Webhook を再送し、Slack は確認応答が遅れた file_shared イベントを
+再配信する。同じ文字起こしで FB 生成・Slack 投稿・Web 検索・法人情報抽出が重複しないよう、
+(受付元, 配信 ID または文字起こし・会社名・RA 名のハッシュ, FB 種別) を冪等キーとして SQLite に記録する。
+
+  - 処理中のキーに来た重複は、同じジョブ（非同期）・同じ実行結果（同期、single-flight）に合流する
+  - 完了したキーは TTL（RAFB_IDEMPOTENCY_TTL_HOURS、既定 24 時間）の間、結果を返すだけで再処理しない
+  - 失敗したキー（run_once の done が偽の結果を含む）は削除し、再送で処理し直せるようにする
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .config import STATE_DIR, env_float
+from .db import connect
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_PATH = STATE_DIR / "idempotency.sqlite3"
+DEFAULT_TTL_HOURS = 24.0
+STALE_RUNNING = 1800.0  # ジョブに紐づかない running（同期処理中にプロセス終了など）を無効とみなす秒数
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'running',
+    job_id INTEGER,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency (expires_at);
+"""
+
+
+def idempotency_key(
+    source: str, fb_type: str, delivery_id: str = "", transcript: str = "", company_name: str = "", ra_name: str = "",
+) -> str:
+    """
+    冪等キー。配信 ID があればそれを、なければ文字起こし（空白を正規化）と会社名・RA 名のハッシュを使う。
+    会社名・RA 名を含めるのは、同じ文字起こしを名前だけ直して再送したときに重複とみなさないため
+    """
+    if delivery_id:
+        ident = f"id:{delivery_id}"
+    else:
+        identity = "\x1f".join((" ".join(transcript.split()), company_name.strip(), ra_name.strip()))
+        ident = "sha:" + hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+    return f"{source}:{fb_type}:{ident}"
+
+
+def _ttl_seconds() -> float:
+    return env_float("RAFB_IDEMPOTENCY_TTL_HOURS", DEFAULT_TTL_HOURS) * 3600
+
+
+class IdempotencyStore:
+    """冪等キーの TTL ストア。status は running → done（失敗時は行を削除）"""
+
+    def __init__(self, path: Path = IDEMPOTENCY_PATH, ttl: Optional[float] = None) -> None:
+        self.path = Path(path)
+        self.ttl = ttl if ttl is not None else _ttl_seconds()
+        with connect(self.path, _SCHEMA):
+            pass
+
+    def claim(self, key: str, job_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """キーを running で登録。登録できたら None、既にあればその行（result は復元済み）"""
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute("DELETE FROM idempotency WHERE expires_at < ?", (now,))
+            conn.execute(
+                "DELETE FROM idempotency WHERE key = ? AND status = 'running' AND job_id IS NULL AND updated_at < ?",
+                (key, now - STALE_RUNNING),
+            )
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO idempotency (key, job_id, created_at, updated_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, job_id, now, now, now + self.ttl),
+            ).rowcount
+            if inserted:
+                return None
+            row = conn.execute("SELECT * FROM idempotency WHERE key = ?", (key,)).fetchone()
+        return self._row(row)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT * FROM idempotency WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return self._row(row)
+
+    def set_job(self, key: str, job_id: int) -> None:
+        with connect(self.path) as conn:
+            conn.execute(
+                "UPDATE idempotency SET job_id = ?, updated_at = ? WHERE key = ?", (job_id, time.time(), key)
+            )
+
+    def complete(self, key: str, result: Any = None) -> None:
+        """完了として結果を保存。TTL は完了時点から数える"""
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute(
+                "UPDATE idempotency SET status = 'done', result = ?, updated_at = ?, expires_at = ? WHERE key = ?",
+                (json.dumps(result, ensure_ascii=False) if result is not None else None, now, now + self.ttl, key),
+            )
+
+    def release(self, key: str) -> None:
+        """失敗したキーを削除（再送で処理し直せるようにする）"""
+        with connect(self.path) as conn:
+            conn.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+
+    @staticmethod
+    def _row(row) -> Optional[Dict[str, Any]]:
+        if not row:
+            return None
+        rec = dict(row)
+        rec["result"] = json.loads(rec["result"]) if rec["result"] else None
+        return rec
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """同じキーの同時呼び出しを1回の実行にまとめる（プロセス内）"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """戻り値: (fn の結果, 他の呼び出しの結果を共有したか)。例外も共有する"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+_store_lock = threading.Lock()
+_store: Optional[IdempotencyStore] = None
+_flight = SingleFlight()
+
+
+def get_idempotency_store() -> Optional[IdempotencyStore]:
+    """プロセス共有のストア。RAFB_IDEMPOTENCY_TTL_HOURS=0 で無効（None）"""
+    global _store
+    if _ttl_seconds() <= 0:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = IdempotencyStore()
+            except Exception as e:
+                logger.warning("冪等キーストアを開けません: %s", e)
+                return None
+        return _store
+
+
+def run_once(key: str, fn: Callable[[], Any], done: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, str]:
+    """
+    キーごとに fn を1回だけ実行する（同期処理用）。
+    done を渡すと、done(結果) が偽のとき（投稿できなかった等）は完了にせずキーを削除し、再送で処理し直せるようにする。
+
+    Returns:
+        (結果, 状態)。状態は "new"（今回実行）/ "shared"（同時に来た呼び出しの結果を共有）/
+        "done"（TTL 内に完了済み。結果は保存値）/ "running"（他プロセスで処理中。結果は None）
+    """
+
+    def run() -> Tuple[Any, str]:
+        store = get_idempotency_store()
+        if store is None:
+            return fn(), "new"
+        existing = store.claim(key)
+        if existing is not None:
+            logger.info("重複のためスキップ: %s（%s）", key, existing["status"])
+            return existing["result"], existing["status"]
+        try:
+            result = fn()
+        except BaseException:
+            store.release(key)
+            raise
+        if done is None or done(result):
+            store.complete(key, result)
+        else:
+            store.release(key)
+        return result, "new"
+
+    (result, status), shared = _flight.do(key, run)
+    return result, "shared" if shared and status == "new" else status
@@ -0,0 +1,289 @@
+"""永続ジョブキュー（SQLite）と固定サイズのワーカープール
+
+Slack サーバー等で受け付けた FB ジョブを SQLite に保存し、決まった数の
+ワーカースレッドで順に処理する。プロセスが再起動しても未完了ジョブは
+起動時に再開される（実行中に落ちた回も試行回数に数える）。完了・失敗したジョブは
+RAFB_JOB_RETENTION_DAYS 日（既定 7 日）で削除する。ステージごと（FB生成・Slack投稿・法人情報）の同時実行数も
+stage() で制限できる。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import STATE_DIR, env_float, env_int
+from .db import connect
+from .idempotency import get_idempotency_store
+
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = STATE_DIR / "jobs.sqlite3"
+DEFAULT_WORKERS = 3
+DEFAULT_MAX_ATTEMPTS = 2
+DEFAULT_RETENTION_DAYS = 7.0
+PRUNE_INTERVAL = 3600.0  # 完了ジョブの削除を試みる間隔（秒）
+IDEMPOTENCY_FIELD = "_idempotency_key"  # enqueue_once で payload に埋め込む冪等キー
+
+# ステージ別の同時実行数の既定値。RAFB_STAGE_LIMIT_{NAME} で上書き（0 以下で無制限）
+DEFAULT_STAGE_LIMITS = {"fb": 3, "slack": 4, "research": 2, "company": 2}
+
+_stage_lock = threading.Lock()
+_stage_sems: Dict[str, Optional[threading.BoundedSemaphore]] = {}
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """ステージ単位の同時実行制限。プロセス内の全ジョブで共有"""
+    with _stage_lock:
+        if name not in _stage_sems:
+            limit = env_int(f"RAFB_STAGE_LIMIT_{name.upper()}", DEFAULT_STAGE_LIMITS.get(name, 0))
+            _stage_sems[name] = threading.BoundedSemaphore(limit) if limit > 0 else None
+        sem = _stage_sems[name]
+    if sem is None:
+        yield
+        return
+    with sem:
+        yield
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+"""
+
+
+class JobQueue:
+    """SQLite に永続化するジョブキュー＋ワーカープール。
+
+    handlers は kind → 処理関数（payload dict を受け取り、任意で JSON 化可能な結果を返す）。
+    status は queued → running → done / failed。例外時は max_attempts まで再投入する。
+    done / failed のジョブは retention_days 日後に削除する（0 以下で削除しない）。
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, Callable[[Dict[str, Any]], Any]],
+        db_path: Path = JOB_DB_PATH,
+        workers: Optional[int] = None,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        retention_days: Optional[float] = None,
+    ) -> None:
+        self.handlers = handlers
+        self.db_path = Path(db_path)
+        self.workers = workers if workers is not None else env_int("RAFB_WORKERS", DEFAULT_WORKERS)
+        self.max_attempts = max_attempts
+        self.retention_days = (
+            retention_days if retention_days is not None
+            else env_float("RAFB_JOB_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+        )
+        self._last_prune = 0.0
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._enqueue_lock = threading.Lock()
+        with connect(self.db_path, _SCHEMA):
+            pass
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> int:
+        """ジョブを永続化して投入。戻り値: job id"""
+        if kind not in self.handlers:
+            raise ValueError(f"未登録のジョブ種別: {kind}")
+        now = time.time()
+        with connect(self.db_path) as conn:
+            cur = conn.execute(
+                "INSERT INTO jobs (kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False), now, now),
+            )
+            job_id = int(cur.lastrowid)
+        with self._cond:
+            self._cond.notify()
+        logger.info("ジョブ投入 #%d (%s) 待ち: %d", job_id, kind, self.depth()["queued"])
+        return job_id
+
+    def enqueue_once(self, kind: str, payload: Dict[str, Any], key: str) -> Tuple[Optional[int], bool]:
+        """
+        冪等キー付きで投入。同じキーのジョブが処理中・TTL 内に完了済みなら投入せず、そのジョブに合流する。
+
+        Returns:
+            (job id, 新規投入したか)。他の経路（同期処理）で処理中のキーは job id が None
+        """
+        store = get_idempotency_store()
+        if store is None:
+            return self.enqueue(kind, payload), True
+        with self._enqueue_lock:
+            existing = store.claim(key)
+            if existing is not None:
+                logger.info("重複のため投入しません: %s → ジョブ #%s（%s）", key, existing["job_id"], existing["status"])
+                return existing["job_id"], False
+            try:
+                job_id = self.enqueue(kind, {**payload, IDEMPOTENCY_FIELD: key})
+            except Exception:
+                store.release(key)
+                raise
+            store.set_job(key, job_id)
+        return job_id, True
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """ジョブの状態を返す（payload は含めない）"""
+        with connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, attempts, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def depth(self) -> Dict[str, int]:
+        """状態別のジョブ数（queued / running / done / failed）"""
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        with connect(self.db_path) as conn:
+            for status, n in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+                counts[status] = n
+        return counts
+
+    def prune(self) -> int:
+        """retention_days より前に完了・失敗したジョブを削除。戻り値: 削除件数"""
+        self._last_prune = time.time()
+        if self.retention_days <= 0:
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        with connect(self.db_path) as conn:
+            n = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,)
+            ).rowcount
+        if n:
+            logger.info("古いジョブを削除: %d 件", n)
+        return n
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        with self._cond:
+            with connect(self.db_path) as conn:
+                row = conn.execute(
+                    "SELECT id, kind, payload, attempts FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if not row:
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (time.time(), row["id"]),
+                )
+            return row
+
+    def _finish(self, job_id: int, status: str, result: Any = None, error: str = "") -> None:
+        with connect(self.db_path) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error[:1000] or None,
+                    time.time(),
+                    job_id,
+                ),
+            )
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+            row = self._claim()
+            if row is None:
+                if time.time() - self._last_prune >= PRUNE_INTERVAL:
+                    try:
+                        self.prune()
+                    except sqlite3.Error as e:
+                        logger.warning("古いジョブの削除失敗: %s", e)
+                with self._cond:
+                    if not self._stopping:
+                        self._cond.wait(timeout=5)
+                continue
+            job_id, kind = row["id"], row["kind"]
+            payload = json.loads(row["payload"])
+            key = payload.pop(IDEMPOTENCY_FIELD, None)
+            try:
+                result = self.handlers[kind](payload)
+                self._finish(job_id, "done", result)
+            except Exception as e:
+                logger.exception("ジョブ失敗 #%d (%s)", job_id, kind)
+                retry = row["attempts"] + 1 < self.max_attempts
+                self._finish(job_id, "queued" if retry else "failed", error=str(e))
+                if key and not retry:
+                    self._settle_key(key, None, failed=True)
+                continue
+            if key:
+                self._settle_key(key, result)
+
+    @staticmethod
+    def _settle_key(key: str, result: Any, failed: bool = False) -> None:
+        """冪等キーを完了（失敗時は削除して再送を受け付ける）"""
+        store = get_idempotency_store()
+        if store is None:
+            return
+        try:
+            if failed:
+                store.release(key)
+            else:
+                store.complete(key, result)
+        except Exception as e:
+            logger.warning("冪等キーの更新失敗 %s: %s", key, e)
+
+    def start(self) -> None:
+        """
+        未完了ジョブ（前回 running のまま終了したもの）を再投入してワーカーを起動。
+        落ちた回も試行に数え、max_attempts に達したものは failed にする（毎回プロセスを落とすジョブで再起動を繰り返さないため）
+        """
+        now = time.time()
+        with connect(self.db_path) as conn:
+            exhausted = conn.execute(
+                "SELECT id, payload FROM jobs WHERE status = 'running' AND attempts >= ?", (self.max_attempts,)
+            ).fetchall()
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE status = 'running' AND attempts >= ?",
+                ("実行中にプロセスが終了（試行回数の上限）", now, self.max_attempts),
+            )
+            resumed = conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'", (now,)
+            ).rowcount
+        for row in exhausted:
+            logger.warning("実行中に終了したジョブを打ち切り #%d", row["id"])
+            key = json.loads(row["payload"]).get(IDEMPOTENCY_FIELD)
+            if key:
+                self._settle_key(key, None, failed=True)
+        if resumed:
+            logger.info("未完了ジョブを再開: %d 件", resumed)
+        self.prune()
+        self._stopping = False
+        for i in range(max(self.workers, 1)):
+            t = threading.Thread(target=self._worker, name=f"rafb-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """ワーカーを停止（実行中ジョブは完了まで待つ。間に合わなければ次回起動時に再開）"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
@@ -0,0 +1,213 @@
+"""Claude API 呼び出しの共通処理（共有クライアント・プロンプトキャッシュ・トークン使用量ログ）"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from .config import env_float
+from .llm_cache import cache_bypassed, get_llm_cache, request_key
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+MODEL = "claude-sonnet-4-20250514"
+
+# 接続プール設定（環境変数で上書き可）
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+
+# 5分間キャッシュ（Anthropic の ephemeral キャッシュ）
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+class ConnectionStats:
+    """HTTP リクエスト数と新規接続数（TCP 接続・TLS ハンドシェイク）の集計"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    def record(self, name: str) -> None:
+        with self._lock:
+            if name == "request":
+                self.requests += 1
+            elif name == "connection.connect_tcp.complete":
+                self.connections += 1
+            elif name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused": max(self.requests - self.connections, 0),
+            }
+
+
+CONNECTION_STATS = ConnectionStats()
+
+_client_lock = threading.Lock()
+_client: Any = None
+_client_key: Optional[str] = None
+_client_override: Any = None
+
+
+def _build_http_client() -> Any:
+    """keep-alive 接続を使い回す httpx クライアント。新規接続数を CONNECTION_STATS に記録"""
+    import httpx
+
+    class _CountingTransport(httpx.HTTPTransport):
+        def handle_request(self, request):
+            CONNECTION_STATS.record("request")
+            inner = request.extensions.get("trace")
+
+            def trace(name, info):
+                CONNECTION_STATS.record(name)
+                if inner:
+                    inner(name, info)
+
+            request.extensions["trace"] = trace
+            return super().handle_request(request)
+
+    pool_size = int(env_float("ANTHROPIC_POOL_SIZE", DEFAULT_POOL_SIZE))
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    timeout = httpx.Timeout(
+        env_float("ANTHROPIC_TIMEOUT", DEFAULT_TIMEOUT),
+        connect=env_float("ANTHROPIC_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+    )
+    return httpx.Client(transport=_CountingTransport(limits=limits), timeout=timeout)
+
+
+def get_client() -> Any:
+    """プロセス共有の Anthropic クライアント（スレッドセーフ）。
+
+    Slack サーバーのワーカースレッド・一括インポート・Webhook サーバーで同じ
+    接続プールを使い回し、ジョブごとの TLS ハンドシェイクを避ける。
+    anthropic 未インストール時は ImportError、ANTHROPIC_API_KEY 未設定時は None。
+    """
+    global _client, _client_key
+    if _client_override is not None:
+        return _client_override
+    from anthropic import Anthropic
+
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if not api_key:
+        return None
+    with _client_lock:
+        if _client is None or _client_key != api_key:
+            _client = Anthropic(api_key=api_key, http_client=_build_http_client())
+            _client_key = api_key
+        return _client
+
+
+def set_client(client: Any) -> None:
+    """Anthropic 互換クライアントを差し替える（ベンチマーク・検証用）。None で既定に戻す"""
+    global _client_override
+    with _client_lock:
+        _client_override = client
+
+
+def connection_stats() -> Dict[str, int]:
+    """Claude API への接続再利用状況（requests / connections / tls_handshakes / reused）"""
+    return CONNECTION_STATS.snapshot()
+
+
+def cached_prompt_content(prefix: str, suffix: str) -> List[Dict[str, Any]]:
+    """user メッセージを「固定プレフィックス（キャッシュ対象）＋可変サフィックス」に分割。
+
+    prefix にはリファレンス・出力形式など毎回同じ内容、suffix には文字起こし・
+    検索結果など呼び出しごとに変わる内容を入れる。prefix が1文字でも変わると
+    キャッシュは効かないため、会社名・日付などは suffix 側に寄せること。
+    """
+    blocks: List[Dict[str, Any]] = [{"type": "text", "text": prefix, "cache_control": CACHE_CONTROL}]
+    if suffix:
+        blocks.append({"type": "text", "text": suffix})
+    return blocks
+
+
+def _dump_content(response: Any) -> str:
+    """応答の content（text / tool_use ブロック）をキャッシュ保存用の JSON に"""
+    blocks = []
+    for b in getattr(response, "content", None) or []:
+        if getattr(b, "type", "text") == "tool_use":
+            blocks.append({"type": "tool_use", "name": b.name, "input": b.input})
+        else:
+            blocks.append({"type": "text", "text": getattr(b, "text", "")})
+    return json.dumps(blocks, ensure_ascii=False)
+
+
+def _load_content(data: str) -> List[Any]:
+    return [SimpleNamespace(**b) for b in json.loads(data)]
+
+
+def create_message(client: Any, call: str = "", **kwargs: Any) -> Any:
+    """client.messages.create の代わり。RAFB_LLM_CACHE=1 なら応答キャッシュ（llm_cache）を使う。
+
+    ヒット時は API を呼ばず、content だけを持つ応答（cached=True、usage なし）を返す。
+    call は呼び出し名（log_usage の call と同じ）。キャッシュの call 列に記録する。
+    """
+    cache = get_llm_cache()
+    if cache is None:
+        return client.messages.create(**kwargs)
+    key = request_key(kwargs)
+    if not cache_bypassed():
+        data = cache.get(key)
+        if data is not None:
+            return SimpleNamespace(content=_load_content(data), usage=None, cached=True)
+    response = client.messages.create(**kwargs)
+    # 空の応答・途中で切れた応答は保存しない
+    if getattr(response, "content", None) and getattr(response, "stop_reason", None) != "max_tokens":
+        try:
+            cache.put(key, _dump_content(response), call=call)
+        except Exception as e:
+            logger.warning("LLM キャッシュへの保存失敗: %s", e)
+    return response
+
+
+def llm_cache_stats() -> Dict[str, float]:
+    """応答キャッシュのヒット率等（無効時は空）"""
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {}
+
+
+def usage_dict(response: Any) -> Dict[str, int]:
+    """response.usage をトークン数の dict に変換（キャッシュ項目は無ければ 0）"""
+    usage = getattr(response, "usage", None)
+    keys = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+    return {k: int(getattr(usage, k, 0) or 0) for k in keys}
+
+
+def log_usage(label: str, response: Any, call: Optional[str] = None) -> Dict[str, int]:
+    """トークン使用量（キャッシュ読込・作成を含む）をログ出力し、計測値に加算。call は計測用の呼び出し名（省略時は label）"""
+    u = usage_dict(response)
+    if getattr(response, "cached", False):
+        logger.info("%s: 応答キャッシュを使用", label)
+        return u
+    METRICS.record_usage(call or label, u)
+    logger.info(
+        "%s tokens: input=%d output=%d cache_read=%d cache_creation=%d",
+        label,
+        u["input_tokens"],
+        u["output_tokens"],
+        u["cache_read_input_tokens"],
+        u["cache_creation_input_tokens"],
+    )
+    return u
+
+
+def response_text(response: Any) -> str:
+    """response.content の先頭のテキストブロックを返す"""
+    for block in response.content or []:
+        if getattr(block, "type", "text") == "text":
+            return (block.text or "").strip()
+    return ""
@@ -0,0 +1,161 @@
+"""Claude API 応答のディスクキャッシュ（内容アドレス）
+
+(モデル, temperature, max_tokens, system, user プロンプト全文, tools) のハッシュをキーに、
+応答の content（テキスト・tool use の入力）を zlib 圧縮して SQLite に保存する。
+同じ文字起こしで cli.py を再実行したときや同じ文字起こしが再投稿されたときに、
+同一の Claude 呼び出しを繰り返さない。
+
+既定は無効（RAFB_LLM_CACHE=1 で有効）。合計サイズが RAFB_LLM_CACHE_MAX_MB を超えたら
+最終アクセスが古いものから削除する。RAFB_LLM_CACHE_BYPASS=1（cli.py の --no-llm-cache）で
+キャッシュを読まずに API を呼ぶ（応答は保存し直す）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import STATE_DIR, env_float
+from .db import connect
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_PATH = STATE_DIR / "llm_cache.sqlite3"
+CACHE_FORMAT = 2  # 保存形式を変えたら上げる（キーが変わり古いエントリは使われなくなる）
+DEFAULT_MAX_MB = 200.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    call TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+"""
+
+
+def _prompt_texts(content: Any) -> List[str]:
+    if isinstance(content, str):
+        return [content]
+    return [b.get("text", "") for b in content or [] if isinstance(b, dict)]
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    """messages.create の引数から内容アドレスのキーを作る（cache_control 等の付帯情報は含めない）"""
+    messages = [
+        {"role": m.get("role"), "text": "".join(_prompt_texts(m.get("content")))} for m in kwargs.get("messages", [])
+    ]
+    material = json.dumps(
+        {
+            "format": CACHE_FORMAT,
+            "model": kwargs.get("model"),
+            "temperature": kwargs.get("temperature"),
+            "max_tokens": kwargs.get("max_tokens"),
+            "system": kwargs.get("system") or "",
+            "messages": messages,
+            "tools": kwargs.get("tools"),
+            "tool_choice": kwargs.get("tool_choice"),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """応答のキャッシュ。max_bytes を超えたら LRU で削除"""
+
+    def __init__(self, path: Path = LLM_CACHE_PATH, max_bytes: Optional[int] = None) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            env_float("RAFB_LLM_CACHE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with connect(self.path, _SCHEMA):
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        with connect(self.path) as conn:
+            row = conn.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return zlib.decompress(row["body"]).decode("utf-8") if row else None
+
+    def put(self, key: str, text: str, call: str = "") -> None:
+        body = zlib.compress(text.encode("utf-8"), 6)
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, call, body, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, call, body, len(body), now, now),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if self.max_bytes > 0 and total > self.max_bytes:
+                self._evict(conn, total - self.max_bytes)
+
+    @staticmethod
+    def _evict(conn, excess: int) -> None:
+        """最終アクセスが古い順に excess バイト以上を削除"""
+        keys = []
+        for row in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            keys.append(row["key"])
+            excess -= row["size"]
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in keys])
+        logger.debug("LLM キャッシュを %d 件削除", len(keys))
+
+    def stats(self) -> Dict[str, float]:
+        """hits / misses / hit_rate / entries / bytes"""
+        with connect(self.path) as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+_cache_lock = threading.Lock()
+_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """プロセス共有のキャッシュ。RAFB_LLM_CACHE=1 のときのみ有効（それ以外は None）"""
+    global _cache
+    if os.environ.get("RAFB_LLM_CACHE", "0") != "1":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = LLMCache()
+            except Exception as e:
+                logger.warning("LLM キャッシュを開けません: %s", e)
+                return None
+        return _cache
+
+
+def cache_bypassed() -> bool:
+    return os.environ.get("RAFB_LLM_CACHE_BYPASS", "0") == "1"
@@ -0,0 +1,159 @@
+"""長い文字起こしの分割処理（map-reduce）
+
+1回の呼び出しに収まらない文字起こしは先頭で切り捨てず、話者ターンの境界で
+区間に分け、区間ごとに事実（採用概要・障壁・質問内容など）を並列に抽出する。
+抽出結果をまとめたものを、既存の RA/CA FB・法人情報抽出のプロンプトに
+文字起こしの代わりに渡す（reduce）。区間は並列に処理するので、通話が長くても
+待ち時間は区間1つ分程度に収まる。ジョブの締め切りまでの残り時間が足りないときは
+区間抽出を省略し、上限までの先頭だけを渡す。抽出結果が上限を超えるときも全区間を残し、
+各区間を均等に切り詰めて見出しにその旨を書く。
+"""
+
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from .config import env_int
+from .deadline import CONDENSE_RESERVE, Deadline, call_timeout
+from .llm import MODEL, cached_prompt_content, create_message, log_usage, response_text
+from .metrics import timed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_CHARS = 6000
+DEFAULT_CHUNK_CONCURRENCY = 4
+
+# 区間ごとに抽出する観点（purpose 別）
+_MAP_FOCUS = {
+    "ra": """・採用概要：採用必要数・エリア・資格・年齢・経験・年収・出張・重視点（発言どおり。数値は正確に）
+・障壁：断り文句・懸念・他社利用状況・決裁フロー
+・RAがした質問・提案と、それに対する相手の反応（言い回しは原文を短く引用）
+・うまくいった切り返し／聞き漏らし・深掘り不足の箇所
+・会社の特徴・魅力（事業・案件・働き方）""",
+    "ca": """・聞けた項目：営業情報（採用背景・人数・条件・選考フロー・手数料）・求職者情報・事業理解
+・先方が言及したが深掘りできていない点
+・面談担当者の質問・提案と先方の反応（原文を短く引用）""",
+    "company": """・会社名・所在地・都道府県・事業内容・主要顧客・案件例・マーケット
+・採用概要：募集職種・人数・エリア・資格・年齢・経験・年収・出張・休日・残業・福利厚生
+・評価制度・キャリアパス・面接方式・選考で重視する点・過去の採用事例
+・手数料・決裁者・その他の条件""",
+}
+
+
+def split_turns(text: str, max_chars: int) -> List[str]:
+    """話者ターン（行）の境界で max_chars 以下の区間に分割。1ターンが長すぎる場合のみ途中で切る"""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.split("\n"):
+        while len(line) > max_chars:
+            if current:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and size + len(line) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current and "".join(current).strip():
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _map_chunk(
+    client, purpose: str, chunk: str, index: int, total: int, deadline: Optional[Deadline] = None
+) -> Optional[str]:
+    """1区間から事実を抽出。失敗時は None"""
+    prefix = f"""以下は長い通話の文字起こしの一部（区間）です。後で全区間の抽出結果をまとめて評価・整理するため、
+この区間に含まれる事実だけを、次の観点で漏れなく箇条書きで抽出してください。
+
+【観点】
+{_MAP_FOCUS[purpose]}
+
+【ルール】
+・区間に出てこない項目は書かない（推測しない）。マークダウンは使わず・で箇条書き。
+・固有名詞・数値・条件は原文どおり。
+
+"""
+    suffix = f"""## 文字起こし（区間 {index}/{total}）
+{chunk}
+
+## 抽出結果
+"""
+    try:
+        with timed("chunk_llm"):
+            response = create_message(
+                client,
+                call="区間抽出",
+                model=MODEL,
+                max_tokens=1500,
+                messages=[{"role": "user", "content": cached_prompt_content(prefix, suffix)}],
+                temperature=0,
+                **call_timeout(deadline),
+            )
+        log_usage(f"区間抽出 {index}/{total}", response, call="区間抽出")
+        return response_text(response)
+    except Exception as e:
+        logger.warning("区間抽出に失敗(%d/%d): %s", index, total, e)
+        return None
+
+
+def condense_transcript(
+    client, transcript: str, limit: int, purpose: str, deadline: Optional[Deadline] = None
+) -> Tuple[str, str]:
+    """
+    文字起こしをプロンプトに入る形にする。limit 以下ならそのまま、超える場合は区間ごとに並列抽出してまとめる。
+
+    Args:
+        purpose: "ra" / "ca" / "company"（区間ごとに抽出する観点）
+        deadline: ジョブの締め切り。残り時間が足りなければ区間抽出せず先頭 limit 文字で切り詰める
+
+    Returns:
+        (本文, 見出し)。見出しはプロンプト中の「## 見出し」に使う
+    """
+    if len(transcript) <= limit:
+        return transcript, "文字起こし"
+    if deadline is not None and not deadline.allows(CONDENSE_RESERVE):
+        deadline.degrade(f"condense_{purpose}", "縮小（先頭のみ）")
+        return transcript[:limit], "文字起こし（長時間のため先頭のみ）"
+    chunks = split_turns(transcript, max(1, env_int("RAFB_CHUNK_CHARS", DEFAULT_CHUNK_CHARS)))
+    total = len(chunks)
+    logger.info("長い文字起こしを %d 区間に分割して抽出(%s, %d 文字)", total, purpose, len(transcript))
+    workers = min(total, max(1, env_int("RAFB_CHUNK_CONCURRENCY", DEFAULT_CHUNK_CONCURRENCY)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rafb-chunk") as executor:
+        facts = list(
+            executor.map(
+                lambda ic: _map_chunk(client, purpose, ic[1], ic[0], total, deadline), enumerate(chunks, start=1)
+            )
+        )
+    # 抽出に失敗した区間は原文を入れる（_fit で区間あたりの文字数に収める）
+    facts = [f.strip() if f else chunk for f, chunk in zip(facts, chunks)]
+    headers = [f"【区間 {i}/{total}】\n" for i in range(1, total + 1)]
+    budget = limit - sum(len(h) for h in headers) - 2 * (total - 1)
+    facts, truncated = _fit(facts, budget)
+    body = "\n\n".join(h + f for h, f in zip(headers, facts))
+    if len(body) > limit:  # 見出しだけで上限を超えるほど区間が多い場合
+        body, truncated = body[:limit], True
+    if truncated:
+        logger.warning("区間の抽出結果が上限を超えたため各区間を切り詰め(%s, 上限 %d 文字)", purpose, limit)
+        return body, f"文字起こし（長時間のため区間ごとの抽出結果。全 {total} 区間。上限のため一部の区間は末尾を省略）"
+    return body, f"文字起こし（長時間のため区間ごとの抽出結果。全 {total} 区間・通話全体をカバー）"
+
+
+def _fit(parts: List[str], budget: int) -> Tuple[List[str], bool]:
+    """
+    全区間を残したまま合計 budget 文字に収める。短い区間はそのまま、長い区間を均等に切り詰める。
+    戻り値: (区間ごとの本文, 切り詰めたか)
+    """
+    caps = [0] * len(parts)
+    remaining, left = max(budget, 0), len(parts)
+    for i in sorted(range(len(parts)), key=lambda i: len(parts[i])):
+        caps[i] = min(len(parts[i]), remaining // left)
+        remaining -= caps[i]
+        left -= 1
+    fitted = [p if len(p) <= cap else p[: max(cap - 1, 0)] + "…" for p, cap in zip(parts, caps)]
+    return fitted, any(len(p) > cap for p, cap in zip(parts, caps))
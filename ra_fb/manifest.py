@@ -0,0 +1,109 @@
+"""法人情報抽出のマニフェスト（差分インポート用）
+
+抽出1回ごとに (会社, 文字起こしの内容ハッシュ, プロンプト版数, 書き込んだ法人マスタのハッシュ,
+文字起こしパス) を記録する。同じ文字起こし・同じプロンプト版数で抽出済みなら、
+研究・抽出をやり直さずにスキップできる。
+
+法人マスタのハッシュは会社単位で最新に揃える（抽出・補完で書き込むたびに全行を更新）。
+現在のマスタがそれと異なる（手で編集した・作り直した）場合は、その会社の記録を破棄して
+すべての文字起こしを抽出し直す。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import STATE_DIR
+from .db import connect
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = STATE_DIR / "extraction_manifest.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    company TEXT NOT NULL,
+    transcript_hash TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    master_hash TEXT NOT NULL,
+    transcript_path TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (company, transcript_hash, prompt_version)
+);
+"""
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_extracted(
+    company: str,
+    transcript_hash: str,
+    prompt_version: str,
+    master_text: Optional[str] = None,
+    path: Path = MANIFEST_PATH,
+) -> bool:
+    """
+    同じ文字起こし・プロンプト版数で抽出済みか。master_text（現在の法人マスタ）を渡すと、
+    記録したハッシュと異なる場合はこの会社の記録を破棄して False を返す。
+    """
+    if not path.exists():
+        return False
+    with connect(path, _SCHEMA) as conn:
+        row = conn.execute(
+            "SELECT master_hash FROM extractions WHERE company = ? AND transcript_hash = ? AND prompt_version = ?",
+            (company, transcript_hash, prompt_version),
+        ).fetchone()
+    if row is None:
+        return False
+    if master_text is not None and row["master_hash"] != content_hash(master_text):
+        n = forget_company(company, path)
+        logger.info("法人マスタが抽出後に変更されたため再抽出: %s（%d 件の記録を破棄）", company, n)
+        return False
+    return True
+
+
+def record_extraction(
+    company: str,
+    transcript_hash: str,
+    prompt_version: str,
+    master_text: str,
+    transcript_path: Optional[Path] = None,
+    path: Path = MANIFEST_PATH,
+) -> None:
+    with connect(path, _SCHEMA) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO extractions "
+            "(company, transcript_hash, prompt_version, master_hash, transcript_path, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                company,
+                transcript_hash,
+                prompt_version,
+                content_hash(master_text),
+                str(transcript_path) if transcript_path else None,
+                time.time(),
+            ),
+        )
+        conn.execute("UPDATE extractions SET master_hash = ? WHERE company = ?", (content_hash(master_text), company))
+
+
+def update_master_hash(company: str, master_text: str, path: Path = MANIFEST_PATH) -> None:
+    """抽出以外（補完・移行）で法人マスタを書き込んだ後に、記録のハッシュを揃える"""
+    if not path.exists():
+        return
+    with connect(path, _SCHEMA) as conn:
+        conn.execute("UPDATE extractions SET master_hash = ? WHERE company = ?", (content_hash(master_text), company))
+
+
+def forget_company(company: str, path: Path = MANIFEST_PATH) -> int:
+    """会社の記録を削除（法人マスタが抽出後に変更された場合）。戻り値: 削除件数"""
+    if not path.exists():
+        return 0
+    with connect(path, _SCHEMA) as conn:
+        return conn.execute("DELETE FROM extractions WHERE company = ?", (company,)).rowcount
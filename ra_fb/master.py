@@ -0,0 +1,171 @@
+"""法人マスタ（YAML frontmatter ＋ Markdown テーブル）の読み取り
+
+parse_master() は本文を1回だけ走査し、frontmatter・セクション・テーブル項目を
+MasterRecord にまとめる。項目ごとに正規表現で本文を走査し直す必要はない。
+load_master() は (パス, mtime, size) 単位で解析結果をキャッシュする。
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# 法人マスタ一覧から除外するファイル
+NON_MASTER_FILES = ("マスタ項目一覧.md", "README.md")
+
+
+def parse_frontmatter(fm_text: str) -> dict:
+    """簡易YAML frontmatterパース（PyYAML不要）"""
+    meta = {}
+    for line in fm_text.splitlines():
+        line = line.strip()
+        if ":" not in line or line.startswith("#"):
+            continue
+        key, _, val = line.partition(":")
+        key = key.strip()
+        val = val.strip().strip('"\'')
+        if key in ("都道府県", "セグメント") and val.startswith("["):
+            # ["愛知", "岐阜"] 形式
+            items = re.findall(r'["\']([^"\']+)["\']', val)
+            meta[key] = [i.strip() for i in items if i.strip()]
+        else:
+            meta[key] = val
+    return meta
+
+
+def split_master(text: str) -> Optional[Tuple[dict, str]]:
+    """法人マスタを (frontmatter, 本文) に分割。frontmatter が無ければ None"""
+    if not text.strip().startswith("---"):
+        return None
+    parts = text.split("---", 2)
+    if len(parts) < 3:
+        return None
+    return parse_frontmatter(parts[1]), parts[2]
+
+
+def as_list(val) -> List[str]:
+    """都道府県・セグメントを list に正規化（"愛知、岐阜" 形式の文字列にも対応）"""
+    if not val:
+        return []
+    if isinstance(val, str):
+        return [v.strip() for v in val.replace("、", ",").split(",") if v.strip()]
+    return list(val)
+
+
+def normalize_value(val: str) -> str:
+    """テーブル値の正規化。空・「未確認」は空文字"""
+    val = (val or "").strip()
+    return val if val and val != "未確認" else ""
+
+
+def table_fields(body: str) -> Dict[str, str]:
+    """本文中のマークダウンテーブルを1回走査し {項目: 値} を返す。
+
+    「| 項目 | 値 |」の隣接セルを項目・値とみなし、同じ項目は最初の出現を採用する。
+    値は normalize_value 済み。
+    """
+    return parse_body(body).fields
+
+
+def is_master_file(name: str) -> bool:
+    return not name.startswith("_") and name not in NON_MASTER_FILES
+
+
+@dataclass
+class MasterRecord:
+    """法人マスタ1件の解析結果"""
+
+    meta: dict
+    body: str
+    fields: Dict[str, str] = field(default_factory=dict)  # テーブル項目 → 値（未確認は空文字）
+    sections: Dict[str, str] = field(default_factory=dict)  # 「## 見出し」→ 本文（見出し行を除く）
+
+    def get(self, *keys: str) -> str:
+        """候補キーのうち最初に値があるものを返す（旧キー名との互換用）"""
+        for k in keys:
+            v = self.fields.get(k)
+            if v:
+                return v
+        return ""
+
+    def section(self, name: str, with_heading: bool = False) -> str:
+        """セクション本文（前後の空白を除去）。with_heading=True で見出し行を含める"""
+        if name not in self.sections:
+            return ""
+        if with_heading:
+            return f"## {name}\n{self.sections[name]}".strip()
+        return self.sections[name].strip()
+
+
+def parse_body(body: str, meta: Optional[dict] = None) -> MasterRecord:
+    """本文を1回走査してセクションとテーブル項目を抽出"""
+    fields: Dict[str, str] = {}
+    sections: Dict[str, List[str]] = {}
+    current: Optional[List[str]] = None
+    for line in body.splitlines():
+        if line.startswith("## "):
+            name = line[3:].strip()
+            # 同名セクションが複数ある場合は最初のものを採用
+            current = None if name in sections else sections.setdefault(name, [])
+            continue
+        if current is not None:
+            current.append(line)
+        if "|" not in line or line.startswith("|-"):
+            continue
+        # 「| 項目 | 値 |」の隣接セルを項目・値とみなす（複数列の行も隣り合う組ごとに）
+        cells = line.split("|")
+        for i in range(1, len(cells) - 2):
+            key = cells[i].strip()
+            if key in fields or not key.strip("-: "):
+                continue
+            val = cells[i + 1].strip()
+            fields[key] = "" if val == "未確認" else val
+    return MasterRecord(
+        meta=meta or {},
+        body=body,
+        fields=fields,
+        sections={k: "\n".join(v) for k, v in sections.items()},
+    )
+
+
+def parse_master(text: str) -> Optional[MasterRecord]:
+    """法人マスタ全文を解析。frontmatter が無ければ None"""
+    parsed = split_master(text)
+    if parsed is None:
+        return None
+    meta, body = parsed
+    return parse_body(body, meta)
+
+
+_CACHE_SIZE = 4096
+_cache_lock = threading.Lock()
+_cache: "OrderedDict[str, Tuple[Tuple[int, int], Optional[MasterRecord]]]" = OrderedDict()
+
+
+def load_master(path: Path) -> Optional[MasterRecord]:
+    """法人マスタを読み込んで解析。(パス, mtime, size) が同じ間は前回の結果を返す"""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    key, sig = str(path), (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == sig:
+            _cache.move_to_end(key)
+            return cached[1]
+    try:
+        record = parse_master(path.read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError):
+        return None
+    with _cache_lock:
+        _cache[key] = (sig, record)
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return record
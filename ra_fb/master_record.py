@@ -0,0 +1,459 @@
+"""法人マスタの項目単位の表現（dict）と、差分の適用・Markdown の決定的な生成
+
+法人マスタ（マスタ項目一覧.md の構成）を次の dict で表す。
+  {"会社名", "表示名", "都道府県": [...], "セグメント": [...], "最終更新", "出典",
+   "fields": {項目: 値}, "訴求": {セグメント: {"採用", "訴求"}},
+   "差別化メモ": [...], "更新履歴": [...], "その他セクション": {見出し: 本文}}
+その他セクションには、項目一覧にないセクションの本文と、項目一覧のセクション（仕事内容・候補者別訴求など）の
+テーブル以外の本文（自由記述）を入れる。後者は render_master() で同じセクションのテーブルの後に出力する。
+
+法人情報の更新では Claude に変更のあった項目だけを JSON（tool use）で返させ、
+apply_delta() で既存の dict に反映してから render_master() で Markdown を生成し直す。
+マスタ全体を毎回出力させないため、出力トークン数と所要時間が小さくなる。
+
+この dict が法人マスタの正本で、{会社名}.md の隣に {会社名}.json（サイドカー）として保存する。
+save_master() はサイドカーと、そこから生成した Markdown を書き込む。プログラムからの読み取りは
+load_record() でサイドカーを読む（Markdown を手で編集した場合などサイドカーが古いときは Markdown を解析）。
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .master import MasterRecord, as_list, load_master, parse_body
+
+logger = logging.getLogger(__name__)
+
+# セクション → 項目（マスタ項目一覧.md の並び順）
+MASTER_SECTIONS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("企業情報", (
+        "会社名", "都道府県", "事業概要", "マーケット成長性", "法人HP URL", "売上構成比", "今後の注力領域",
+        "企業スナップショット", "前職規模別USP", "採用意思決定者", "口コミ評価傾向",
+    )),
+    ("仕事内容", ("仕事内容",)),
+    ("採用条件", ("必要資格", "必要経験", "未経験OK", "年齢", "採用人数")),
+    ("労働条件", ("出張", "残業時間", "休日・直行直帰・リモート", "福利厚生")),
+    ("評価・キャリアアップ", ("評価", "キャリアアップ制度")),
+    ("面接・選考", ("面接の方式", "面接回数", "面接で見ているポイント", "過去落とした人", "受かった人")),
+    ("その他", ("手数料", "重視点")),
+]
+FIELD_KEYS: Tuple[str, ...] = tuple(k for _, keys in MASTER_SECTIONS for k in keys)
+
+APPEAL_SECTION = "候補者別訴求"
+APPEAL_SEGMENTS: Tuple[str, ...] = (
+    "①電気工事士もち、施工管理未経験",
+    "②施工管理資格もち、マネジメント未経験",
+    "③施工管理資格もち、マネジメント経験あり",
+    "大手出身者向け（1,000名以上）",
+    "中堅出身者向け（100〜999名）",
+    "零細出身者向け（100名未満）",
+)
+SIZE_SEGMENTS = APPEAL_SEGMENTS[3:]  # 採用欄は「-」
+ADOPT_VALUES = ("○", "△", "×")
+MEMO_SECTION = "同エリア×同セグメント差別化メモ"
+MEMO_PLACEHOLDER = "（都道府県×セグメントで比較する際の差別化ポイント）"
+HISTORY_SECTION = "更新履歴"
+_KNOWN_SECTIONS = {name for name, _ in MASTER_SECTIONS} | {APPEAL_SECTION, MEMO_SECTION, HISTORY_SECTION}
+
+
+def empty_record(company_name: str) -> Dict[str, Any]:
+    return {
+        "会社名": company_name,
+        "表示名": company_name,
+        "都道府県": [],
+        "セグメント": [],
+        "最終更新": "",
+        "出典": "",
+        "fields": {},
+        "訴求": {},
+        "差別化メモ": [],
+        "更新履歴": [],
+        "その他セクション": {},
+    }
+
+
+def _table_rows(text: str) -> Iterable[List[str]]:
+    """Markdown テーブルの行をセルのリストで返す（見出し・区切り行を除く）"""
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("|") or line.startswith("|-"):
+            continue
+        cells = [c.strip() for c in line.strip("|").split("|")]
+        if cells[0] in ("項目", "セグメント"):
+            continue
+        yield cells
+
+
+def _free_text(text: str) -> str:
+    """セクション本文のうちテーブル以外の部分（自由記述）"""
+    return "\n".join(ln for ln in text.splitlines() if not ln.strip().startswith("|")).strip()
+
+
+def record_from_master(rec: MasterRecord) -> Dict[str, Any]:
+    """解析済みの法人マスタを項目単位の dict に変換（未確認は空文字・空欄は含めない）"""
+    name = str(rec.meta.get("会社名") or "").strip()
+    record = empty_record(name)
+    for line in rec.body.splitlines():
+        if line.startswith("# "):
+            record["表示名"] = line[2:].replace("法人情報：", "").strip() or name
+            break
+    record["都道府県"] = as_list(rec.meta.get("都道府県"))
+    record["セグメント"] = as_list(rec.meta.get("セグメント"))
+    record["最終更新"] = str(rec.meta.get("最終更新") or "")
+    record["出典"] = str(rec.meta.get("出典") or "")
+
+    fields: Dict[str, str] = {}
+    for section, text in rec.sections.items():
+        if section == APPEAL_SECTION:
+            for cells in _table_rows(text):
+                if len(cells) >= 3 and (cells[1] or cells[2]):
+                    adopt = "" if cells[1] in ("-", "未確認") else cells[1]
+                    appeal = "" if cells[2] == "未確認" else cells[2]
+                    if adopt or appeal:
+                        record["訴求"][cells[0]] = {"採用": adopt, "訴求": appeal}
+            if _free_text(text):
+                record["その他セクション"][section] = _free_text(text)
+        elif section == MEMO_SECTION:
+            record["差別化メモ"] = [
+                ln.strip()[2:].strip() if ln.strip().startswith("- ") else ln.strip()
+                for ln in text.splitlines()
+                if ln.strip() and ln.strip() != MEMO_PLACEHOLDER
+            ]
+        elif section == HISTORY_SECTION:
+            record["更新履歴"] = [ln.strip()[2:] for ln in text.splitlines() if ln.strip().startswith("- ")]
+        elif section in _KNOWN_SECTIONS:
+            for key, val in parse_body(text).fields.items():
+                # 「| 項目 | 内容 |」は見出し行
+                if val and key != "項目" and key not in fields:
+                    fields[key] = val
+            if _free_text(text):
+                record["その他セクション"][section] = _free_text(text)
+        elif text.strip():
+            record["その他セクション"][section] = text.strip()
+    # 会社名・都道府県の行は frontmatter と重複するため、空なら frontmatter から補う
+    fields.setdefault("会社名", record["表示名"])
+    if record["都道府県"]:
+        fields.setdefault("都道府県", "、".join(record["都道府県"]))
+    record["fields"] = {k: v for k, v in fields.items() if v}
+    return record
+
+
+def _merge_list(current: List[str], new: Iterable[str]) -> List[str]:
+    out = list(current)
+    for v in new or []:
+        v = str(v).strip()
+        if v and v not in out:
+            out.append(v)
+    return out
+
+
+def apply_delta(record: Dict[str, Any], delta: Dict[str, Any], source_label: str, date: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Claude が返した差分を適用した新しい dict を返す。空・「未確認」の値では既存の値を消さない。
+    都道府県・セグメント・差別化メモは追記（重複は除く）。変更した項目がなければ最終更新・更新履歴は変えない。
+
+    Returns:
+        (適用後の dict, 変更した項目数)
+    """
+    rec = copy.deepcopy(record)
+    changed = 0
+    for key in ("都道府県", "セグメント"):
+        merged = _merge_list(rec[key], as_list(delta.get(key)))
+        changed += len(merged) - len(rec[key])
+        rec[key] = merged
+    for key, val in (delta.get("fields") or {}).items():
+        val = _cell(val)
+        if key in FIELD_KEYS and val and val != "未確認" and rec["fields"].get(key) != val:
+            rec["fields"][key] = val
+            changed += 1
+    for row in delta.get("訴求") or []:
+        seg = str(row.get("セグメント") or "").strip()
+        if seg not in APPEAL_SEGMENTS:
+            continue
+        cur = dict(rec["訴求"].get(seg) or {"採用": "", "訴求": ""})
+        adopt = str(row.get("採用") or "").strip()
+        appeal = _cell(row.get("訴求"))
+        if adopt in ADOPT_VALUES and seg not in SIZE_SEGMENTS:
+            cur["採用"] = adopt
+        if appeal and appeal != "未確認":
+            cur["訴求"] = appeal
+        if cur != rec["訴求"].get(seg, {"採用": "", "訴求": ""}):
+            rec["訴求"][seg] = cur
+            changed += 1
+    memo = _merge_list(rec["差別化メモ"], delta.get("差別化メモ") or [])
+    changed += len(memo) - len(rec["差別化メモ"])
+    rec["差別化メモ"] = memo
+
+    if rec["都道府県"] and "都道府県" not in (delta.get("fields") or {}):
+        rec["fields"]["都道府県"] = "、".join(rec["都道府県"])
+    if not changed:
+        return rec, 0  # 変更なしなら最終更新・更新履歴も変えない
+    rec["最終更新"] = date
+    rec["出典"] = source_label
+    verb = "抽出" if not record["更新履歴"] else "更新"
+    rec["更新履歴"] = rec["更新履歴"] + [f"{date}: {source_label}より{verb}（{changed}項目）"]
+    return rec, changed
+
+
+def _cell(val: Any) -> str:
+    """テーブルのセル値（改行・縦棒を含めない）"""
+    return " ".join(str(val or "").split()).replace("|", "｜")
+
+
+def _quote_list(values: List[str]) -> str:
+    return "[" + ", ".join(f'"{v}"' for v in values) + "]"
+
+
+def render_master(record: Dict[str, Any]) -> str:
+    """dict から法人マスタの Markdown を生成（同じ dict からは常に同じ出力）"""
+    fields = record.get("fields") or {}
+    extra = record.get("その他セクション") or {}
+    lines = [
+        "---",
+        f'会社名: "{record.get("会社名", "")}"',
+        f"都道府県: {_quote_list(record.get('都道府県') or [])}",
+        f"セグメント: {_quote_list(record.get('セグメント') or [])}",
+        f'最終更新: "{record.get("最終更新", "")}"',
+        f"出典: {record.get('出典', '')}",
+        "---",
+        "",
+        f"# 法人情報：{record.get('表示名') or record.get('会社名', '')}",
+    ]
+    placed = set()
+    for section, keys in MASTER_SECTIONS:
+        lines += ["", f"## {section}", "| 項目 | 内容 |", "|------|------|"]
+        for key in keys:
+            lines.append(f"| {key} | {_cell(fields.get(key)) or '未確認'} |")
+            placed.add(key)
+        if section == "その他":
+            # 旧形式から引き継いだ項目（項目一覧にないもの）
+            for key, val in fields.items():
+                if key not in placed and key not in APPEAL_SEGMENTS:
+                    lines.append(f"| {key} | {_cell(val)} |")
+        if extra.get(section):
+            lines += ["", extra[section]]
+
+    appeal = record.get("訴求") or {}
+    lines += ["", f"## {APPEAL_SECTION}", "| セグメント | 採用 | 訴求・差別化 |", "|------------|------|--------------|"]
+    for seg in APPEAL_SEGMENTS:
+        row = appeal.get(seg) or {}
+        adopt = "-" if seg in SIZE_SEGMENTS else (row.get("採用") or "未確認")
+        lines.append(f"| {seg} | {adopt} | {_cell(row.get('訴求')) or '未確認'} |")
+    if extra.get(APPEAL_SECTION):
+        lines += ["", extra[APPEAL_SECTION]]
+
+    lines += ["", f"## {MEMO_SECTION}", MEMO_PLACEHOLDER]
+    lines += [f"- {m}" for m in record.get("差別化メモ") or []]
+
+    for section, text in extra.items():
+        if section not in _KNOWN_SECTIONS:
+            lines += ["", f"## {section}", text]
+
+    lines += ["", f"## {HISTORY_SECTION}"]
+    lines += [f"- {h}" for h in record.get("更新履歴") or []]
+    return "\n".join(lines) + "\n"
+
+
+def delta_tool() -> Dict[str, Any]:
+    """差分出力用の tool 定義（Claude の tool use で JSON を返させる）"""
+    return {
+        "name": "update_master",
+        "description": "法人マスタに追加・修正する項目だけを返す。既存と同じ値・未確認の項目は含めない。",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "都道府県": {"type": "array", "items": {"type": "string"}, "description": "追加する勤務地の都道府県"},
+                "セグメント": {"type": "array", "items": {"type": "string"}, "description": "追加するセグメント"},
+                "fields": {
+                    "type": "object",
+                    "properties": {k: {"type": "string"} for k in FIELD_KEYS},
+                    "additionalProperties": False,
+                    "description": "新規・変更のあった項目のみ（1行で簡潔に）",
+                },
+                "訴求": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "セグメント": {"type": "string", "enum": list(APPEAL_SEGMENTS)},
+                            "採用": {"type": "string", "enum": list(ADOPT_VALUES)},
+                            "訴求": {"type": "string"},
+                        },
+                        "required": ["セグメント"],
+                    },
+                    "description": "新規・変更のあった候補者別訴求の行のみ",
+                },
+                "差別化メモ": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "追加する同エリア×同セグメント差別化ポイント",
+                },
+            },
+            "required": ["fields"],
+        },
+    }
+
+
+def compact_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """プロンプトに入れる現在値（空の項目・更新履歴を除く）"""
+    out: Dict[str, Any] = {k: record[k] for k in ("都道府県", "セグメント") if record.get(k)}
+    if record.get("fields"):
+        out["fields"] = dict(record["fields"])
+    if record.get("訴求"):
+        out["訴求"] = record["訴求"]
+    if record.get("差別化メモ"):
+        out["差別化メモ"] = record["差別化メモ"]
+    return out
+
+
+def validate_record(data: Any) -> Dict[str, Any]:
+    """サイドカー等から読んだ dict を検証して正規化する。形式が不正なら ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("法人マスタの dict ではありません")
+    name = str(data.get("会社名") or "").strip()
+    if not name:
+        raise ValueError("会社名がありません")
+    for key in ("fields", "訴求", "その他セクション"):
+        if not isinstance(data.get(key) or {}, dict):
+            raise ValueError(f"{key} が dict ではありません")
+    for key in ("都道府県", "セグメント", "差別化メモ", "更新履歴"):
+        if not isinstance(data.get(key) or [], (list, str)):
+            raise ValueError(f"{key} が list ではありません")
+
+    record = empty_record(name)
+    record["表示名"] = str(data.get("表示名") or name).strip()
+    record["最終更新"] = str(data.get("最終更新") or "")
+    record["出典"] = str(data.get("出典") or "")
+    for key in ("都道府県", "セグメント", "差別化メモ", "更新履歴"):
+        record[key] = _merge_list([], as_list(data.get(key)))
+    record["fields"] = {
+        str(k): _cell(v) for k, v in (data.get("fields") or {}).items() if _cell(v) and _cell(v) != "未確認"
+    }
+    for seg, row in (data.get("訴求") or {}).items():
+        if not isinstance(row, dict):
+            raise ValueError(f"訴求の行が dict ではありません: {seg}")
+        adopt = str(row.get("採用") or "").strip()
+        appeal = _cell(row.get("訴求"))
+        if adopt or appeal:
+            record["訴求"][str(seg)] = {"採用": adopt, "訴求": appeal}
+    record["その他セクション"] = {
+        str(k): str(v).strip() for k, v in (data.get("その他セクション") or {}).items() if str(v).strip()
+    }
+    return record
+
+
+def tool_input(response: Any, name: str) -> Optional[Dict[str, Any]]:
+    """応答から指定 tool の入力（dict）を取り出す。無ければ None"""
+    for block in getattr(response, "content", None) or []:
+        if getattr(block, "type", "") == "tool_use" and getattr(block, "name", "") == name:
+            data = getattr(block, "input", None)
+            return data if isinstance(data, dict) else None
+    return None
+
+
+# ---------------------------------------------------------------------------
+# サイドカー（{会社名}.json）
+# ---------------------------------------------------------------------------
+
+SIDECAR_VERSION = 1
+_CACHE_SIZE = 4096
+_cache_lock = threading.Lock()
+_cache: "OrderedDict[str, Tuple[Tuple[int, int], Optional[tuple], Dict[str, Any]]]" = OrderedDict()
+
+
+def sidecar_path(md_path: Path) -> Path:
+    return Path(md_path).with_suffix(".json")
+
+
+def _signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def write_sidecar(md_path: Path, record: Dict[str, Any]) -> None:
+    """サイドカーを書き込む。対応する Markdown の (mtime, size) を記録して鮮度の判定に使う"""
+    md_path = Path(md_path)
+    sig = _signature(md_path)
+    payload = {"v": SIDECAR_VERSION, "md": list(sig) if sig else None, "record": record}
+    path = sidecar_path(md_path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def save_master(md_path: Path, record: Dict[str, Any]) -> str:
+    """dict を検証し、Markdown とサイドカーを書き込む。戻り値: 書き込んだ Markdown"""
+    record = validate_record(record)
+    content = render_master(record)
+    Path(md_path).write_text(content, encoding="utf-8")
+    write_sidecar(md_path, record)
+    return content
+
+
+def _read_sidecar(md_path: Path) -> Optional[Dict[str, Any]]:
+    """有効なサイドカーの dict。無い・古い・壊れている場合は None"""
+    path = sidecar_path(md_path)
+    sig = _signature(path)
+    md_sig = _signature(Path(md_path))
+    if sig is None or md_sig is None:
+        return None
+    key = str(path)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == sig:
+            _cache.move_to_end(key)
+    if not cached or cached[0] != sig:
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            if not isinstance(payload, dict) or payload.get("v") != SIDECAR_VERSION:
+                return None
+            record = validate_record(payload.get("record"))
+            written_for = tuple(payload["md"]) if payload.get("md") else None
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning("サイドカーを読めません %s: %s", path.name, e)
+            return None
+        cached = (sig, written_for, record)
+        with _cache_lock:
+            _cache[key] = cached
+            _cache.move_to_end(key)
+            while len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+    # Markdown がサイドカーの後に書き換えられていたら使わない
+    return cached[2] if cached[1] == md_sig else None
+
+
+def sidecar_is_current(md_path: Path) -> bool:
+    """サイドカーがあり、現在の Markdown に対応しているか"""
+    return _read_sidecar(md_path) is not None
+
+
+def load_record(md_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    法人マスタの dict を返す。サイドカーが有効ならそれを、なければ Markdown を解析して変換する。
+    戻り値は共有のキャッシュなので変更しないこと（apply_delta は複製してから変更する）。
+    """
+    record = _read_sidecar(md_path)
+    if record is not None:
+        return record
+    rec = load_master(md_path)
+    if rec is None:
+        return None
+    record = record_from_master(rec)
+    # frontmatter に会社名がない旧ファイルはファイル名で補う
+    record["会社名"] = record["会社名"] or Path(md_path).stem
+    return validate_record(record)
+
+
+def record_meta(record: Dict[str, Any]) -> Dict[str, Any]:
+    """frontmatter 相当の項目（会社名・都道府県・セグメント・最終更新・出典）"""
+    return {k: record.get(k) for k in ("会社名", "都道府県", "セグメント", "最終更新", "出典")}
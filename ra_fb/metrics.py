@@ -0,0 +1,236 @@
+"""処理時間・トークン使用量・エラー数の計測（Prometheus テキスト形式で出力）
+
+ステージ（リファレンス読込・リサーチ・FB 生成・Slack 投稿・法人情報抽出・法人マスタ書込など）ごとの
+所要時間をヒストグラムに、Claude API のトークン数（input / output / キャッシュ）とエラー数・締め切りによるステージの省略回数を
+カウンターに記録する。キューの待ち件数などはゲージ関数を登録して出力時に取得する。
+webhook_server.py は GET /metrics で、slack_server.py は定期的なファイル出力で公開する。
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 秒。LLM 呼び出し（数十秒）から Slack 投稿・ファイル書込（数十ミリ秒）までをカバー
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+GaugeFn = Callable[[], Dict[str, float]]
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, b in enumerate(self.buckets):
+            if value <= b:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """バケット境界による近似分位点"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        for b, c in zip(self.buckets, self.counts):
+            if c >= target:
+                return b
+        return float("inf")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metrics:
+    """プロセス内の計測値。スレッドセーフ"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._durations: Dict[str, _Histogram] = {}
+        self._errors: Dict[str, int] = {}
+        self._degraded: Dict[str, int] = {}
+        self._tokens: Dict[Tuple[str, str], int] = {}
+        self._llm_requests: Dict[str, int] = {}
+        self._gauges: Dict[str, Tuple[str, str, GaugeFn]] = {}
+        self.started_at = time.time()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            hist = self._durations.get(stage)
+            if hist is None:
+                hist = self._durations[stage] = _Histogram(self.buckets)
+            hist.observe(seconds)
+
+    def error(self, stage: str) -> None:
+        with self._lock:
+            self._errors[stage] = self._errors.get(stage, 0) + 1
+
+    def degraded(self, stage: str) -> None:
+        """締め切りのためにステージを省略・縮小した回数"""
+        with self._lock:
+            self._degraded[stage] = self._degraded.get(stage, 0) + 1
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """ブロックの所要時間を記録。例外時はエラー数も数える"""
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            self.error(stage)
+            raise
+        finally:
+            self.observe(stage, time.monotonic() - start)
+
+    def record_usage(self, call: str, usage: Dict[str, int]) -> None:
+        """Claude API 1回分のトークン数（usage_dict の形式）"""
+        with self._lock:
+            self._llm_requests[call] = self._llm_requests.get(call, 0) + 1
+            for kind, n in usage.items():
+                key = (call, kind.replace("_input_tokens", "").replace("_tokens", ""))
+                self._tokens[key] = self._tokens.get(key, 0) + n
+
+    def register_gauge(self, name: str, help_text: str, fn: GaugeFn, label: str = "") -> None:
+        """出力時に fn() を呼んで値を取得するゲージ。fn は {ラベル値: 値}（label 空なら {"": 値}）"""
+        with self._lock:
+            self._gauges[name] = (help_text, label, fn)
+
+    def _gauge_values(self) -> List[Tuple[str, str, str, Dict[str, float]]]:
+        with self._lock:
+            gauges = list(self._gauges.items())
+        out = []
+        for name, (help_text, label, fn) in gauges:
+            try:
+                values = fn()
+            except Exception as e:
+                logger.debug("ゲージ取得失敗 %s: %s", name, e)
+                continue
+            out.append((name, help_text, label, values))
+        return out
+
+    def snapshot(self) -> dict:
+        """計測値の dict（統計ダンプ用）。所要時間は件数・平均・近似 p50/p95"""
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": h.count,
+                    "avg": h.sum / h.count if h.count else 0.0,
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                    "sum": h.sum,
+                }
+                for stage, h in sorted(self._durations.items())
+            }
+            tokens: Dict[str, Dict[str, int]] = {}
+            for (call, kind), n in sorted(self._tokens.items()):
+                tokens.setdefault(call, {})[kind] = n
+            data = {
+                "uptime": time.time() - self.started_at,
+                "stages": stages,
+                "errors": dict(sorted(self._errors.items())),
+                "degraded": dict(sorted(self._degraded.items())),
+                "llm_requests": dict(sorted(self._llm_requests.items())),
+                "tokens": tokens,
+            }
+        data["gauges"] = {name: values for name, _, _, values in self._gauge_values()}
+        return data
+
+    def render_prometheus(self) -> str:
+        """Prometheus テキスト形式（version 0.0.4）"""
+        lines: List[str] = []
+        with self._lock:
+            lines += [
+                "# HELP rafb_stage_duration_seconds ステージ別の所要時間",
+                "# TYPE rafb_stage_duration_seconds histogram",
+            ]
+            for stage, h in sorted(self._durations.items()):
+                s = _escape(stage)
+                for b, c in zip(h.buckets, h.counts):
+                    lines.append(f'rafb_stage_duration_seconds_bucket{{stage="{s}",le="{b:g}"}} {c}')
+                lines.append(f'rafb_stage_duration_seconds_bucket{{stage="{s}",le="+Inf"}} {h.count}')
+                lines.append(f'rafb_stage_duration_seconds_sum{{stage="{s}"}} {h.sum:.6f}')
+                lines.append(f'rafb_stage_duration_seconds_count{{stage="{s}"}} {h.count}')
+            lines += ["# HELP rafb_errors_total ステージ別のエラー数", "# TYPE rafb_errors_total counter"]
+            for stage, n in sorted(self._errors.items()):
+                lines.append(f'rafb_errors_total{{stage="{_escape(stage)}"}} {n}')
+            lines += [
+                "# HELP rafb_degraded_total 締め切りのために省略・縮小したステージの回数",
+                "# TYPE rafb_degraded_total counter",
+            ]
+            for stage, n in sorted(self._degraded.items()):
+                lines.append(f'rafb_degraded_total{{stage="{_escape(stage)}"}} {n}')
+            lines += ["# HELP rafb_llm_requests_total Claude API 呼び出し数", "# TYPE rafb_llm_requests_total counter"]
+            for call, n in sorted(self._llm_requests.items()):
+                lines.append(f'rafb_llm_requests_total{{call="{_escape(call)}"}} {n}')
+            lines += [
+                "# HELP rafb_llm_tokens_total Claude API のトークン数（kind: input / output / cache_read / cache_creation）",
+                "# TYPE rafb_llm_tokens_total counter",
+            ]
+            for (call, kind), n in sorted(self._tokens.items()):
+                lines.append(f'rafb_llm_tokens_total{{call="{_escape(call)}",kind="{kind}"}} {n}')
+        for name, help_text, label, values in self._gauge_values():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for key, value in sorted(values.items()):
+                labels = f'{{{label}="{_escape(key)}"}}' if label else ""
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """ログ出力用の1行サマリー（ステージ別の件数・平均・p95）"""
+        snap = self.snapshot()
+        parts = [f"{k}: n={v['count']} avg={v['avg']:.2f}s p95<={v['p95']:g}s" for k, v in snap["stages"].items()]
+        if snap["errors"]:
+            parts.append("errors: " + ", ".join(f"{k}={v}" for k, v in snap["errors"].items()))
+        if snap["degraded"]:
+            parts.append("degraded: " + ", ".join(f"{k}={v}" for k, v in snap["degraded"].items()))
+        return " | ".join(parts) or "（計測値なし）"
+
+    def start_dump(self, path: Path, interval: float = 60.0) -> threading.Thread:
+        """interval 秒ごとに Prometheus テキストを path に書き出し、サマリーをログに出す"""
+        path = Path(path)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_suffix(path.suffix + ".tmp")
+                    tmp.write_text(self.render_prometheus(), encoding="utf-8")
+                    tmp.replace(path)
+                    logger.info("stats %s", self.summary())
+                except Exception:
+                    logger.exception("統計の書き出しに失敗")
+
+        t = threading.Thread(target=run, name="rafb-metrics", daemon=True)
+        t.start()
+        return t
+
+
+METRICS = Metrics()
+
+
+def timed(stage: str):
+    """METRICS.timed の短縮形"""
+    return METRICS.timed(stage)
+
+
+def register_process_gauges() -> None:
+    """サーバー共通のゲージ（Slack outbox の状態別件数・Claude API の接続再利用状況・応答キャッシュ）を登録"""
+    from .llm import connection_stats, llm_cache_stats
+    from .outbox import get_outbox
+
+    METRICS.register_gauge("rafb_slack_outbox", "Slack outbox の状態別件数", lambda: get_outbox().counts(), label="status")
+    METRICS.register_gauge("rafb_llm_http", "Claude API の HTTP リクエスト数・新規接続数", connection_stats, label="kind")
+    METRICS.register_gauge("rafb_llm_cache", "Claude API 応答キャッシュのヒット数・ヒット率・件数・サイズ", llm_cache_stats, label="kind")
@@ -0,0 +1,297 @@
+"""Slack 投稿の永続 outbox（SQLite）
+
+生成した FB は投稿前に outbox に保存し、投稿先（共通・個別 Webhook）ごとに1行で管理する。
+投稿に失敗したものは pending のまま残り、フラッシャー（バックグラウンドスレッド）が
+バックオフしながら再投稿する。上限回数を超えたもの、Webhook が削除・無効化されている
+（429 以外の 4xx）ものは failed になり、scripts/slack_outbox.py で一覧・再送できる。
+Slack が落ちていても FB を生成し直す必要はない。
+
+送信済み（sent）の行は RAFB_OUTBOX_RETENTION_DAYS 日（既定 7 日）、failed の行は
+RAFB_OUTBOX_FAILED_RETENTION_DAYS 日（既定 30 日）でフラッシャーが削除する（0 以下で削除しない）。
+
+50 ブロックを超える FB は複数メッセージに分けて投稿するため、送信済みのメッセージ数を
+記録し、再投稿は続きから行う。
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .config import STATE_DIR, env_float
+from .db import connect
+from .slack import build_payloads, deliver_payload_status, is_permanent_failure, resolve_webhooks
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PATH = STATE_DIR / "slack_outbox.sqlite3"
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_FLUSH_INTERVAL = 30.0
+RETRY_BASE = 30.0
+RETRY_MAX = 3600.0
+SENDING_TIMEOUT = 600.0  # sending のまま止まった行（プロセス終了など）を pending に戻すまでの秒数
+DEFAULT_RETENTION_DAYS = 7.0  # sent の保持日数
+DEFAULT_FAILED_RETENTION_DAYS = 30.0  # failed の保持日数（再送の猶予）
+PRUNE_INTERVAL = 3600.0  # 古い行の削除を試みる間隔（秒）
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    webhook_url TEXT NOT NULL,
+    text TEXT NOT NULL,
+    label TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    parts_sent INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+def _retry_delay(attempts: int) -> float:
+    """次の再投稿までの秒数（指数バックオフ＋ジッター）"""
+    delay = min(RETRY_MAX, RETRY_BASE * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class SlackOutbox:
+    """Slack 投稿の outbox。status は pending → sending → sent / failed"""
+
+    def __init__(self, path: Path = OUTBOX_PATH, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> None:
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_prune = 0.0
+        with connect(self.path, _SCHEMA):
+            pass
+
+    def add(self, webhook_url: str, text: str, label: str = "") -> int:
+        """投稿前に保存。戻り値: outbox id"""
+        now = time.time()
+        with connect(self.path) as conn:
+            cur = conn.execute(
+                "INSERT INTO outbox (webhook_url, text, label, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (webhook_url, text, label, now, now, now),
+            )
+            return int(cur.lastrowid)
+
+    def _claim(self, message_id: int) -> Optional[Dict[str, Any]]:
+        """pending の行を sending にして取得（フラッシャーと同時に送らないため）"""
+        with connect(self.path) as conn:
+            claimed = conn.execute(
+                "UPDATE outbox SET status = 'sending', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = 'pending'",
+                (time.time(), message_id),
+            ).rowcount
+            if not claimed:
+                return None
+            return dict(conn.execute("SELECT * FROM outbox WHERE id = ?", (message_id,)).fetchone())
+
+    def deliver(self, message_id: int) -> bool:
+        """1件を投稿。失敗時は次回の再投稿時刻を設定（上限回数を超えたら failed）"""
+        row = self._claim(message_id)
+        if row is None:
+            return False
+        payloads = build_payloads(row["text"])
+        sent = row["parts_sent"]
+        status: Optional[int] = None
+        while sent < len(payloads):
+            ok, status = deliver_payload_status(row["webhook_url"], payloads[sent])
+            if not ok:
+                break
+            sent += 1
+            with connect(self.path) as conn:
+                conn.execute("UPDATE outbox SET parts_sent = ? WHERE id = ?", (sent, message_id))
+
+        now = time.time()
+        with connect(self.path) as conn:
+            if sent >= len(payloads):
+                conn.execute(
+                    "UPDATE outbox SET status = 'sent', last_error = NULL, updated_at = ? WHERE id = ?",
+                    (now, message_id),
+                )
+                return True
+            permanent = is_permanent_failure(status)  # Webhook の削除・無効化などは再投稿しても成功しない
+            failed = permanent or row["attempts"] >= self.max_attempts
+            conn.execute(
+                "UPDATE outbox SET status = ?, last_error = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                (
+                    "failed" if failed else "pending",
+                    f"{sent}/{len(payloads)} 件まで投稿済みで失敗" + (f"（HTTP {status}）" if status else ""),
+                    now + _retry_delay(row["attempts"]),
+                    now,
+                    message_id,
+                ),
+            )
+        if permanent:
+            logger.error("Slack投稿を断念 outbox #%d（HTTP %d。Webhook を確認してください）", message_id, status)
+        elif failed:
+            logger.error("Slack投稿を断念 outbox #%d（%d 回失敗）", message_id, row["attempts"])
+        else:
+            logger.warning("Slack投稿失敗 outbox #%d（後で再投稿）", message_id)
+        return False
+
+    def flush(self, limit: int = 50) -> Tuple[int, int]:
+        """再投稿時刻を過ぎた pending を投稿。戻り値: (成功, 失敗)"""
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute(
+                "UPDATE outbox SET status = 'pending' WHERE status = 'sending' AND updated_at < ?",
+                (now - SENDING_TIMEOUT,),
+            )
+            ids = [
+                r["id"]
+                for r in conn.execute(
+                    "SELECT id FROM outbox WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                    (now, limit),
+                )
+            ]
+        ok = ng = 0
+        for message_id in ids:
+            if self.deliver(message_id):
+                ok += 1
+            else:
+                ng += 1
+        if ids:
+            logger.info("outbox 再投稿: 成功 %d 件 / 失敗 %d 件", ok, ng)
+        return ok, ng
+
+    def prune(self) -> int:
+        """保持日数を過ぎた sent / failed の行を削除。戻り値: 削除件数"""
+        self._last_prune = time.time()
+        n = 0
+        with connect(self.path) as conn:
+            for status, var, default in (
+                ("sent", "RAFB_OUTBOX_RETENTION_DAYS", DEFAULT_RETENTION_DAYS),
+                ("failed", "RAFB_OUTBOX_FAILED_RETENTION_DAYS", DEFAULT_FAILED_RETENTION_DAYS),
+            ):
+                days = env_float(var, default)
+                if days > 0:
+                    n += conn.execute(
+                        "DELETE FROM outbox WHERE status = ? AND updated_at < ?", (status, time.time() - days * 86400)
+                    ).rowcount
+        if n:
+            logger.info("outbox の古い行を削除: %d 件", n)
+        return n
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """outbox の一覧（新しい順。本文は含めない）"""
+        sql = (
+            "SELECT id, webhook_url, label, status, parts_sent, attempts, last_error, created_at, updated_at, "
+            "length(text) AS chars FROM outbox"
+        )
+        params: list = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with connect(self.path) as conn:
+            return [dict(r) for r in conn.execute(sql, params)]
+
+    def get(self, message_id: int) -> Optional[Dict[str, Any]]:
+        with connect(self.path) as conn:
+            row = conn.execute("SELECT * FROM outbox WHERE id = ?", (message_id,)).fetchone()
+        return dict(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        """状態別の件数（pending / sending / sent / failed）"""
+        counts = {"pending": 0, "sending": 0, "sent": 0, "failed": 0}
+        with connect(self.path) as conn:
+            for status, n in conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"):
+                counts[status] = n
+        return counts
+
+    def requeue(self, ids: Optional[Sequence[int]] = None) -> int:
+        """failed（ids 指定時はその行）を pending に戻して試行回数をリセット。戻り値: 件数"""
+        now = time.time()
+        with connect(self.path) as conn:
+            if ids:
+                marks = ",".join("?" * len(ids))
+                return conn.execute(
+                    f"UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, updated_at = ? "
+                    f"WHERE id IN ({marks}) AND status IN ('pending', 'failed')",
+                    (now, now, *ids),
+                ).rowcount
+            return conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, updated_at = ? "
+                "WHERE status = 'failed'",
+                (now, now),
+            ).rowcount
+
+    def _run(self, interval: float) -> None:
+        while True:
+            try:
+                self.flush()
+                if time.time() - self._last_prune >= PRUNE_INTERVAL:
+                    self.prune()
+            except Exception:
+                logger.exception("outbox フラッシュ失敗")
+            if self._stop.wait(interval):
+                return
+
+    def start_flusher(self, interval: float = DEFAULT_FLUSH_INTERVAL) -> None:
+        """バックグラウンドで定期的に flush()。起動時に未送信分を1回送る"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="rafb-outbox", daemon=True)
+        self._thread.start()
+
+    def stop_flusher(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+_outbox_lock = threading.Lock()
+_outbox: Optional[SlackOutbox] = None
+
+
+def get_outbox() -> SlackOutbox:
+    """プロセス共有の outbox"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = SlackOutbox()
+        return _outbox
+
+
+def send_to_slack(text: str, webhook_url: Optional[str] = None, ra_name: str = "", label: str = "") -> Dict[str, Any]:
+    """
+    outbox 経由で Slack に投稿（post_to_slack の永続版）。
+    共通・個別 Webhook ごとに保存してから並列に投稿し、失敗分はフラッシャーが再投稿する。
+
+    Returns:
+        {"posted": 共通Webhookに投稿できたか, "queued": 失敗して再投稿待ちか, "outbox_ids": [...]}
+    """
+    url, individual_url = resolve_webhooks(webhook_url, ra_name)
+    if not url:
+        print("エラー: SLACK_WEBHOOK_URL が設定されていません。.env を確認してください。", file=sys.stderr)
+        return {"posted": False, "queued": False, "outbox_ids": []}
+
+    outbox = get_outbox()
+    ids = [outbox.add(url, text, label)]
+    if individual_url:
+        ids.append(outbox.add(individual_url, text, f"{label}:{ra_name}" if label else ra_name))
+    if len(ids) == 1:
+        results = [outbox.deliver(ids[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=len(ids), thread_name_prefix="rafb-slack") as executor:
+            results = list(executor.map(outbox.deliver, ids))
+    posted = results[0]
+    queued = not posted and (outbox.get(ids[0]) or {}).get("status") == "pending"
+    return {"posted": posted, "queued": queued, "outbox_ids": ids}
@@ -0,0 +1,152 @@
+"""FB ジョブのパイプライン（FB 生成・Slack 投稿・法人情報保存）
+
+FB 生成と法人情報の抽出（Web リサーチ＋Claude）は互いの結果を必要としないため
+並列に実行し、FB ができ次第 Slack に投稿する。ジョブ全体の所要時間は
+各ステージの合計ではなく、遅い方のステージ程度になる。
+
+ジョブには締め切り（deadline.py、RAFB_JOB_SLA）があり、残り時間が足りなければ
+Web リサーチ・長い文字起こしの区間抽出を省略・縮小して FB の投稿を優先する
+（法人情報の抽出自体は省略しない）。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from .company import extract_and_save_company_info
+from .deadline import Deadline, job_deadline
+from .feedback import generate_feedback_ca, generate_feedback_ra
+from .jobs import stage
+from .metrics import METRICS
+from .outbox import send_to_slack
+
+logger = logging.getLogger(__name__)
+
+
+def _save_company(
+    transcript: str,
+    company_name: str,
+    fb_type: str,
+    use_research: bool,
+    refresh_research: bool,
+    force: bool,
+    label: str,
+    deadline: Deadline,
+):
+    start = time.monotonic()
+    try:
+        with stage("company"):
+            path = extract_and_save_company_info(
+                transcript,
+                company_name=company_name,
+                source_type=fb_type,
+                use_research=use_research,
+                refresh_research=refresh_research,
+                force=force,
+                deadline=deadline,
+            )
+    except Exception as e:
+        logger.warning("法人情報保存失敗(%s): %s", label, e)
+        path = None
+    return path, time.monotonic() - start
+
+
+def run_feedback_job(
+    fb_type: str,
+    transcript: str,
+    company_name: str = "",
+    ra_name: str = "",
+    webhook_url: Optional[str] = None,
+    post: bool = True,
+    save_company: bool = True,
+    use_ai: bool = True,
+    use_research: bool = True,
+    refresh_research: bool = False,
+    force: bool = False,
+    label: str = "",
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
+    """
+    1件の文字起こしについて FB 生成 → Slack 投稿、並行して法人情報を抽出・保存する。
+
+    Args:
+        fb_type: "ra"（初回架電） or "ca"（法人面談）
+        webhook_url: 投稿先。未指定時は RA は SLACK_WEBHOOK_URL、CA は SLACK_WEBHOOK_URL_CA（なければ SLACK_WEBHOOK_URL）
+        post: Slack に投稿するか
+        save_company: 法人情報を抽出・保存するか
+        force: 抽出済みの文字起こしでも法人情報を再抽出するか
+        label: ログ用の呼び出し元名
+        deadline: ジョブの締め切り。未指定時は今から RAFB_JOB_SLA 秒
+
+    Returns:
+        {"message", "posted", "queued", "master_path", "timings", "degraded"}。timings はステージ別の秒数。
+        queued は投稿に失敗し outbox で再投稿待ちになっていること。degraded は締め切りのために省略・縮小したステージ
+    """
+    label = label or fb_type.upper()
+    deadline = deadline or job_deadline(label=label)
+    timings: Dict[str, float] = {}
+    start = time.monotonic()
+
+    executor = None
+    company_future = None
+    if save_company:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rafb-company")
+        company_future = executor.submit(
+            _save_company, transcript, company_name, fb_type, use_research, refresh_research, force, label, deadline
+        )
+
+    try:
+        t = time.monotonic()
+        with stage("fb"):
+            if fb_type == "ra":
+                message = generate_feedback_ra(
+                    transcript, ra_name=ra_name, company_name=company_name, use_ai=use_ai, deadline=deadline
+                )
+            else:
+                message = generate_feedback_ca(transcript, company_name=company_name, use_ai=use_ai, deadline=deadline)
+        timings["fb"] = time.monotonic() - t
+
+        posted = queued = False
+        if post:
+            t = time.monotonic()
+            with stage("slack"):
+                # outbox に保存してから投稿（失敗しても FB は失われず、後で再投稿される）
+                if fb_type == "ra":
+                    sent = send_to_slack(message, webhook_url=webhook_url, ra_name=ra_name, label=label)
+                else:
+                    url = webhook_url or os.environ.get("SLACK_WEBHOOK_URL_CA") or os.environ.get("SLACK_WEBHOOK_URL")
+                    sent = send_to_slack(message, webhook_url=url, label=label)
+                posted, queued = sent["posted"], sent["queued"]
+            timings["slack"] = time.monotonic() - t
+            timings["fb_posted_at"] = time.monotonic() - start
+            if deadline.expired():
+                logger.warning("FB 投稿が締め切りを超過(%s): 超過 %.1fs", label, -deadline.remaining())
+
+        master_path = None
+        if company_future is not None:
+            master_path, timings["company"] = company_future.result()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    timings["total"] = time.monotonic() - start
+    METRICS.observe("job", timings["total"])
+    degraded = deadline.degraded
+    logger.info(
+        "ジョブ完了(%s) %s%s",
+        label,
+        " ".join(f"{k}={v:.2f}s" for k, v in timings.items()),
+        f" degraded={','.join(degraded)}" if degraded else "",
+    )
+    return {
+        "message": message,
+        "posted": posted,
+        "queued": queued,
+        "master_path": master_path,
+        "timings": timings,
+        "degraded": degraded,
+    }
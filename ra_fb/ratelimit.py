@@ -0,0 +1,65 @@
+"""トークンバケット方式のレート制限（プロセス内で共有）"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+# Web 検索（DuckDuckGo）の既定レート: 毎秒2リクエスト、バースト4
+DEFAULT_SEARCH_RATE = 2.0
+DEFAULT_SEARCH_BURST = 4.0
+
+
+class TokenBucket:
+    """毎秒 rate 個補充され、最大 burst 個まで貯まるトークンバケット。スレッドセーフ"""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = max(rate, 0.0)
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0  # acquire で待った合計秒数
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """トークンを取得できるまで待つ。timeout 秒以内に取れなければ False"""
+        if self.rate <= 0:
+            return True  # 無制限
+        deadline = None if timeout is None else time.monotonic() + timeout
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.waited += now - start
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+_search_lock = threading.Lock()
+_search_limiter: Optional[TokenBucket] = None
+
+
+def get_search_limiter() -> TokenBucket:
+    """Web 検索用の共有リミッター。RAFB_SEARCH_RATE / RAFB_SEARCH_BURST で設定（0 で無制限）"""
+    global _search_limiter
+    with _search_lock:
+        if _search_limiter is None:
+            _search_limiter = TokenBucket(
+                env_float("RAFB_SEARCH_RATE", DEFAULT_SEARCH_RATE),
+                env_float("RAFB_SEARCH_BURST", DEFAULT_SEARCH_BURST),
+            )
+        return _search_limiter
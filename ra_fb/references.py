@@ -0,0 +1,125 @@
+"""リファレンス資料のプロセス内キャッシュ
+
+マニュアル・課題整理・プレイブック等は FB のたびに同じものを読むため、
+一度読んだ内容を保持し、ファイルの mtime/size が変わった時だけ読み直す。
+"""
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# (mtime_ns, size)。ファイルが無い場合は None
+Signature = Optional[Tuple[int, int]]
+
+# (キー, パス, 文字数上限, 前処理)
+ReferenceSpec = Tuple[str, Path, int, Optional[Callable[[str], str]]]
+
+REF_SEPARATOR = "\n\n---\n\n"
+
+
+def _signature(path: Path) -> Signature:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def join_references(refs: Dict[str, str]) -> str:
+    """リファレンスをプロンプト埋め込み用の1テキストに結合"""
+    return REF_SEPARATOR.join(f"【{k}】\n{v}" for k, v in refs.items())
+
+
+class ReferenceStore:
+    """リファレンスファイルのキャッシュ。スレッドセーフ。
+
+    ファイル単位で (mtime, size) を保持し、変化があったファイルのみ読み直す。
+    bundle() は refs と結合済み ref_text をまとめて返し、構成ファイルが
+    変わらない限り結合処理もやり直さない。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._files: Dict[tuple, Tuple[Signature, str]] = {}
+        self._bundles: Dict[str, Tuple[tuple, Dict[str, str], str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.bundle_hits = 0
+        self.bundle_misses = 0
+
+    def read(
+        self,
+        path: Path,
+        limit: int,
+        transform: Optional[Callable[[str], str]] = None,
+        signature: Signature = None,
+    ) -> str:
+        """ファイルを読み、前処理・文字数制限後の内容を返す。存在しなければ空文字"""
+        sig = signature if signature is not None else _signature(path)
+        if sig is None:
+            return ""
+        key = (str(path), limit, getattr(transform, "__name__", None))
+        with self._lock:
+            cached = self._files.get(key)
+            if cached and cached[0] == sig:
+                self.hits += 1
+                return cached[1]
+        try:
+            text = path.read_text(encoding="utf-8")
+        except OSError:
+            return ""
+        if transform:
+            text = transform(text)
+        text = text[:limit]
+        with self._lock:
+            self.misses += 1
+            self._files[key] = (sig, text)
+        return text
+
+    def bundle(self, name: str, specs: Sequence[ReferenceSpec]) -> Tuple[Dict[str, str], str]:
+        """specs のファイル群をまとめて読み込み (refs, ref_text) を返す"""
+        sigs = tuple((key, str(path), limit, _signature(path)) for key, path, limit, _ in specs)
+        with self._lock:
+            cached = self._bundles.get(name)
+            if cached and cached[0] == sigs:
+                self.bundle_hits += 1
+                return dict(cached[1]), cached[2]
+
+        refs: Dict[str, str] = {}
+        for (key, path, limit, transform), (_, _, _, sig) in zip(specs, sigs):
+            if sig is None:
+                continue
+            text = self.read(path, limit, transform, signature=sig)
+            if text:
+                refs[key] = text
+        ref_text = join_references(refs)
+        with self._lock:
+            self.bundle_misses += 1
+            self._bundles[name] = (sigs, refs, ref_text)
+        return dict(refs), ref_text
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "file_hits": self.hits,
+                "file_misses": self.misses,
+                "bundle_hits": self.bundle_hits,
+                "bundle_misses": self.bundle_misses,
+                "cached_files": len(self._files),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._files.clear()
+            self._bundles.clear()
+
+
+_STORE = ReferenceStore()
+
+
+def get_reference_store() -> ReferenceStore:
+    """プロセス共有のリファレンスストア"""
+    return _STORE
+
@@ -0,0 +1,116 @@
+"""事業リサーチ（Web 検索）結果のディスクキャッシュ
+
+(会社名, クエリ) ごとの検索結果を SQLite に保存し、TTL 内なら検索せずに返す。
+件数上限を超えたら最終アクセスが古いものから削除する（LRU）。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import STATE_DIR, env_float
+from .db import connect
+
+logger = logging.getLogger(__name__)
+
+RESEARCH_CACHE_PATH = STATE_DIR / "research_cache.sqlite3"
+DEFAULT_TTL_DAYS = 14.0
+DEFAULT_MAX_ENTRIES = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS research (
+    company TEXT NOT NULL,
+    query TEXT NOT NULL,
+    results TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (company, query)
+);
+CREATE INDEX IF NOT EXISTS idx_research_accessed ON research (accessed_at);
+"""
+
+
+class ResearchCache:
+    """検索結果キャッシュ。ttl 秒を過ぎたエントリは無効、max_entries を超えたら LRU で削除"""
+
+    def __init__(self, path: Path = RESEARCH_CACHE_PATH, ttl: Optional[float] = None, max_entries: Optional[int] = None) -> None:
+        self.path = Path(path)
+        self.ttl = ttl if ttl is not None else env_float("RAFB_RESEARCH_TTL_DAYS", DEFAULT_TTL_DAYS) * 86400
+        self.max_entries = max_entries if max_entries is not None else int(
+            env_float("RAFB_RESEARCH_CACHE_MAX", DEFAULT_MAX_ENTRIES)
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with connect(self.path, _SCHEMA):
+            pass
+
+    def get(self, company: str, query: str) -> Optional[List[dict]]:
+        """TTL 内の検索結果を返す。無い・期限切れなら None"""
+        now = time.time()
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT results, created_at FROM research WHERE company = ? AND query = ?",
+                (company, query),
+            ).fetchone()
+            if row and now - row["created_at"] <= self.ttl:
+                conn.execute(
+                    "UPDATE research SET accessed_at = ? WHERE company = ? AND query = ?",
+                    (now, company, query),
+                )
+                with self._lock:
+                    self.hits += 1
+                return json.loads(row["results"])
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, company: str, query: str, results: List[dict]) -> None:
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO research (company, query, results, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (company, query, json.dumps(results, ensure_ascii=False), now, now),
+            )
+            count = conn.execute("SELECT COUNT(*) FROM research").fetchone()[0]
+            if self.max_entries > 0 and count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM research WHERE rowid IN (SELECT rowid FROM research ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def invalidate(self, company: str) -> int:
+        """会社単位でキャッシュを削除。戻り値: 削除件数"""
+        with connect(self.path) as conn:
+            return conn.execute("DELETE FROM research WHERE company = ?", (company,)).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with connect(self.path) as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM research").fetchone()[0]
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+_cache_lock = threading.Lock()
+_cache: Optional[ResearchCache] = None
+
+
+def get_research_cache() -> Optional[ResearchCache]:
+    """プロセス共有のキャッシュ。RAFB_RESEARCH_CACHE=0 で無効（None）"""
+    global _cache
+    if os.environ.get("RAFB_RESEARCH_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = ResearchCache()
+            except Exception as e:
+                logger.warning("リサーチキャッシュを開けません: %s", e)
+                return None
+        return _cache
@@ -1,18 +1,38 @@
-"""Slack 投稿"""
+"""Slack 投稿
+
+Incoming Webhook への投稿は、ホストごとに keep-alive 接続を再利用する。
+429（レート制限）は Retry-After に従い、5xx・接続エラーはジッター付きの指数バックオフで再試行する。
+50 ブロックを超える本文は順序どおりの続きメッセージに分けて投稿し、
+共通チャンネルと個別チャンネル（SLACK_WEBHOOK_URL_{RA名}）には並列に投稿する。
+"""
 
 from __future__ import annotations
 
+import http.client
 import json
-from typing import List, Optional
+import logging
 import os
+import random
 import sys
-import urllib.request
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
 
-from .config import load_env
+from .config import env_int, load_env
+from .metrics import METRICS, timed
 
 load_env()
+logger = logging.getLogger(__name__)
 
 SLACK_TEXT_LIMIT = 3000
+SLACK_BLOCK_LIMIT = 50  # 1メッセージあたりのブロック数上限
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+RETRY_AFTER_MAX = 60.0
 
 
 def _chunk_text(text: str, limit: int = SLACK_TEXT_LIMIT) -> List[str]:
@@ -31,27 +51,166 @@ def _chunk_text(text: str, limit: int = SLACK_TEXT_LIMIT) -> List[str]:
     return chunks
 
 
-def _post_to_webhook(url: str, text: str) -> bool:
-    """指定Webhookに投稿"""
-    chunks = _chunk_text(text)
-    payload = {
-        "blocks": [
-            {"type": "section", "text": {"type": "plain_text", "text": c, "emoji": True}}
-            for c in chunks
-        ]
-    }
+def build_payloads(text: str) -> List[dict]:
+    """本文を Slack の payload に変換。50 ブロックを超える場合は続きのメッセージに分ける"""
+    blocks = [
+        {"type": "section", "text": {"type": "plain_text", "text": c, "emoji": True}}
+        for c in _chunk_text(text)
+    ]
+    return [{"blocks": blocks[i : i + SLACK_BLOCK_LIMIT]} for i in range(0, len(blocks), SLACK_BLOCK_LIMIT)]
+
+
+class _ConnectionPool:
+    """(scheme, host, port) ごとのアイドル接続を保持し、keep-alive で再利用する"""
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+
+    def acquire(self, scheme: str, host: str, port: int) -> Tuple[http.client.HTTPConnection, bool]:
+        """(接続, 再利用かどうか)"""
+        key = (scheme, host, port)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout), False
+
+    def release(self, scheme: str, host: str, port: int, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault((scheme, host, port), []).append(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+_pool = _ConnectionPool()
+
+
+def _backoff(attempt: int) -> float:
+    """指数バックオフ（フルジッター）"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after(value: Optional[str]) -> float:
     try:
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(payload).encode("utf-8"),
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=30) as res:
-            return res.status == 200
-    except Exception as e:
-        print(f"Slack投稿エラー: {e}", file=sys.stderr)
-        return False
+        return min(RETRY_AFTER_MAX, max(0.0, float(value or 1)))
+    except ValueError:
+        return 1.0
+
+
+def _request(url: str, body: bytes) -> Tuple[int, Dict[str, str], str]:
+    """1回の POST。keep-alive 接続が切れていた場合は新しい接続でやり直す"""
+    parts = urlsplit(url)
+    scheme = parts.scheme or "https"
+    host = parts.hostname or ""
+    port = parts.port or (443 if scheme == "https" else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+
+    while True:
+        conn, reused = _pool.acquire(scheme, host, port)
+        try:
+            conn.request("POST", path, body=body, headers=headers)
+            res = conn.getresponse()
+            data = res.read().decode("utf-8", "replace")
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            if reused:
+                continue  # アイドル中にサーバーが閉じた接続
+            raise
+        except Exception:
+            conn.close()
+            raise
+        if res.will_close:
+            conn.close()
+        else:
+            _pool.release(scheme, host, port, conn)
+        return res.status, {k.lower(): v for k, v in res.getheaders()}, data
+
+
+def _max_attempts() -> int:
+    return max(1, env_int("RAFB_SLACK_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+
+
+def deliver_payload(url: str, payload: dict, max_attempts: Optional[int] = None) -> bool:
+    """1メッセージを投稿。429 は Retry-After、5xx・接続エラーはバックオフで再試行"""
+    return deliver_payload_status(url, payload, max_attempts)[0]
+
+
+def deliver_payload_status(url: str, payload: dict, max_attempts: Optional[int] = None) -> Tuple[bool, Optional[int]]:
+    """deliver_payload と同じ。戻り値: (成功したか, 最後の HTTP ステータス。接続エラーなら None)"""
+    with timed("slack_post"):
+        ok, status = _deliver_payload(url, payload, max_attempts)
+    if not ok:
+        METRICS.error("slack_post")
+    return ok, status
+
+
+def is_permanent_failure(status: Optional[int]) -> bool:
+    """再試行しても成功しない応答か（Webhook の削除・無効化による 403 / 404 / 410 など、429 以外の 4xx）"""
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+def _deliver_payload(url: str, payload: dict, max_attempts: Optional[int]) -> Tuple[bool, Optional[int]]:
+    if max_attempts is None:
+        max_attempts = _max_attempts()
+    body = json.dumps(payload).encode("utf-8")
+    status: Optional[int] = None
+    for attempt in range(max_attempts):
+        last = attempt == max_attempts - 1
+        try:
+            status, headers, data = _request(url, body)
+        except Exception as e:
+            status = None
+            if last:
+                print(f"Slack投稿エラー: {e}", file=sys.stderr)
+                return False, None
+            wait = _backoff(attempt)
+            logger.warning("Slack投稿の接続エラー（%.1f秒後に再試行）: %s", wait, e)
+            time.sleep(wait)
+            continue
+        if status == 200:
+            return True, status
+        if status == 429:
+            METRICS.error("slack_429")
+            wait = _retry_after(headers.get("retry-after")) + random.uniform(0, 1)
+        elif status >= 500:
+            wait = _backoff(attempt)
+        else:
+            print(f"Slack投稿エラー: HTTP {status} {data[:200]}", file=sys.stderr)
+            return False, status
+        if last:
+            print(f"Slack投稿エラー: HTTP {status}（再試行上限）", file=sys.stderr)
+            return False, status
+        logger.warning("Slack投稿 HTTP %d（%.1f秒後に再試行）", status, wait)
+        time.sleep(wait)
+    return False, status
+
+
+def _post_to_webhook(url: str, text: str) -> bool:
+    """指定Webhookに投稿。50 ブロックを超える場合は順に続きを投稿する"""
+    for payload in build_payloads(text):
+        if not deliver_payload(url, payload):
+            return False
+    return True
+
+
+def resolve_webhooks(webhook_url: Optional[str] = None, ra_name: str = "") -> Tuple[Optional[str], Optional[str]]:
+    """(共通Webhook, 個別Webhook)。個別は SLACK_WEBHOOK_URL_{ra_name}（共通と同じなら None）"""
+    url = webhook_url or os.environ.get("SLACK_WEBHOOK_URL")
+    individual_url = os.environ.get(f"SLACK_WEBHOOK_URL_{ra_name}") if ra_name else None
+    if individual_url == url:
+        individual_url = None
+    return url, individual_url
 
 
 def post_to_slack(
@@ -59,19 +218,17 @@ def post_to_slack(
     webhook_url: Optional[str] = None,
     ra_name: str = "",
 ) -> bool:
-    """Slackに投稿。ra_name 指定時は個別Webhookにも投稿"""
-    url = webhook_url or os.environ.get("SLACK_WEBHOOK_URL")
+    """Slackに投稿。ra_name 指定時は個別Webhookにも並列に投稿。戻り値は共通Webhookへの投稿結果"""
+    url, individual_url = resolve_webhooks(webhook_url, ra_name)
     if not url:
         print("エラー: SLACK_WEBHOOK_URL が設定されていません。.env を確認してください。", file=sys.stderr)
         return False
+    if not individual_url:
+        return _post_to_webhook(url, text)
 
-    if not _post_to_webhook(url, text):
-        return False
-
-    if ra_name:
-        key = f"SLACK_WEBHOOK_URL_{ra_name}"
-        individual_url = os.environ.get(key)
-        if individual_url:
-            _post_to_webhook(individual_url, text)
-
-    return True
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="rafb-slack") as executor:
+        shared = executor.submit(_post_to_webhook, url, text)
+        individual = executor.submit(_post_to_webhook, individual_url, text)
+        if not individual.result():
+            logger.warning("個別Webhookへの投稿に失敗(%s)", ra_name)
+        return shared.result()
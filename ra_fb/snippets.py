@@ -0,0 +1,224 @@
+"""事業リサーチの検索結果（スニペット）の整理
+
+検索結果をそのまま先頭から詰めると、同じ記事の転載（PR TIMES 等）や同名の別会社の
+結果がプロンプトの枠を使い切ってしまう。Claude に渡す前に次の順で絞り込む。
+
+  1. 関連度の採点（会社名の一致・クエリが狙う項目のキーワード・検索順位・公式サイト）
+  2. 同名他社の除外（会社名に一致する結果があるとき、一致しない結果は捨てる）
+  3. トークン予算での詰め込み（各クエリの最良の1件を先に入れ、残りは関連度順）。
+     採用済みのものと近似重複（文字 n-gram の MinHash（bottom-k）で類似度が閾値以上）になるものは飛ばす
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .config import env_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 2000
+DUPLICATE_THRESHOLD = 0.7  # MinHash の推定 Jaccard 類似度がこれ以上なら近似重複
+SHINGLE_SIZE = 4
+MIN_TRUNCATED_TOKENS = 150  # 予算の残りがこれ以上なら、収まらないスニペットを切り詰めて入れる
+
+SKETCH_SIZE = 32  # MinHash 署名の大きさ（n-gram のハッシュ値の小さい方から k 個）
+
+# 項目ごとに、検索結果に含まれていれば関連が高いとみなす語
+FIELD_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "法人HP URL": ("公式", "会社概要", "企業情報"),
+    "事業概要": ("事業", "業務内容", "施工", "工事"),
+    "売上構成比": ("売上", "構成", "億円", "セグメント"),
+    "今後の注力領域": ("中期経営計画", "注力", "戦略", "方針", "ビジョン"),
+    "企業スナップショット": ("創業", "設立", "従業員", "資本金", "売上"),
+    "マーケット成長性": ("市場", "成長", "需要", "競合", "シェア"),
+    "前職規模別USP": ("強み", "特徴", "成長", "安定"),
+    "口コミ評価傾向": ("口コミ", "評判", "openwork", "転職会議", "評価"),
+    "休日・直行直帰・リモート": ("休日", "直行直帰", "リモート", "在宅", "週休"),
+    "残業時間": ("残業", "時間外"),
+    "福利厚生": ("福利厚生", "手当", "社会保険", "退職金"),
+    "採用意思決定者": ("採用", "人事", "担当", "面接"),
+}
+
+_COMPANY_AFFIXES = re.compile(r"株式会社|有限会社|合同会社|（株）|\(株\)|㈱|\s")
+_SHINGLE_STRIP = re.compile(r"[\s、。，．,.・!！?？「」『』（）()【】\[\]\-ー―…:：/|｜]+")
+
+
+@dataclass
+class Snippet:
+    """検索結果1件"""
+
+    title: str
+    href: str
+    body: str
+    query: int  # クエリの番号
+    rank: int  # クエリ内の順位（0 始まり）
+    include_url: bool = False
+    name_hit: bool = False
+    score: float = 0.0
+
+    def render(self, body: Optional[str] = None) -> str:
+        body = self.body if body is None else body
+        if self.include_url and self.href:
+            return f"【{self.title}】\nURL: {self.href}\n{body}"
+        return f"【{self.title}】\n{body}"
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（日本語は1文字≒1トークン、ASCII は4文字≒1トークン）"""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return len(text) - ascii_chars + (ascii_chars + 3) // 4
+
+
+def token_budget() -> int:
+    return env_int("RAFB_RESEARCH_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)
+
+
+def name_variants(names: Iterable[str]) -> List[str]:
+    """会社名の照合用の表記（法人格を除く）。
+
+    ファイル名由来の「DAIICHI_DENKO」「AILE_アイルエンジニアリング」は「_」で分け、日本語の部分は
+    単独でも使う。英字の部分は単独だと別会社（Daiichi 等）にも一致するため、つなげた形だけを使う。
+    """
+    out: List[str] = []
+
+    def add(value: str) -> None:
+        value = value.strip().lower()
+        if len(value) >= (3 if value.isascii() else 2) and value not in out:
+            out.append(value)
+
+    for name in names:
+        name = _COMPANY_AFFIXES.sub("", name or "")
+        parts = [p for p in name.split("_") if p]
+        add(name)
+        ascii_parts = [p for p in parts if p.isascii()]
+        add(" ".join(ascii_parts))
+        add("".join(ascii_parts))
+        for part in parts:
+            if not part.isascii():
+                add(part)
+    return out
+
+
+def collect_snippets(queries: Sequence[Tuple[str, bool]], results: Sequence[Optional[List[dict]]]) -> List[Snippet]:
+    """クエリ順に検索結果を並べ、本文（無ければ URL）の完全一致を除く"""
+    snippets: List[Snippet] = []
+    seen: set = set()
+    for qi, ((_, include_url), rows) in enumerate(zip(queries, results)):
+        for rank, r in enumerate(rows or []):
+            body = (r.get("body") or "").strip()
+            title = (r.get("title") or "").strip()
+            href = (r.get("href") or "").strip()
+            key = body or href
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            if body or (include_url and href):
+                snippets.append(Snippet(title, href, body, qi, rank, include_url))
+    return snippets
+
+
+def score_snippets(
+    snippets: List[Snippet], names: Sequence[str], query_fields: Sequence[Tuple[str, ...]]
+) -> List[Snippet]:
+    """関連度を付け、同名他社と思われる結果を除いて関連度順に並べる"""
+    variants = name_variants(names)
+    for s in snippets:
+        text = f"{s.title}\n{s.body}".lower()
+        s.name_hit = any(v in text for v in variants)
+        fields = query_fields[s.query] if s.query < len(query_fields) else ()
+        keywords = {kw.lower() for f in fields for kw in FIELD_KEYWORDS.get(f, ())}
+        hits = sum(1 for kw in keywords if kw in text)
+        s.score = 2.0 * s.name_hit + min(hits, 3) / 3 + 0.5 / (1 + s.rank) + (0.5 if s.include_url and s.href else 0.0)
+    # 会社名に一致する結果があれば、一致しないもの（同名・類似名の別会社など）は使わない
+    if any(s.name_hit for s in snippets):
+        snippets = [s for s in snippets if s.name_hit]
+    return sorted(snippets, key=lambda s: (-s.score, s.query, s.rank))
+
+
+def _shingles(text: str) -> set:
+    text = _SHINGLE_STRIP.sub("", text.lower())
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """文字 n-gram 集合の MinHash 署名（1つのハッシュ関数で小さい方から SKETCH_SIZE 個を取る bottom-k 方式）"""
+    return tuple(sorted({zlib.crc32(s.encode("utf-8")) for s in _shingles(text)})[:SKETCH_SIZE])
+
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """署名から Jaccard 類似度を推定（n-gram が SKETCH_SIZE 個以下なら厳密値）"""
+    if not sig_a or not sig_b:
+        return 0.0
+    a, b = set(sig_a), set(sig_b)
+    both = a & b
+    if not both:
+        return 0.0
+    union = sorted(a | b)[:SKETCH_SIZE]
+    return sum(1 for h in union if h in both) / len(union)
+
+
+def pack_snippets(
+    snippets: List[Snippet], budget: int, threshold: float = DUPLICATE_THRESHOLD
+) -> Tuple[List[str], int]:
+    """
+    予算内に収まるよう整形済みのスニペットを選ぶ。各クエリの最良の1件を先に入れ、残りは関連度順。
+    採用済みのものと近似重複になるスニペットは飛ばす（署名は詰める候補になったものだけ計算する）。
+
+    Returns:
+        (整形済みのスニペット, 近似重複として除いた件数)
+    """
+    firsts: Dict[int, Snippet] = {}
+    for s in snippets:
+        firsts.setdefault(s.query, s)
+    ordered = list(firsts.values()) + [s for s in snippets if firsts.get(s.query) is not s]
+
+    packed: List[str] = []
+    signatures: List[Tuple[int, ...]] = []
+    duplicates = 0
+    used = 0
+    separator = estimate_tokens("\n\n---\n\n")
+    for s in ordered:
+        if budget - used < MIN_TRUNCATED_TOKENS:
+            break
+        text = s.render()
+        cost = estimate_tokens(text) + separator
+        remaining = budget - used - separator - estimate_tokens(s.render(""))
+        if used + cost > budget and (remaining < MIN_TRUNCATED_TOKENS or not s.body):
+            continue
+        sig = minhash(f"{s.title}\n{s.body}")
+        if any(similarity(sig, other) >= threshold for other in signatures):
+            duplicates += 1
+            continue
+        signatures.append(sig)
+        if used + cost > budget:
+            text = s.render(s.body[:remaining].rstrip() + "…")
+            cost = estimate_tokens(text) + separator
+        packed.append(text)
+        used += cost
+    return packed, duplicates
+
+
+def build_research_text(
+    queries: Sequence[Tuple[str, bool]],
+    results: Sequence[Optional[List[dict]]],
+    names: Sequence[str],
+    query_fields: Sequence[Tuple[str, ...]],
+    budget: Optional[int] = None,
+) -> str:
+    """検索結果を採点・重複除去・予算内に詰めて、プロンプトに入れるテキストにする"""
+    budget = token_budget() if budget is None else budget
+    collected = collect_snippets(queries, results)
+    ranked = score_snippets(collected, names, query_fields)
+    packed, duplicates = pack_snippets(ranked, budget)
+    logger.debug(
+        "リサーチ結果: %d 件 → 同名他社除外 %d 件・近似重複除外 %d 件 → %d 件",
+        len(collected), len(collected) - len(ranked), duplicates, len(packed),
+    )
+    return "\n\n---\n\n".join(packed)
@@ -0,0 +1,173 @@
+"""文字起こしの圧縮（LLM に渡す前の決定的な前処理）
+
+Notta の文字起こしにはタイムスタンプ・話者ラベル・フィラー（えー、あのー）・
+相槌だけの行が多く、プロンプトの文字数上限を圧迫する。compact_transcript() は
+話者ターンを「話者: 発言」の形に揃え、タイムスタンプとフィラーを除き、
+連続する相槌・重複行をまとめる。同じ入力には常に同じ出力を返す。
+
+話者として扱うのは見出し行（「話者1 00:00:12」）で宣言された話者と、行頭の「話者N:」
+「見出しで宣言済みの名前:」「名前：「発言」」だけ。議事録の「出張：未確認」や本文の「9:00」は
+話者とみなさない。後続の話者なし行に引き継ぐのは見出し行の話者だけ。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TS = r"\d{1,2}:\d{2}(?::\d{2})?"
+# 本文中の時刻（9:00 など）と区別するため、括弧付きか時:分:秒のものだけをタイムスタンプとみなす
+_STAMP = rf"(?:[\[(（]{_TS}[\])）]|\d{{1,2}}:\d{{2}}:\d{{2}})"
+# 行頭のタイムスタンプ
+_LEADING_TS_RE = re.compile(rf"^\s*{_STAMP}\s*")
+# 「話者1 00:00:12」「Speaker 2 (0:12)」「小山田 00:01:05」のような話者見出し行
+_SPEAKER_HEADER_RE = re.compile(
+    rf"^\s*(?P<speaker>(?:話者|スピーカー|Speaker)\s*\d+|[^\s:：|#`\-]{{1,12}})\s*{_STAMP}\s*$"
+)
+# 「話者1: 発言」「Speaker 1：発言」「小山田：発言」のような話者付きの行（候補。_split_turn で形を確かめる）
+_SPEAKER_INLINE_RE = re.compile(r"^\s*(?P<speaker>(?:話者|スピーカー|Speaker)\s*\d+|[^\s:：|#`\-・*「」]{1,12})\s*[:：]\s*(?P<text>.+)$")
+_NUMBERED_SPEAKER_RE = re.compile(r"(?:話者|スピーカー|Speaker)\s*\d+")
+# 句読点・行頭の直後にあるフィラー（語中の「あの」「まあ」は残す）
+_FILLER_RE = re.compile(
+    r"(?<![^\s、。，,！？!?「」])"
+    r"(?:えー*っと|えー+と|え+ー+|あの+ー+|あの(?=[、,，…])|あのですね|その+ー+|まあ+ー*|う+ー+ん|ん+ー+|あ+ー+)"
+    r"[、,，…。．\s]*"
+)
+# 相槌だけの発言
+_BACKCHANNEL_RE = re.compile(
+    r"^(?:(?:はい|ええ|うん|そうですね|そうですか|なるほど|はいはい|ああ|あ|へえ|おお|承知しました|かしこまりました)[、。,.！!…\s]*)+$"
+)
+# 「はい、はい、はい」→「はい、」
+_REPEAT_RE = re.compile(r"((?:はい|ええ|うん|そう)[、,，\s]*)\1+")
+_SPACES_RE = re.compile(r"[ \t　]+")
+# フィラーを除いた後に発言の先頭に残る句読点
+_LEADING_PUNCT = " 、,，。．.…！？!?"
+_INVISIBLE = dict.fromkeys(map(ord, "﻿​‌‍"), None)
+
+
+@dataclass
+class CompactResult:
+    """圧縮結果。saved は削減文字数"""
+
+    text: str
+    original_chars: int
+    compact_chars: int
+
+    @property
+    def saved(self) -> int:
+        return self.original_chars - self.compact_chars
+
+    @property
+    def ratio(self) -> float:
+        """削減率（0〜1）"""
+        return self.saved / self.original_chars if self.original_chars else 0.0
+
+
+def _is_passthrough(line: str) -> bool:
+    """Markdown の見出し・表・コードフェンス・区切りはそのまま残す"""
+    s = line.lstrip()
+    return s.startswith(("#", "|", "```", "---"))
+
+
+def _clean_text(text: str) -> str:
+    text = _FILLER_RE.sub("", text)
+    text = _REPEAT_RE.sub(r"\1", text)
+    # フィラーだけの発言（「えーっと。」）は句読点も残さない
+    return _SPACES_RE.sub(" ", text).lstrip(_LEADING_PUNCT).rstrip(" 、,，")
+
+
+def _split_turn(line: str, known: Set[str]) -> Tuple[Optional[str], str]:
+    """
+    (話者, 発言)。話者が無ければ None。
+    話者とみなすのは「話者N」、見出し行で宣言済みの名前（known）、直後が「 の名前だけ。
+    数字で終わるもの（9:00 の「9」など）は名前とみなさない
+    """
+    m = _SPEAKER_INLINE_RE.match(line)
+    if not m:
+        return None, line
+    who, said = m.group("speaker").strip(), m.group("text")
+    if _NUMBERED_SPEAKER_RE.fullmatch(who):
+        return who, said
+    if who[-1].isdigit():
+        return None, line
+    if who in known or said.startswith("「"):
+        return who, said
+    return None, line
+
+
+def compact_transcript(text: str) -> CompactResult:
+    """文字起こしを圧縮する（話者ターンの正規化・タイムスタンプ／フィラー除去・相槌と重複の集約）"""
+    original = text or ""
+    lines = original.translate(_INVISIBLE).replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+    known = {m.group("speaker").strip() for m in map(_SPEAKER_HEADER_RE.match, lines) if m}
+    out: List[str] = []
+    speaker: Optional[str] = None  # 見出し行で指定された現在の話者
+    last_turn: Optional[Tuple[Optional[str], str]] = None
+    last_backchannel = False
+    last_inline = False
+
+    for raw in lines:
+        if _is_passthrough(raw):
+            out.append(raw.rstrip())
+            speaker, last_turn, last_backchannel, last_inline = None, None, False, False
+            continue
+        header = _SPEAKER_HEADER_RE.match(raw)
+        if header:
+            speaker = header.group("speaker").strip()
+            continue
+        line = _LEADING_TS_RE.sub("", raw)
+        if not line.strip():
+            continue
+        who, said = _split_turn(line, known)
+        inline = who is not None  # 行内の話者はその行だけ（後続行に引き継がず、まとめない）
+        if not inline:
+            who = speaker
+        said = _clean_text(said)
+        if not said:
+            continue
+
+        backchannel = bool(_BACKCHANNEL_RE.match(said))
+        if who is not None and (who, said) == last_turn:
+            continue  # 同じ話者による同じ発言の繰り返し
+        if backchannel and last_backchannel:
+            continue  # 相槌の連続は最初の1つだけ
+        if (
+            last_turn is not None and who is not None and who == last_turn[0]
+            and not inline and not last_inline and not backchannel and not last_backchannel
+        ):
+            out[-1] += " " + said  # 同じ話者の連続行は1ターンにまとめる
+        else:
+            out.append(f"{who}: {said}" if who else said)
+        last_turn = (who, said)
+        last_backchannel = backchannel
+        last_inline = inline
+
+    compact = "\n".join(out).strip()
+    return CompactResult(text=compact, original_chars=len(original), compact_chars=len(compact))
+
+
+def compaction_enabled() -> bool:
+    """RAFB_COMPACT_TRANSCRIPT=0 で無効"""
+    return os.environ.get("RAFB_COMPACT_TRANSCRIPT", "1") != "0"
+
+
+def prepare_transcript(text: str, label: str = "") -> str:
+    """LLM に渡す文字起こしを用意（圧縮が有効なら圧縮し、削減量をログに出す）"""
+    if not compaction_enabled():
+        return text
+    result = compact_transcript(text)
+    logger.info(
+        "文字起こし圧縮(%s) %d→%d 文字（-%d, %.0f%%）",
+        label,
+        result.original_chars,
+        result.compact_chars,
+        result.saved,
+        result.ratio * 100,
+    )
+    return result.text
@@ -7,19 +7,92 @@
   python scripts/bulk_import_company.py --dry-run          # 実行せず一覧のみ
   python scripts/bulk_import_company.py --ra-only          # long_calls（RA）のみ
   python scripts/bulk_import_company.py --ca-only          # 法人面談議事録（CA）のみ
+  python scripts/bulk_import_company.py --workers 4        # 4並列で実行
+  python scripts/bulk_import_company.py --restart          # チェックポイントを破棄して最初から
+  python scripts/bulk_import_company.py --force            # 反映済みの文字起こしも再抽出
+
+中断した場合は再実行すると、チェックポイント（data/state/bulk_import_checkpoint.json）
+から完了済みのファイルを飛ばして続きから処理する。
+内容が変わっていない文字起こし（抽出マニフェストに記録済み）は --force なしではスキップする。
 """
 
+import json
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
 from ra_fb import load_env, extract_ra_from_path, extract_company_name, extract_and_save_company_info
-from ra_fb.config import LONG_CALLS_DIR, CA_DIR
+from ra_fb.company import _sanitize_filename, is_company_info_current
+from ra_fb.config import LONG_CALLS_DIR, CA_DIR, STATE_DIR
 
 load_env()
 
+CHECKPOINT_PATH = STATE_DIR / "bulk_import_checkpoint.json"
+
+
+class Checkpoint:
+    """完了済みファイルの記録。1件終わるごとに保存し、中断後の再実行で続きから処理する"""
+
+    def __init__(self, path: Path = CHECKPOINT_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self.done: dict[str, str] = {}
+        if path.exists():
+            try:
+                self.done = json.loads(path.read_text(encoding="utf-8")).get("done", {})
+            except (OSError, ValueError):
+                self.done = {}
+
+    @staticmethod
+    def key(path: Path) -> str:
+        try:
+            return str(path.resolve().relative_to(ROOT))
+        except ValueError:
+            return str(path.resolve())
+
+    def is_done(self, path: Path) -> bool:
+        return self.key(path) in self.done
+
+    def mark_done(self, path: Path, saved: str) -> None:
+        with self._lock:
+            self.done[self.key(path)] = saved
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"done": self.done}, ensure_ascii=False, indent=1), encoding="utf-8")
+            tmp.replace(self.path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.done = {}
+            if self.path.exists():
+                self.path.unlink()
+
+
+class Progress:
+    """処理件数・スループット・残り時間の表示"""
+
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.count = 0
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def step(self, line: str) -> None:
+        with self._lock:
+            self.count += 1
+            elapsed = time.monotonic() - self.start
+            rate = self.count / elapsed if elapsed > 0 else 0.0
+            eta = (self.total - self.count) / rate if rate > 0 else 0.0
+            print(
+                f"[{self.count}/{self.total}] {line}  ({rate * 60:.1f}件/分, 残り約{int(eta // 60)}分{int(eta % 60)}秒)",
+                flush=True,
+            )
+
 
 def _collect_ra_files() -> list[tuple[Path, str, str]]:
     """long_calls から RA 用ファイルを収集。(path, company_name, "ra")"""
@@ -65,6 +138,10 @@ def main():
     parser.add_argument("--ra-only", action="store_true", help="long_calls（RA）のみ")
     parser.add_argument("--ca-only", action="store_true", help="法人面談議事録（CA）のみ")
     parser.add_argument("--no-research", action="store_true", help="事業リサーチ（Web検索）をスキップ")
+    parser.add_argument("--refresh-research", action="store_true", help="リサーチキャッシュを使わず再検索")
+    parser.add_argument("--workers", type=int, default=1, help="並列数（Web検索は共有レート制限内で実行）")
+    parser.add_argument("--restart", action="store_true", help="チェックポイントを破棄して最初から実行")
+    parser.add_argument("--force", action="store_true", help="反映済み（内容が変わっていない）文字起こしも再抽出")
     args = parser.parse_args()
 
     files = []
@@ -85,22 +162,62 @@ def main():
         print("\n--dry-run のため実行しません。", file=sys.stderr)
         return
 
-    for path, company_name, source_type in files:
+    checkpoint = Checkpoint()
+    if args.restart:
+        checkpoint.clear()
+    pending = [f for f in files if not checkpoint.is_done(f[0])]
+    if len(pending) < len(files):
+        print(f"チェックポイントから再開: 完了済み {len(files) - len(pending)} 件をスキップ", file=sys.stderr)
+    if not args.force:
+        changed = [
+            f for f in pending
+            if not is_company_info_current(f[0].read_text(encoding="utf-8"), f[1], f[2])
+        ]
+        if len(changed) < len(pending):
+            print(f"反映済み（変更なし）: {len(pending) - len(changed)} 件をスキップ", file=sys.stderr)
+        pending = changed
+
+    # 同じ会社（同じ法人マスタファイル）への書き込みは直列化してマージの競合を防ぐ
+    company_locks: dict[str, threading.Lock] = {}
+    for _, company_name, _ in pending:
+        company_locks.setdefault(_sanitize_filename(company_name), threading.Lock())
+
+    progress = Progress(len(pending))
+    failures = 0
+
+    def _import(item: tuple[Path, str, str]) -> bool:
+        path, company_name, source_type = item
         try:
             transcript = path.read_text(encoding="utf-8")
-            saved = extract_and_save_company_info(
-                transcript,
-                company_name=company_name,
-                source_type=source_type,
-                use_research=not args.no_research,
-            )
+            with company_locks[_sanitize_filename(company_name)]:
+                saved = extract_and_save_company_info(
+                    transcript,
+                    company_name=company_name,
+                    source_type=source_type,
+                    use_research=not args.no_research,
+                    refresh_research=args.refresh_research,
+                    force=args.force,
+                    source_path=path,
+                )
             if saved:
-                print(f"✅ {company_name}: {saved.name}")
-            else:
-                print(f"⚠️ {company_name}: 抽出失敗")
-
+                checkpoint.mark_done(path, saved.name)
+                progress.step(f"✅ {company_name}: {saved.name}")
+                return True
+            progress.step(f"⚠️ {company_name}: 抽出失敗")
         except Exception as e:
-            print(f"❌ {company_name}: {e}", file=sys.stderr)
+            progress.step(f"❌ {company_name}: {e}")
+        return False
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        for fut in as_completed([ex.submit(_import, item) for item in pending]):
+            if not fut.result():
+                failures += 1
+
+    print(f"\n完了: {len(pending) - failures}/{len(pending)} 件", file=sys.stderr)
+    if failures:
+        print("失敗分は再実行するとチェックポイントから再処理します。", file=sys.stderr)
+    else:
+        checkpoint.clear()
 
 
 if __name__ == "__main__":
@@ -5,6 +5,7 @@ RA/CA FB 生成 CLI
 使い方:
   python scripts/cli.py ra data/input/ra/茂野/TOKAI_EC_茂野_016.md
   python scripts/cli.py ca path/to/transcript.md --no-slack
+  RAFB_LLM_CACHE=1 python scripts/cli.py ra ... --no-slack   # 同じ入力の Claude 呼び出しはキャッシュから返す
 """
 
 import os
@@ -15,15 +16,8 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
-from ra_fb import (
-    load_env,
-    extract_ra_from_path,
-    extract_company_name,
-    generate_feedback_ra,
-    generate_feedback_ca,
-    post_to_slack,
-    extract_and_save_company_info,
-)
+from ra_fb import load_env, extract_ra_from_path, extract_company_name, run_feedback_job
+from ra_fb.llm import llm_cache_stats
 
 load_env()
 
@@ -36,6 +30,9 @@ def main():
     parser.add_argument("--no-ai", action="store_true", help="AIを使わずテンプレートのみ")
     parser.add_argument("--no-company", action="store_true", help="法人情報を抽出・保存しない")
     parser.add_argument("--no-research", action="store_true", help="事業リサーチ（Web検索）をスキップ")
+    parser.add_argument("--refresh-research", action="store_true", help="リサーチキャッシュを使わず再検索")
+    parser.add_argument("--force", action="store_true", help="抽出済みの文字起こしでも法人情報を再抽出")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Claude 応答キャッシュを読まずに再生成（RAFB_LLM_CACHE=1 時）")
     parser.add_argument("--ra-name", type=str, default="", help="RA名（type=ra時）")
     parser.add_argument("--company-name", type=str, default="", help="会社名")
     args = parser.parse_args()
@@ -44,44 +41,50 @@ def main():
         print(f"エラー: ファイルが見つかりません: {args.transcript}", file=sys.stderr)
         sys.exit(1)
 
+    if args.no_llm_cache:
+        os.environ["RAFB_LLM_CACHE_BYPASS"] = "1"
+
     transcript = args.transcript.read_text(encoding="utf-8")
     ra_name = args.ra_name or (extract_ra_from_path(args.transcript) if args.type == "ra" else "")
     company_name = args.company_name or extract_company_name(args.transcript.stem, ra_name)
 
-    if args.type == "ra":
-        full_message = generate_feedback_ra(
-            transcript, ra_name=ra_name, company_name=company_name, use_ai=not args.no_ai
-        )
-    else:
-        full_message = generate_feedback_ca(
-            transcript, company_name=company_name, use_ai=not args.no_ai
+    result = run_feedback_job(
+        args.type,
+        transcript,
+        company_name=company_name,
+        ra_name=ra_name,
+        post=not args.no_slack,
+        save_company=not args.no_company and not args.no_ai,
+        use_ai=not args.no_ai,
+        use_research=not args.no_research,
+        refresh_research=args.refresh_research,
+        force=args.force,
+        label="cli",
+    )
+
+    print(result["message"])
+
+    if result["master_path"]:
+        print(f"\n📁 法人情報を保存: {result['master_path']}", file=sys.stderr)
+    timings = " ".join(f"{k}={v:.1f}s" for k, v in result["timings"].items())
+    print(f"\n⏱ {timings}", file=sys.stderr)
+    if result["degraded"]:
+        print(f"⚠ 締め切り（RAFB_JOB_SLA）のため省略・縮小: {', '.join(result['degraded'])}", file=sys.stderr)
+    cache = llm_cache_stats()
+    if cache:
+        print(
+            f"🗃 LLM キャッシュ: ヒット {cache['hits']} / {cache['hits'] + cache['misses']} 回"
+            f"（{cache['hit_rate']:.0%}） 保存 {cache['entries']} 件・{cache['bytes'] / 1e6:.1f}MB",
+            file=sys.stderr,
         )
 
-    print(full_message)
-
-    if not args.no_company and not args.no_ai:
-        try:
-            saved = extract_and_save_company_info(
-                transcript,
-                company_name=company_name,
-                source_type=args.type,
-                use_research=not args.no_research,
-            )
-            if saved:
-                print(f"\n📁 法人情報を保存: {saved}", file=sys.stderr)
-        except Exception as e:
-            print(f"\n⚠️ 法人情報の保存に失敗: {e}", file=sys.stderr)
-
     if not args.no_slack:
-        if args.type == "ra":
-            success = post_to_slack(full_message, ra_name=ra_name)
-        else:
-            url = os.environ.get("SLACK_WEBHOOK_URL_CA") or os.environ.get("SLACK_WEBHOOK_URL")
-            success = post_to_slack(full_message, webhook_url=url)
-
-        if success:
+        if result["posted"]:
             ch = "CA FB" if args.type == "ca" else "#dk_ra_初回架電fb"
             print(f"\n✅ {ch} に投稿しました", file=sys.stderr)
+        elif result["queued"]:
+            print("\n⚠️ Slack投稿に失敗しました。FB は outbox に保存済みです（python scripts/slack_outbox.py flush で再投稿）", file=sys.stderr)
+            sys.exit(1)
         else:
             print("\n❌ Slack投稿に失敗しました", file=sys.stderr)
             sys.exit(1)
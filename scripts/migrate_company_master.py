@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 """
 既存の法人マスタを新構造（企業情報統合、候補者別訴求統合）に移行する。
+旧形式のマスタは項目単位の dict に変換し、サイドカー（{会社名}.json）と Markdown を書き直す。
+新形式でサイドカーが無い（または古い）マスタは、Markdown を解析してサイドカーだけを作る。
 
 使い方:
   python scripts/migrate_company_master.py --dry-run   # 移行内容を表示、ファイルは更新しない
@@ -10,12 +12,26 @@
 import re
 import sys
 from pathlib import Path
+from typing import Optional
 
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
 from ra_fb.config import MASTER_DIR
-from ra_fb.company import _extract_table_value, _parse_frontmatter_simple
+from ra_fb.manifest import update_master_hash
+from ra_fb.master import MasterRecord, is_master_file, parse_master
+from ra_fb.master_record import (
+    APPEAL_SEGMENTS,
+    FIELD_KEYS,
+    SIZE_SEGMENTS,
+    load_record,
+    record_from_master,
+    render_master,
+    save_master,
+    sidecar_is_current,
+    validate_record,
+    write_sidecar,
+)
 
 # 旧キー → 新キー のマッピング（複数候補から取得）
 KEY_MAPPINGS = {
@@ -29,149 +45,76 @@ KEY_MAPPINGS = {
     ],
 }
 
-
-def _get_value(body: str, keys: list[str]) -> str:
-    """複数キーから最初に見つかった値を返す"""
-    for k in keys:
-        v = _extract_table_value(body, k)
-        if v:
-            return v
-    return ""
+# 各項目に取り込み、移行後は残さない旧セクション
+ABSORBED_SECTIONS = ("候補者タイプ別",)
 
 
-def _extract_前職規模別_usps(body: str) -> str:
+def _extract_前職規模別_usps(rec: MasterRecord) -> str:
     """前職規模別アトラクトUSPテーブルから大手・中堅・零細のUSPを抽出して1文に"""
     parts = []
     for label in ["大手出身者向け", "中堅出身者向け", "零細出身者向け"]:
-        v = _extract_table_value(body, label)
+        v = rec.get(label)
         if v:
             short = label.replace("出身者向け", "")
             parts.append(f"{short}：{v}")
     return "。".join(parts) if parts else ""
 
 
-def _extract_口コミ(body: str) -> str:
+def _extract_口コミ(rec: MasterRecord) -> str:
     """口コミ評価傾向を抽出"""
-    return (
-        _extract_table_value(body, "口コミ評価傾向")
-        or _extract_table_value(body, "OpenWork・転職会議等")
-        or ""
-    )
-
-
-def migrate_file(content: str) -> str:
-    """旧形式の法人マスタを新形式に変換"""
-    if not content.strip().startswith("---"):
+    return rec.get("口コミ評価傾向", "OpenWork・転職会議等")
+
+
+def _is_new_format(content: str) -> bool:
+    return "## 企業情報" in content and "| 事業概要 |" in content
+
+
+def migrate_record(rec: MasterRecord, fallback_name: str = "") -> dict:
+    """旧形式の解析結果を法人マスタの dict に変換（旧キー名・旧テーブルから各項目を拾う）"""
+    record = record_from_master(rec)
+    record["会社名"] = record["会社名"] or fallback_name
+    fields = record["fields"]
+    for key in FIELD_KEYS:
+        if not fields.get(key):
+            value = rec.get(*KEY_MAPPINGS.get(key, [key]))
+            if value:
+                fields[key] = value
+
+    # 休日数・リモート可否が別行の旧形式は1項目にまとめる
+    if not fields.get("休日・直行直帰・リモート"):
+        workstyle = "、".join(x for x in [rec.get("休日数"), rec.get("リモート可否")] if x)
+        if workstyle:
+            fields["休日・直行直帰・リモート"] = workstyle
+    usp_by_size = _extract_前職規模別_usps(rec) or rec.get("前職規模別アトラクトUSP", "前職規模別USP")
+    if usp_by_size and not fields.get("前職規模別USP"):
+        fields["前職規模別USP"] = usp_by_size
+    kuchikomi = _extract_口コミ(rec)
+    if kuchikomi and not fields.get("口コミ評価傾向"):
+        fields["口コミ評価傾向"] = kuchikomi
+
+    # 候補者タイプ別テーブル（①〜③）と前職規模別USP を候補者別訴求に統合
+    appeal = record["訴求"]
+    for prefix, seg in zip(("①", "②", "③"), APPEAL_SEGMENTS[:3]):
+        row = _extract_candidate_type_row(rec, prefix)
+        if seg not in appeal and (row["adopt"] or row["appeal"]):
+            appeal[seg] = {"採用": row["adopt"], "訴求": row["appeal"]}
+    for size, seg in zip(("大手", "中堅", "零細"), SIZE_SEGMENTS):
+        usp = _get_usp_for_size(usp_by_size, size)
+        if seg not in appeal and usp:
+            appeal[seg] = {"採用": "", "訴求": usp}
+
+    # 候補者タイプ別は候補者別訴求に取り込んだため引き継がない。それ以外の旧セクション・自由記述はそのまま残す
+    for section in ABSORBED_SECTIONS:
+        record["その他セクション"].pop(section, None)
+    return validate_record(record)
+
+
+def migrate_file(content: str, fallback_name: str = "") -> str:
+    """旧形式の法人マスタを新形式の Markdown に変換（新形式ならそのまま返す）"""
+    rec = parse_master(content)
+    if rec is None or _is_new_format(rec.body):
         return content
-
-    parts = content.split("---", 2)
-    if len(parts) < 3:
-        return content
-
-    frontmatter = parts[1]
-    body = parts[2]
-
-    # 既に新形式（企業情報セクションあり）ならスキップ
-    if "## 企業情報" in body and "| 事業概要 |" in body:
-        return content
-
-    # 各項目を抽出
-    company_name = _get_value(body, ["会社名"])
-    prefecture = _get_value(body, ["都道府県"])
-    job_overview = _get_value(body, KEY_MAPPINGS["事業概要"])
-    market_growth = _get_value(body, KEY_MAPPINGS["マーケット成長性"])
-    hp_url = _get_value(body, ["法人HP URL"])
-    sales_ratio = _get_value(body, ["売上構成比"])
-    focus = _get_value(body, ["今後の注力領域"])
-    snapshot = _get_value(body, ["企業スナップショット"])
-    usp_by_size = _extract_前職規模別_usps(body) or _get_value(body, ["前職規模別アトラクトUSP", "前職規模別USP"])
-    decision_maker = _get_value(body, ["採用意思決定者"])
-    kuchikomi = _extract_口コミ(body)
-
-    # 労働条件
-    shukka = _get_value(body, ["出張"])
-    zangyo = _get_value(body, ["残業時間"])
-    workstyle = _get_value(body, KEY_MAPPINGS["休日・直行直帰・リモート"])
-    if not workstyle:
-        hi = _get_value(body, ["休日数"])
-        remote = _get_value(body, ["リモート可否"])
-        if hi or remote:
-            workstyle = "、".join(x for x in [hi, remote] if x)
-    fukuri = _get_value(body, ["福利厚生"])
-
-    # 候補者タイプ別（①〜③）
-    type1_adopt = _get_value(body, ["①電気工事士もち、電気施工管理未経験", "①電気工事士もち、施工管理未経験"])
-    type1_appeal = _get_value(body, ["訴求・差別化"])  # テーブル内の列
-    # 候補者タイプ別テーブルは行ごとに 候補者タイプ | 採用 | 訴求・差別化 の形式
-    # ①の行の採用・訴求を取るには別のパースが必要
-    type1_row = _extract_candidate_type_row(body, "①")
-    type2_row = _extract_candidate_type_row(body, "②")
-    type3_row = _extract_candidate_type_row(body, "③")
-
-    # 差別化メモ（同エリア×同セグメント差別化メモ セクションの内容）
-    diff_memo = _extract_section_content(body, "同エリア×同セグメント差別化メモ")
-
-    # その他のセクションはそのまま維持（仕事内容、採用条件、評価、面接、その他）
-    work_content = _extract_section(body, "仕事内容")
-    adopt_cond = _extract_section(body, "採用条件", drop_rows=["採用意思決定者"])
-    eval_section = _extract_section(body, "評価・キャリアアップ")
-    interview_section = _extract_section(body, "面接・選考")
-    other_section = _extract_section(body, "その他")
-    update_history = _extract_section(body, "更新履歴")
-
-    # 新形式で組み立て
-    new_body = f"""# 法人情報：{company_name or '(会社名)'}
-
-## 企業情報
-
-| 項目 | 内容 |
-|------|------|
-| 会社名 | {company_name or ""} |
-| 都道府県 | {prefecture or ""} |
-| 事業概要 | {job_overview or ""} |
-| マーケット成長性 | {market_growth or ""} |
-| 法人HP URL | {hp_url or ""} |
-| 売上構成比 | {sales_ratio or ""} |
-| 今後の注力領域 | {focus or ""} |
-| 企業スナップショット | {snapshot or ""} |
-| 前職規模別USP | {usp_by_size or ""} |
-| 採用意思決定者 | {decision_maker or ""} |
-| 口コミ評価傾向 | {kuchikomi or ""} |
-
-{work_content}
-
-## 労働条件
-
-| 項目 | 内容 |
-|------|------|
-| 出張 | {shukka or ""} |
-| 残業時間 | {zangyo or ""} |
-| 休日・直行直帰・リモート | {workstyle or ""} |
-| 福利厚生 | {fukuri or ""} |
-
-{eval_section}
-{interview_section}
-{other_section}
-
-## 候補者別訴求
-
-| セグメント | 採用 | 訴求・差別化 |
-|------------|------|--------------|
-| ①電気工事士もち、施工管理未経験 | {type1_row.get("adopt", "")} | {type1_row.get("appeal", "")} |
-| ②施工管理資格もち、マネジメント未経験 | {type2_row.get("adopt", "")} | {type2_row.get("appeal", "")} |
-| ③施工管理資格もち、マネジメント経験あり | {type3_row.get("adopt", "")} | {type3_row.get("appeal", "")} |
-| 大手出身者向け（1,000名以上） | - | {_get_usp_for_size(usp_by_size, "大手")} |
-| 中堅出身者向け（100〜999名） | - | {_get_usp_for_size(usp_by_size, "中堅")} |
-| 零細出身者向け（100名未満） | - | {_get_usp_for_size(usp_by_size, "零細")} |
-
-## 同エリア×同セグメント差別化メモ
-
-{diff_memo}
-
-{update_history}
-"""
-
-    return "---" + parts[1] + "---\n" + new_body
+    return render_master(migrate_record(rec, fallback_name))
 
 
 def _get_usp_for_size(usp_text: str, size: str) -> str:
@@ -184,14 +127,12 @@ def _get_usp_for_size(usp_text: str, size: str) -> str:
     return ""
 
 
-def _extract_candidate_type_row(body: str, prefix: str) -> dict:
+def _extract_candidate_type_row(rec: MasterRecord, prefix: str) -> dict:
     """候補者タイプ別テーブルから①〜③の行を抽出"""
     result = {"adopt": "", "appeal": ""}
-    # ## 候補者タイプ別 の後のテーブルをパース（\n\n または \n の両方に対応）
-    m = re.search(r"## 候補者タイプ別\s*\n+(.*?)(?=\n## |\Z)", body, re.DOTALL)
-    if not m:
+    table = rec.section("候補者タイプ別")
+    if not table:
         return result
-    table = m.group(1)
     for line in table.splitlines():
         if "|" not in line:
             continue
@@ -210,31 +151,15 @@ def _extract_candidate_type_row(body: str, prefix: str) -> dict:
     return result
 
 
-def _extract_section_content(body: str, section_name: str) -> str:
-    """セクションの見出し以降の内容を取得（次の##まで）"""
-    m = re.search(rf"## {re.escape(section_name)}\s*\n\n?(.*?)(?=\n## |\Z)", body, re.DOTALL)
-    if not m:
-        return ""
-    return m.group(1).strip()
-
-
-def _extract_section(body: str, section_name: str, drop_rows: list[str] | None = None) -> str:
-    """セクション全体（見出し含む）を取得。drop_rows で指定した項目の行を除外"""
-    m = re.search(rf"(## {re.escape(section_name)}\s*\n\n?.*?)(?=\n## |\Z)", body, re.DOTALL)
-    if not m:
-        return ""
-    section = m.group(1).strip()
-    if drop_rows:
-        lines = section.split("\n")
-        new_lines = []
-        for line in lines:
-            if "|" in line:
-                cells = [c.strip() for c in line.split("|")[1:-1]]
-                if cells and cells[0] in drop_rows:
-                    continue
-            new_lines.append(line)
-        section = "\n".join(new_lines)
-    return section
+def _plan(path: Path) -> Optional[str]:
+    """移行内容。"migrate"（旧形式を変換）/ "sidecar"（サイドカーのみ作成）/ None（対象外）"""
+    content = path.read_text(encoding="utf-8")
+    rec = parse_master(content)
+    if rec is None:
+        return None
+    if not _is_new_format(rec.body):
+        return "migrate"
+    return None if sidecar_is_current(path) else "sidecar"
 
 
 def main():
@@ -248,42 +173,48 @@ def main():
         sys.exit(1)
 
     targets = []
-    for f in MASTER_DIR.glob("*.md"):
-        if f.name.startswith("_") or f.name in ("マスタ項目一覧.md", "README.md"):
+    for f in sorted(MASTER_DIR.glob("*.md")):
+        if not is_master_file(f.name):
             continue
-        content = f.read_text(encoding="utf-8")
-        if "## 企業情報" in content and "| 事業概要 |" in content:
-            continue  # 既に新形式
-        targets.append((f, content))
+        action = _plan(f)
+        if action:
+            targets.append((f, action))
 
     if not targets:
         print("移行対象の法人マスタはありません。", file=sys.stderr)
         return
 
-    print(f"移行対象: {len(targets)} 件", file=sys.stderr)
-    for f, _ in targets:
-        print(f"  - {f.stem}", file=sys.stderr)
+    migrations = [f for f, action in targets if action == "migrate"]
+    print(f"移行対象: {len(migrations)} 件 / サイドカー作成: {len(targets) - len(migrations)} 件", file=sys.stderr)
+    for f, action in targets:
+        print(f"  - {f.stem}{'' if action == 'migrate' else '（サイドカーのみ）'}", file=sys.stderr)
 
     if args.dry_run:
         print("\n--dry-run のためファイルは更新しません。", file=sys.stderr)
-        # 1件だけサンプル表示
-        f, content = targets[0]
-        migrated = migrate_file(content)
-        print(f"\n【{f.stem} の移行サンプル（先頭500文字）】", file=sys.stderr)
-        print(migrated[:500], file=sys.stderr)
+        if migrations:
+            # 1件だけサンプル表示
+            f = migrations[0]
+            migrated = migrate_file(f.read_text(encoding="utf-8"), f.stem)
+            print(f"\n【{f.stem} の移行サンプル（先頭500文字）】", file=sys.stderr)
+            print(migrated[:500], file=sys.stderr)
         return
 
     updated = 0
-    for f, content in targets:
+    for f, action in targets:
         try:
-            migrated = migrate_file(content)
-            f.write_text(migrated, encoding="utf-8")
+            if action == "migrate":
+                rec = parse_master(f.read_text(encoding="utf-8"))
+                # 書き換えたマスタで抽出済みの記録が無効にならないよう、記録のハッシュも揃える
+                update_master_hash(f.stem, save_master(f, migrate_record(rec, f.stem)))
+                print(f"✅ 移行: {f.stem}", file=sys.stderr)
+            else:
+                write_sidecar(f, load_record(f))
+                print(f"✅ サイドカー作成: {f.stem}", file=sys.stderr)
             updated += 1
-            print(f"✅ 移行: {f.stem}", file=sys.stderr)
         except Exception as e:
             print(f"⚠️ エラー {f.stem}: {e}", file=sys.stderr)
 
-    print(f"\n完了: {updated}/{len(targets)} 件を移行", file=sys.stderr)
+    print(f"\n完了: {updated}/{len(targets)} 件", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Slack 投稿 outbox の確認・再送
+
+使い方:
+  python scripts/slack_outbox.py list                  # 直近の一覧（全状態）
+  python scripts/slack_outbox.py list --status failed  # 再投稿を断念したもの
+  python scripts/slack_outbox.py show 12               # 本文を表示
+  python scripts/slack_outbox.py replay 12 13          # 指定 id を再送（送信済みの id は何もしない）
+  python scripts/slack_outbox.py replay --all-failed   # failed をすべて再送
+  python scripts/slack_outbox.py flush                 # 再投稿待ち（pending）を今すぐ送る
+
+FB は投稿前に data/state/slack_outbox.sqlite3 に保存される。Slack サーバー・Webhook サーバーは
+起動中に pending を自動で再投稿する。
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ra_fb import load_env
+from ra_fb.outbox import get_outbox
+
+load_env()
+
+
+def _fmt_time(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+
+
+def cmd_list(args) -> int:
+    outbox = get_outbox()
+    counts = outbox.counts()
+    print(" ".join(f"{k}={v}" for k, v in counts.items()))
+    for row in outbox.list(status=args.status, limit=args.limit):
+        print(
+            f"#{row['id']:<5} {row['status']:<8} {_fmt_time(row['created_at'])}  試行{row['attempts']}回  "
+            f"{row['chars']}文字  {row['label'] or '-'}  {row['last_error'] or ''}"
+        )
+    return 0
+
+
+def cmd_show(args) -> int:
+    row = get_outbox().get(args.id)
+    if not row:
+        print(f"outbox #{args.id} が見つかりません", file=sys.stderr)
+        return 1
+    print(row["text"])
+    return 0
+
+
+def cmd_replay(args) -> int:
+    outbox = get_outbox()
+    if not args.ids and not args.all_failed:
+        print("id を指定するか --all-failed を付けてください", file=sys.stderr)
+        return 1
+    ids = args.ids or [row["id"] for row in outbox.list(status="failed", limit=10000)]
+    outbox.requeue(ids)
+    ng = 0
+    for message_id in ids:
+        row = outbox.get(message_id)
+        if row is None:
+            ng += 1
+            print(f"#{message_id}: ❌ 見つかりません", file=sys.stderr)
+            continue
+        if row["status"] == "sent":
+            print(f"#{message_id}: 送信済みです", file=sys.stderr)
+            continue
+        ok = outbox.deliver(message_id)
+        ng += not ok
+        print(f"#{message_id}: {'✅ 投稿しました' if ok else '❌ 失敗'}", file=sys.stderr)
+    return 1 if ng else 0
+
+
+def cmd_flush(args) -> int:
+    ok, ng = get_outbox().flush(limit=args.limit)
+    print(f"成功 {ok} 件 / 失敗 {ng} 件", file=sys.stderr)
+    return 1 if ng else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slack 投稿 outbox の確認・再送")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="一覧")
+    p.add_argument("--status", choices=["pending", "sending", "sent", "failed"], help="状態で絞り込み")
+    p.add_argument("--limit", type=int, default=50)
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("show", help="本文を表示")
+    p.add_argument("id", type=int)
+    p.set_defaults(func=cmd_show)
+
+    p = sub.add_parser("replay", help="再送")
+    p.add_argument("ids", type=int, nargs="*")
+    p.add_argument("--all-failed", action="store_true", help="failed をすべて再送")
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser("flush", help="再投稿待ちを今すぐ送る")
+    p.add_argument("--limit", type=int, default=200)
+    p.set_defaults(func=cmd_flush)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
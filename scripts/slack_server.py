@@ -4,12 +4,21 @@ Slack /rafb_call（初回架電）・ /rafb_mtg（法人面談）サーバー（
 
 使い方:
   python scripts/slack_server.py
+
+計測値（ステージ別所要時間・トークン数・エラー数・キュー待ち件数）は RAFB_STATS_INTERVAL 秒ごと
+（既定 60 秒）に data/state/slack_server_metrics.prom へ Prometheus テキスト形式で書き出し、
+サマリーをログに出す。
+
+file_shared の再配信（同じ file_id）やモーダルの二重送信（同じ文字起こし）は冪等キーで排除し、
+処理中・処理済みのジョブに合流させる（RAFB_IDEMPOTENCY_TTL_HOURS、既定 24 時間）。
+
+FB 投稿の締め切り（RAFB_JOB_SLA）は受付時刻から数え、ファイルのダウンロードとキュー待ちも含む。
 """
 
 import logging
 import os
 import sys
-import threading
+import time
 from pathlib import Path
 from typing import Optional, Tuple
 
@@ -17,15 +26,13 @@ ROOT = Path(__file__).resolve().parent.parent
 logger = logging.getLogger(__name__)
 sys.path.insert(0, str(ROOT))
 
-from ra_fb import (
-    load_env,
-    extract_ra_from_filename,
-    extract_company_name,
-    generate_feedback_ra,
-    generate_feedback_ca,
-    post_to_slack,
-    extract_and_save_company_info,
-)
+from ra_fb import load_env, extract_ra_from_filename, extract_company_name, run_feedback_job
+from ra_fb.config import STATE_DIR, env_float
+from ra_fb.deadline import Deadline, job_deadline
+from ra_fb.idempotency import get_idempotency_store, idempotency_key
+from ra_fb.jobs import JobQueue
+from ra_fb.metrics import METRICS, register_process_gauges
+from ra_fb.outbox import get_outbox
 
 load_env()
 
@@ -47,8 +54,49 @@ if not SLACK_BOT_TOKEN or not SLACK_APP_TOKEN:
 app = App(token=SLACK_BOT_TOKEN)
 
 
-def _download_slack_file(client, file_id: str) -> Tuple[Optional[str], Optional[str], Optional[str], str]:
-    """Slack ファイルをダウンロード。戻り値: (text, channel_id, user_id, filename)"""
+def _run_fb_job(job: dict) -> dict:
+    """FB 生成 → Slack 投稿（並行して法人情報保存）。ワーカースレッドで実行"""
+    result = run_feedback_job(
+        job.get("type", "ra"),
+        job.get("transcript", ""),
+        company_name=job.get("company_name", ""),
+        ra_name=job.get("ra_name", ""),
+        label=job.get("label", ""),
+        deadline=job_deadline(job.get("received_at"), label=job.get("label", "")),
+    )
+    return {
+        "posted": result["posted"],
+        "queued": result["queued"],
+        "timings": result["timings"],
+        "degraded": result["degraded"],
+    }
+
+
+# 固定数のワーカーで処理。受付内容は data/state/jobs.sqlite3 に保存され、再起動後も再開される
+JOBS = JobQueue({"fb": _run_fb_job})
+
+STATS_PATH = STATE_DIR / "slack_server_metrics.prom"
+register_process_gauges()
+METRICS.register_gauge("rafb_queue_jobs", "ジョブの状態別件数", JOBS.depth, label="status")
+
+
+def _queue_note() -> str:
+    """エフェメラルメッセージ用の待ち件数表示"""
+    depth = JOBS.depth()
+    waiting = depth["queued"] + depth["running"]
+    return f"（処理待ち {waiting} 件）" if waiting > 1 else ""
+
+
+_DUPLICATE_NOTE = "同じ文字起こしを処理中、または処理済みです（重複のため再実行しません）。"
+
+DOWNLOAD_TIMEOUT = 30.0
+MIN_DOWNLOAD_TIMEOUT = 5.0
+
+
+def _download_slack_file(
+    client, file_id: str, deadline: Optional[Deadline] = None
+) -> Tuple[Optional[str], Optional[str], Optional[str], str]:
+    """Slack ファイルをダウンロード（タイムアウトは 30 秒と締め切りまでの短い方）。戻り値: (text, channel_id, user_id, filename)"""
     try:
         resp = client.files_info(file=file_id)
         if not resp.get("ok"):
@@ -63,7 +111,8 @@ def _download_slack_file(client, file_id: str) -> Tuple[Optional[str], Optional[
             return None, None, None, ""
         import urllib.request
         req = urllib.request.Request(url, headers={"Authorization": f"Bearer {SLACK_BOT_TOKEN}"})
-        with urllib.request.urlopen(req, timeout=30) as r:
+        timeout = deadline.timeout(DOWNLOAD_TIMEOUT, floor=MIN_DOWNLOAD_TIMEOUT) if deadline else DOWNLOAD_TIMEOUT
+        with urllib.request.urlopen(req, timeout=timeout) as r:
             text = r.read().decode("utf-8", errors="replace")
         chs = f.get("channels") or []
         return text, chs[0] if chs else None, f.get("user"), f.get("name") or ""
@@ -134,26 +183,20 @@ def view_rafb(ack, body, client, view):
     if not transcript:
         return
 
+    _, created = JOBS.enqueue_once("fb", {
+        "type": "ra", "transcript": transcript, "company_name": company_name, "ra_name": ra_name, "label": "RA",
+        "received_at": time.time(),
+    }, idempotency_key("slack_modal", "ra", transcript=transcript, company_name=company_name, ra_name=ra_name))
+
     user_id = body.get("user", {}).get("id", "")
     channel_id = view.get("private_metadata") or ""
     if user_id and channel_id:
+        text = f"処理中です{_queue_note()}。完了次第 #dk_ra_初回架電fb に投稿します。" if created else _DUPLICATE_NOTE
         try:
-            client.chat_postEphemeral(channel=channel_id, user=user_id, text="処理中です。完了次第 #dk_ra_初回架電fb に投稿します。")
+            client.chat_postEphemeral(channel=channel_id, user=user_id, text=text)
         except Exception as e:
             logger.debug("ephemeral投稿失敗(RA): %s", e)
 
-    def _do():
-        msg = generate_feedback_ra(transcript, ra_name=ra_name, company_name=company_name)
-        post_to_slack(msg, ra_name=ra_name)
-        try:
-            extract_and_save_company_info(
-                transcript, company_name=company_name, source_type="ra", use_research=True
-            )
-        except Exception as e:
-            logger.warning("法人情報保存失敗(RA): %s", e)
-
-    threading.Thread(target=_do, daemon=True).start()
-
 
 @app.view("cafb_modal")
 def view_cafb(ack, body, client, view):
@@ -164,34 +207,37 @@ def view_cafb(ack, body, client, view):
     if not transcript:
         return
 
+    _, created = JOBS.enqueue_once(
+        "fb",
+        {
+            "type": "ca", "transcript": transcript, "company_name": company_name, "label": "CA",
+            "received_at": time.time(),
+        },
+        idempotency_key("slack_modal", "ca", transcript=transcript, company_name=company_name),
+    )
+
     user_id = body.get("user", {}).get("id", "")
     channel_id = view.get("private_metadata") or ""
     if user_id and channel_id:
+        text = f"処理中です{_queue_note()}。完了次第 CA FB チャンネルに投稿します。" if created else _DUPLICATE_NOTE
         try:
-            client.chat_postEphemeral(channel=channel_id, user=user_id, text="処理中です。完了次第 CA FB チャンネルに投稿します。")
+            client.chat_postEphemeral(channel=channel_id, user=user_id, text=text)
         except Exception as e:
             logger.debug("ephemeral投稿失敗(CA): %s", e)
 
-    def _do():
-        msg = generate_feedback_ca(transcript, company_name=company_name)
-        url = os.environ.get("SLACK_WEBHOOK_URL_CA") or SLACK_WEBHOOK_URL
-        post_to_slack(msg, webhook_url=url)
-        try:
-            extract_and_save_company_info(
-                transcript, company_name=company_name, source_type="ca", use_research=True
-            )
-        except Exception as e:
-            logger.warning("法人情報保存失敗(CA): %s", e)
-
-    threading.Thread(target=_do, daemon=True).start()
-
 
 @app.event("file_shared")
 def evt_file_shared(event, client):
     file_id = event.get("file_id")
     if not file_id:
         return
-    text, ch, uid, fname = _download_slack_file(client, file_id)
+    key = idempotency_key("slack_file", "ra", delivery_id=file_id)
+    store = get_idempotency_store()
+    if store is not None and store.get(key):
+        logger.info("file_shared の再配信のためスキップ: %s", file_id)  # ダウンロードもしない
+        return
+    received_at = time.time()
+    text, ch, uid, fname = _download_slack_file(client, file_id, job_deadline(received_at, label="file_shared"))
     if not text or not text.strip():
         return
 
@@ -200,24 +246,19 @@ def evt_file_shared(event, client):
     channel_id = event.get("channel_id") or ch or ""
     user_id = event.get("user_id") or uid or ""
 
+    _, created = JOBS.enqueue_once("fb", {
+        "type": "ra", "transcript": text, "company_name": company_name, "ra_name": ra_name, "label": "file_shared",
+        "received_at": received_at,
+    }, key)
+    if not created:
+        return
+
     if user_id and channel_id:
         try:
-            client.chat_postEphemeral(channel=channel_id, user=user_id, text="テキストファイルを検出しました。処理中です。")
+            client.chat_postEphemeral(channel=channel_id, user=user_id, text=f"テキストファイルを検出しました。処理中です{_queue_note()}。")
         except Exception as e:
             logger.debug("ephemeral投稿失敗(file_shared): %s", e)
 
-    def _do():
-        msg = generate_feedback_ra(text, ra_name=ra_name, company_name=company_name)
-        post_to_slack(msg, ra_name=ra_name)
-        try:
-            extract_and_save_company_info(
-                text, company_name=company_name, source_type="ra", use_research=True
-            )
-        except Exception as e:
-            logger.warning("法人情報保存失敗(file_shared): %s", e)
-
-    threading.Thread(target=_do, daemon=True).start()
-
 
 if __name__ == "__main__":
     print("=" * 50)
@@ -225,5 +266,10 @@ if __name__ == "__main__":
     print("Slack: /rafb_call（初回架電） /rafb_mtg（法人面談）")
     if not SLACK_WEBHOOK_URL:
         print("⚠️ SLACK_WEBHOOK_URL が未設定です")
+    depth = JOBS.depth()
+    print(f"ワーカー: {JOBS.workers}  未処理ジョブ: {depth['queued'] + depth['running']} 件")
     print("=" * 50)
+    JOBS.start()
+    get_outbox().start_flusher()
+    METRICS.start_dump(STATS_PATH, env_float("RAFB_STATS_INTERVAL", 60))
     SocketModeHandler(app, SLACK_APP_TOKEN).start()
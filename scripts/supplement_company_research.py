@@ -9,6 +9,7 @@ FBにない情報をリサーチして追加する。既存の法人マスタを
   python scripts/supplement_company_research.py              # 全法人マスタを補完
   python scripts/supplement_company_research.py 会社名         # 指定会社のみ
   python scripts/supplement_company_research.py --dry-run      # 補完対象のみ表示、更新しない
+  python scripts/supplement_company_research.py --refresh-research  # 検索キャッシュを使わず再検索
 """
 
 import sys
@@ -18,6 +19,7 @@ ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
 from ra_fb import load_env, supplement_company_master_from_research
+from ra_fb.catalog import get_catalog
 from ra_fb.config import MASTER_DIR
 from ra_fb.company import _needs_supplement
 
@@ -29,6 +31,7 @@ def main():
     parser = argparse.ArgumentParser(description="法人マスタの不足項目をWeb検索で補完")
     parser.add_argument("company", nargs="?", help="会社名（省略時は全件）")
     parser.add_argument("--dry-run", action="store_true", help="補完対象のみ表示、更新しない")
+    parser.add_argument("--refresh-research", action="store_true", help="リサーチキャッシュを使わず再検索")
     args = parser.parse_args()
 
     if not MASTER_DIR.exists():
@@ -50,21 +53,9 @@ def main():
             print(f"該当する法人マスタが見つかりません: {args.company}", file=sys.stderr)
             sys.exit(1)
     else:
-        for f in MASTER_DIR.glob("*.md"):
-            if f.name.startswith("_") or f.name in ("マスタ項目一覧.md", "README.md"):
-                continue
-            try:
-                text = f.read_text(encoding="utf-8")
-                if not text.strip().startswith("---"):
-                    continue
-                parts = text.split("---", 2)
-                if len(parts) < 3:
-                    continue
-                body = parts[2].strip()
-                if _needs_supplement(body):
-                    targets.append(f)
-            except Exception:
-                continue
+        for row in get_catalog(MASTER_DIR).all():
+            if _needs_supplement(row["record"]):
+                targets.append(row["path"])
 
     if not targets:
         print("補完が必要な法人マスタはありません。", file=sys.stderr)
@@ -80,7 +71,7 @@ def main():
 
     updated = 0
     for path in targets:
-        result = supplement_company_master_from_research(path)
+        result = supplement_company_master_from_research(path, refresh_research=args.refresh_research)
         if result:
             updated += 1
             print(f"✅ 補完: {path.stem}", file=sys.stderr)
@@ -5,29 +5,91 @@ Notta × Zapier Webhook サーバー
 使い方:
   python scripts/webhook_server.py
   ngrok http 5000  # 公開
+
+WEBHOOK_ASYNC=1（またはリクエストの "async": true / ?async=1）で非同期モード。
+受付後すぐ 202 と job_id を返し、処理はバックグラウンドで行う。進捗は GET /jobs/<id>。
+GET /metrics でステージ別所要時間・トークン数・エラー数・キュー待ち件数を Prometheus 形式で返す。
+
+Zapier の再送による重複は冪等キー（Idempotency-Key ヘッダー / JSON の "idempotency_key"、
+なければ文字起こし・会社名・RA 名のハッシュ）で排除する。処理中の重複は同じジョブ・同じ実行結果に合流し、
+完了済み（既定 24 時間以内）の重複は処理せず結果だけ返す。Slack 投稿も outbox への保存も
+できなかったときは完了扱いにせず、再送で処理し直す。
+
+FB 投稿の締め切り（RAFB_JOB_SLA）は受付時刻から数える（非同期モードではキュー待ちも含む）。
 """
 
 import logging
 import os
 import sys
+import threading
+import time
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
 logger = logging.getLogger(__name__)
 sys.path.insert(0, str(ROOT))
 
-from ra_fb import load_env, generate_feedback_ra, generate_feedback_ca, post_to_slack, extract_and_save_company_info
+from ra_fb import load_env, run_feedback_job
+from ra_fb.config import STATE_DIR, env_int
+from ra_fb.deadline import job_deadline
+from ra_fb.idempotency import get_idempotency_store, idempotency_key, run_once
+from ra_fb.jobs import JobQueue
+from ra_fb.metrics import METRICS, register_process_gauges
+from ra_fb.outbox import get_outbox
 
 load_env()
 
+# 非同期モードの待ち上限（超えたら 429）
+DEFAULT_MAX_QUEUE = 50
+
 try:
-    from flask import Flask, request, jsonify
+    from flask import Flask, Response, request, jsonify
 except ImportError:
     print("flask がインストールされていません。pip install flask", file=sys.stderr)
     sys.exit(1)
 
 app = Flask(__name__)
 
+_jobs_lock = threading.Lock()
+_jobs: "JobQueue | None" = None
+
+register_process_gauges()
+METRICS.register_gauge(
+    "rafb_queue_jobs", "非同期ジョブの状態別件数", lambda: _jobs.depth() if _jobs is not None else {}, label="status"
+)
+
+
+def _run_webhook_job(job: dict) -> dict:
+    result = run_feedback_job(
+        job["type"],
+        job["transcript"],
+        company_name=job.get("company_name", ""),
+        ra_name=job.get("ra_name", ""),
+        label="webhook",
+        deadline=job_deadline(job.get("received_at"), label="webhook"),
+    )
+    return {
+        "posted": result["posted"],
+        "queued": result["queued"],
+        "timings": result["timings"],
+        "degraded": result["degraded"],
+    }
+
+
+def _get_jobs() -> JobQueue:
+    """非同期モード用のジョブキュー（起動時・初回利用時に開始。未完了ジョブも再開）"""
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = JobQueue({"fb": _run_webhook_job}, db_path=STATE_DIR / "webhook_jobs.sqlite3")
+            _jobs.start()
+        return _jobs
+
+
+def _is_async(data: dict) -> bool:
+    flag = request.args.get("async") or data.get("async") or os.environ.get("WEBHOOK_ASYNC") or ""
+    return str(flag).lower() in ("1", "true", "yes")
+
 
 @app.route("/webhook/notta", methods=["POST"])
 def webhook_notta():
@@ -51,33 +113,69 @@ def webhook_notta():
     if fb_type not in ("ra", "ca"):
         fb_type = "ra"
 
+    delivery_id = (
+        request.headers.get("Idempotency-Key") or request.headers.get("X-Idempotency-Key")
+        or str(data.get("idempotency_key") or "")
+    ).strip()
+    key = idempotency_key("webhook", fb_type, delivery_id, transcript, company_name, ra_name)
+    received_at = time.time()
+
+    if _is_async(data):
+        jobs = _get_jobs()
+        # 投入済みの再送には満杯でも既存の job_id を返す（上限は新しいジョブにだけ適用）
+        store = get_idempotency_store()
+        existing = store.get(key) if store is not None else None
+        if existing is None and jobs.depth()["queued"] >= env_int("WEBHOOK_MAX_QUEUE", DEFAULT_MAX_QUEUE):
+            return jsonify({"ok": False, "error": "キューが満杯です。時間をおいて再送してください"}), 429
+        job_id, created = jobs.enqueue_once("fb", {
+            "type": fb_type, "transcript": transcript, "company_name": company_name, "ra_name": ra_name,
+            "received_at": received_at,
+        }, key)
+        if job_id is None:
+            return jsonify({"ok": True, "duplicate": True, "message": "同じ文字起こしを処理中です"}), 202
+        return jsonify({
+            "ok": True, "job_id": job_id, "status_url": f"/jobs/{job_id}", "duplicate": not created,
+        }), 202
+
     try:
-        if fb_type == "ra":
-            full_message = generate_feedback_ra(transcript, ra_name=ra_name, company_name=company_name)
-            posted = post_to_slack(full_message, ra_name=ra_name)
-        else:
-            full_message = generate_feedback_ca(transcript, company_name=company_name)
-            url = os.environ.get("SLACK_WEBHOOK_URL_CA") or os.environ.get("SLACK_WEBHOOK_URL")
-            posted = post_to_slack(full_message, webhook_url=url)
-        try:
-            extract_and_save_company_info(
-                transcript,
-                company_name=company_name,
-                source_type=fb_type,
-                use_research=True,
-            )
-        except Exception as ex:
-            logger.warning("法人情報保存失敗(webhook): %s", ex)
+        result, status = run_once(key, lambda: _run_webhook_job({
+            "type": fb_type, "transcript": transcript, "company_name": company_name, "ra_name": ra_name,
+            "received_at": received_at,
+        }), done=lambda r: r["posted"] or r["queued"])
     except Exception as e:
         logger.exception("Webhook FB生成失敗")
         return jsonify({"ok": False, "error": str(e)[:500]}), 500
 
+    if status == "running":
+        # 他プロセスで処理中（完了すれば結果が保存される）
+        return jsonify({"ok": True, "duplicate": True, "message": "同じ文字起こしを処理中です"}), 202
+    if status != "new":
+        logger.info("重複リクエストに処理結果を返却(%s): %s", status, key)
+    posted = result["posted"]
+    if not posted and result["queued"]:
+        # FB は outbox に保存済み。500 を返すと Zapier が再送して FB を作り直すため 202 で受け付ける
+        return jsonify({"ok": True, "queued": True, "message": "Slack 投稿に失敗したため、後で再投稿します"}), 202
     if not posted:
         return jsonify({"ok": False, "error": "Slack 投稿に失敗しました", "feedback_generated": True}), 500
 
     return jsonify({"ok": True, "message": f"{'RA' if fb_type == 'ra' else 'CA'} FB を Slack に投稿しました"})
 
 
+@app.route("/jobs/<int:job_id>", methods=["GET"])
+def job_status(job_id: int):
+    """非同期ジョブの状態: queued / running / done / failed"""
+    job = _get_jobs().get(job_id)
+    if not job:
+        return jsonify({"ok": False, "error": "job が見つかりません"}), 404
+    return jsonify({"ok": True, **job})
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus テキスト形式の計測値（ステージ別所要時間・トークン数・エラー数・キュー待ち件数）"""
+    return Response(METRICS.render_prometheus(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.route("/health", methods=["GET"])
 def health():
     return jsonify({"ok": True, "status": "running"})
@@ -87,6 +185,8 @@ if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     print("=" * 50)
     print("RA/CA FB Webhook サーバー")
-    print("  POST /webhook/notta  GET /health")
+    print("  POST /webhook/notta  GET /jobs/<id>  GET /metrics  GET /health")
     print("=" * 50)
+    get_outbox().start_flusher()
+    _get_jobs()  # 再起動前に受け付けた未完了ジョブをリクエストを待たずに再開
     app.run(host="0.0.0.0", port=port, debug=False)